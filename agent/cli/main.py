@@ -3,13 +3,13 @@
 PR Review Agent CLI - Main entry point for the application.
 """
 
+import asyncio
 import click
 import json
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
-from rich.progress import Progress, SpinnerColumn, TextColumn
 from pathlib import Path
 import sys
 import os
@@ -17,13 +17,22 @@ import os
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from agent.orchestrator.review_orchestrator import ReviewOrchestrator
 from config.settings import settings
 
 
 console = Console()
 
 
+def _create_orchestrator():
+    """Build the review orchestrator.
+    
+    Imported on demand: the orchestrator pulls in the providers, storage and
+    (once a review runs) LangChain, none of which ``config`` needs.
+    """
+    from agent.orchestrator.review_orchestrator import ReviewOrchestrator
+    return ReviewOrchestrator()
+
+
 @click.group()
 @click.version_option(version="1.0.0")
 def cli():
@@ -34,22 +43,27 @@ def cli():
 @cli.command()
 @click.option('--repo', default='demo-repo', help='Repository name')
 @click.option('--pr', default=1, help='Pull request number')
-@click.option('--criteria', default='strict style', help='Review criteria')
+@click.option('--criteria', multiple=True, default=['strict style'],
+              help='Review criteria; repeat to review under several criteria with shared retrieval')
 @click.option('--output', '-o', help='Output file for results')
-def review(repo, pr, criteria, output):
+@click.option('--stream', is_flag=True, help='Stream comments as the model produces them')
+def review(repo, pr, criteria, output, stream):
     """Review a pull request with the specified criteria."""
     
     if not settings.openai_api_key:
         console.print("[red]Error: OpenAI API key not found. Set OPENAI_API_KEY environment variable.[/red]")
         return
     
+    criteria = list(dict.fromkeys(criteria))
     console.print(Panel(f"[bold blue]PR Review Agent[/bold blue]\n"
                        f"Repository: {repo}\n"
                        f"PR: #{pr}\n"
-                       f"Criteria: {criteria}", 
+                       f"Criteria: {', '.join(criteria)}", 
                        title="Review Configuration"))
     
-    orchestrator = ReviewOrchestrator()
+    orchestrator = _create_orchestrator()
+    
+    from rich.progress import Progress, SpinnerColumn, TextColumn
     
     with Progress(
         SpinnerColumn(),
@@ -58,11 +72,28 @@ def review(repo, pr, criteria, output):
     ) as progress:
         task = progress.add_task("Reviewing PR...", total=None)
         
+        def print_comment(comment):
+            progress.console.print(
+                f"[cyan]{comment.file_path}[/cyan]:[yellow]{comment.line_number}[/yellow] "
+                f"[red]{comment.severity}[/red] {comment.comment_text}"
+            )
+        
+        def print_criteria_comment(criteria_text, comment):
+            progress.console.print(f"[magenta]{criteria_text}[/magenta] ", end="")
+            print_comment(comment)
+        
         try:
-            result = orchestrator.review_pull_request(repo, pr, criteria)
+            if len(criteria) > 1:
+                result = orchestrator.review_pull_request_multi(repo, pr, criteria,
+                                                                on_comment=print_criteria_comment if stream else None)
+            else:
+                result = orchestrator.review_pull_request(repo, pr, criteria[0],
+                                                          on_comment=print_comment if stream else None)
             progress.update(task, description="Review completed!")
             
-            if result["success"]:
+            if result["success"] and result.get("reviews"):
+                _display_multi_review_results(result, output)
+            elif result["success"]:
                 _display_review_results(result, output)
             else:
                 console.print(f"[red]Review failed: {result.get('error', 'Unknown error')}[/red]")
@@ -72,13 +103,67 @@ def review(repo, pr, criteria, output):
             console.print(f"[red]Error during review: {str(e)}[/red]")
 
 
+@cli.command('review-batch')
+@click.argument('input_file', type=click.File('r'), default='-')
+@click.option('--criteria', default='strict style', help='Default criteria for jobs that do not set one')
+@click.option('--concurrency', '-c', type=int, default=None, help='Maximum reviews in flight at once')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='JSONL output file (default: stdout)')
+def review_batch(input_file, criteria, concurrency, output):
+    """Review many PRs from a JSONL file (or stdin), streaming results as JSONL.
+    
+    Each input line is an object like {"repo": "org/name", "pr": 12, "criteria": "security"}.
+    """
+    err_console = Console(stderr=True)
+    
+    if not settings.openai_api_key:
+        err_console.print("[red]Error: OpenAI API key not found. Set OPENAI_API_KEY environment variable.[/red]")
+        return
+    
+    from agent.orchestrator.review_orchestrator import validate_batch_job
+    
+    jobs = []
+    for line_number, line in enumerate(input_file, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            jobs.append(validate_batch_job(json.loads(line)))
+        except ValueError as e:
+            err_console.print(f"[red]Skipping line {line_number}: {str(e)}[/red]")
+    
+    if not jobs:
+        err_console.print("[yellow]No jobs to review[/yellow]")
+        return
+    
+    orchestrator = _create_orchestrator()
+    err_console.print(f"[bold blue]Reviewing {len(jobs)} PRs "
+                      f"(concurrency {concurrency or settings.batch_max_concurrency})[/bold blue]")
+    
+    async def run_batch():
+        succeeded = 0
+        async for result in orchestrator.areview_batch(jobs, concurrency, default_criteria=criteria):
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+            if result["success"]:
+                succeeded += 1
+        return succeeded
+    
+    succeeded = asyncio.run(run_batch())
+    err_console.print(f"[green]{succeeded}/{len(jobs)} reviews succeeded[/green]")
+
+
 @cli.command()
 @click.option('--session-id', help='Specific session ID to view')
 @click.option('--output', '-o', help='Output file for results')
-def sessions(session_id, output):
+@click.option('--reindex', is_flag=True, help='Index logged sessions missing from the session index')
+def sessions(session_id, output, reindex):
     """List review sessions or view a specific session."""
     
-    orchestrator = ReviewOrchestrator()
+    orchestrator = _create_orchestrator()
+    
+    if reindex:
+        added = orchestrator.reindex_sessions()
+        console.print(f"[green]Indexed {added} sessions[/green]")
     
     if session_id:
         # View specific session
@@ -96,21 +181,30 @@ def sessions(session_id, output):
 @cli.command()
 @click.argument('session_id')
 @click.option('--criteria', help='New criteria for replay')
+@click.option('--live', is_flag=True, help='Re-run against GitHub and the model instead of the recording')
 @click.option('--output', '-o', help='Output file for results')
-def replay(session_id, criteria, output):
-    """Replay a review session with optional new criteria."""
+def replay(session_id, criteria, live, output):
+    """Replay a review session with optional new criteria.
     
-    if not settings.openai_api_key:
+    Without --criteria or --live the session is replayed offline from its
+    recorded responses and diffed against the original review.
+    """
+    
+    offline = not criteria and not live
+    if not offline and not settings.openai_api_key:
         console.print("[red]Error: OpenAI API key not found. Set OPENAI_API_KEY environment variable.[/red]")
         return
     
-    orchestrator = ReviewOrchestrator()
+    orchestrator = _create_orchestrator()
     
     console.print(Panel(f"[bold blue]Replaying Session[/bold blue]\n"
                        f"Session ID: {session_id}\n"
+                       f"Mode: {'Offline (recorded responses)' if offline else 'Live'}\n"
                        f"New Criteria: {criteria or 'Original criteria'}", 
                        title="Replay Configuration"))
     
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -119,13 +213,17 @@ def replay(session_id, criteria, output):
         task = progress.add_task("Replaying session...", total=None)
         
         try:
-            result = orchestrator.replay_session(session_id, criteria)
+            result = orchestrator.replay_session(session_id, criteria, live=live)
             progress.update(task, description="Replay completed!")
             
             if "error" in result:
                 console.print(f"[red]Replay failed: {result['error']}[/red]")
+            elif offline:
+                _display_replay_diff(result, output)
             else:
                 _display_review_results(result, output)
+                if result.get("replay"):
+                    _display_replay_comparison(result["replay"])
                 
         except Exception as e:
             progress.update(task, description="Replay failed!")
@@ -133,18 +231,164 @@ def replay(session_id, criteria, output):
 
 
 @cli.command()
-def stats():
+@click.option('--since', help='Only count sessions started on or after this date (YYYY-MM-DD)')
+@click.option('--repo', help='Only count sessions for this repository')
+def stats(since, repo):
     """Show review statistics."""
     
-    orchestrator = ReviewOrchestrator()
+    orchestrator = _create_orchestrator()
     
     try:
-        stats = orchestrator.get_review_statistics()
+        stats = orchestrator.get_review_statistics(repo=repo, since=since)
         _display_statistics(stats)
     except Exception as e:
         console.print(f"[red]Error getting statistics: {str(e)}[/red]")
 
 
+@cli.command()
+@click.option('--days-to-keep', type=int, default=None, help='Delete sessions older than this many days')
+@click.option('--archive-after-days', type=int, default=None, help='Archive sessions older than this many days')
+def cleanup(days_to_keep, archive_after_days):
+    """Compact, archive and expire old session logs."""
+    
+    orchestrator = _create_orchestrator()
+    
+    try:
+        result = orchestrator.cleanup_old_sessions(days_to_keep, archive_after_days)
+        console.print(Panel(
+            f"[bold blue]Session Cleanup[/bold blue]\n"
+            f"Archived Sessions: {result['archived_sessions']}\n"
+            f"Deleted Sessions: {result['deleted_sessions']}\n"
+            f"Deleted Archive Days: {len(result['deleted_archive_days'])}\n"
+            f"Archive Size: {result['archive_size_bytes'] / 1024:.1f} KiB",
+            title="Retention"
+        ))
+    except Exception as e:
+        console.print(f"[red]Error during cleanup: {str(e)}[/red]")
+
+
+@cli.command()
+@click.option('--host', default=None, help='Interface to bind (default from settings)')
+@click.option('--port', type=int, default=None, help='TCP port (default from settings)')
+@click.option('--unix-socket', help='Listen on this Unix socket path instead of TCP')
+@click.option('--workers', type=int, default=0, help='Also run queued jobs on this many workers')
+def serve(host, port, unix_socket, workers):
+    """Run a long-lived review server that keeps clients and caches warm."""
+    from agent.jobs.job_queue import JobQueue
+    from agent.jobs.worker_pool import ReviewWorkerPool
+    from agent.server.review_server import ReviewServer
+    
+    orchestrator = _create_orchestrator()
+    job_queue = JobQueue()
+    worker_pool = ReviewWorkerPool(orchestrator, job_queue, workers=workers) if workers else None
+    server = ReviewServer(orchestrator, host=host, port=port, unix_socket=unix_socket,
+                          job_queue=job_queue, worker_pool=worker_pool)
+    
+    async def run_server():
+        await server.start()
+        console.print(Panel(f"[bold blue]Review Server[/bold blue]\n"
+                           f"Listening on {server.address}\n"
+                           f"Routes: /review /replay /sessions /stats /jobs /health\n"
+                           f"Queue Workers: {workers or 'none'}",
+                           title="Serving"))
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+    
+    try:
+        asyncio.run(run_server())
+    except KeyboardInterrupt:
+        console.print("[yellow]Server stopped[/yellow]")
+    except FileExistsError as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+
+
+@cli.group()
+def queue():
+    """Queue reviews and run them on a worker pool."""
+
+
+@queue.command('enqueue')
+@click.option('--repo', required=True, help='Repository name')
+@click.option('--pr', required=True, type=int, help='Pull request number')
+@click.option('--criteria', default='strict style', help='Review criteria')
+@click.option('--head-sha', help='PR head commit; repeated jobs for the same commit are deduplicated')
+@click.option('--priority', type=click.Choice(['high', 'normal', 'low']), default='normal', help='Job priority')
+def queue_enqueue(repo, pr, criteria, head_sha, priority):
+    """Add a review job to the queue."""
+    from agent.jobs.job_queue import JobQueue, QueueFull
+    
+    try:
+        job = JobQueue().enqueue(repo, pr, criteria, head_sha=head_sha, priority=priority)
+    except QueueFull as e:
+        console.print(f"[red]{str(e)}[/red]")
+        return
+    console.print(f"[green]Job {job.job_id} {job.status}[/green] ({job.repo}#{job.pr_number}, {criteria})")
+
+
+@queue.command('work')
+@click.option('--workers', '-w', type=int, default=None, help='Reviews in flight at once (default from settings)')
+@click.option('--per-repo-limit', type=int, default=None, help='Running jobs per repository (0 for no cap)')
+@click.option('--drain', is_flag=True, help='Exit once the queue is empty instead of waiting for new jobs')
+def queue_work(workers, per_repo_limit, drain):
+    """Run queued review jobs."""
+    from agent.jobs.job_queue import JobQueue
+    from agent.jobs.worker_pool import ReviewWorkerPool
+    
+    if not settings.openai_api_key:
+        console.print("[red]Error: OpenAI API key not found. Set OPENAI_API_KEY environment variable.[/red]")
+        return
+    
+    pool = ReviewWorkerPool(_create_orchestrator(), JobQueue(), workers=workers, per_repo_limit=per_repo_limit)
+    console.print(f"[bold blue]Running {pool.workers} workers "
+                  f"(per-repo limit {pool.per_repo_limit or 'none'})[/bold blue]")
+    try:
+        processed = asyncio.run(pool.run(stop_when_idle=drain))
+    except KeyboardInterrupt:
+        processed = pool.processed
+    console.print(f"[green]{processed['succeeded']} succeeded[/green], "
+                  f"{processed['retried']} retried, [red]{processed['failed']} failed[/red], "
+                  f"{processed['lost']} lost their lease")
+
+
+@queue.command('stats')
+@click.option('--json', 'as_json', is_flag=True, help='Print the raw metrics as JSON')
+def queue_stats(as_json):
+    """Show queue depth, running jobs and wait times."""
+    from agent.jobs.job_queue import JobQueue
+    
+    metrics = JobQueue().metrics()
+    if as_json:
+        click.echo(json.dumps(metrics, indent=2))
+        return
+    
+    wait = metrics["wait_seconds"]
+    
+    def seconds(value):
+        return "-" if value is None else f"{value:.1f}s"
+    
+    console.print(Panel(
+        f"[bold blue]Job Queue[/bold blue]\n"
+        f"Queued: {metrics['depth']} / {metrics['max_depth'] or 'unbounded'} "
+        f"({', '.join(f'{name}: {count}' for name, count in metrics['queued_by_priority'].items()) or 'empty'})\n"
+        f"Running: {metrics['running']}\n"
+        f"Succeeded: {metrics['succeeded']}  Failed: {metrics['failed']}\n"
+        f"Oldest Queued: {seconds(metrics['oldest_queued_age_seconds'])}\n"
+        f"Wait (last hour, {wait['count']} jobs): mean {seconds(wait['mean'])}, "
+        f"p50 {seconds(wait['p50'])}, p95 {seconds(wait['p95'])}",
+        title="Queue Metrics"
+    ))
+    
+    if metrics["running_by_repo"]:
+        table = Table(title="Running by Repository")
+        table.add_column("Repository", style="cyan")
+        table.add_column("Running", style="yellow")
+        for repo, count in metrics["running_by_repo"].items():
+            table.add_row(repo, str(count))
+        console.print(table)
+
+
 @cli.command()
 def config():
     """Show current configuration."""
@@ -156,7 +400,9 @@ def config():
         f"Top P: {settings.openai_top_p}\n"
         f"Logs Directory: {settings.logs_dir}\n"
         f"Max Retrieval Docs: {settings.max_retrieval_docs}\n"
-        f"Max Context Length: {settings.max_context_length}",
+        f"Max Context Length: {settings.max_context_length}\n"
+        f"Retrieval Concurrency: {settings.retrieval_max_concurrency}\n"
+        f"LLM Response Cache: {'enabled' if settings.llm_cache_enabled else 'disabled'}",
         title="Current Settings"
     ))
 
@@ -238,6 +484,83 @@ def _display_review_results(result, output_file):
             console.print(f"[red]Error saving to file: {str(e)}[/red]")
 
 
+def _display_multi_review_results(result, output_file):
+    """Display each per-criteria review of a combined session."""
+    
+    for criteria_text, review in result["reviews"].items():
+        console.rule(f"[bold]{criteria_text}[/bold]")
+        _display_review_results({"session_id": f"{result['session_id']} ({criteria_text})", "review": review}, None)
+    
+    # Save to file if requested
+    if output_file:
+        try:
+            with open(output_file, 'w') as f:
+                json.dump(result, f, indent=2, default=str)
+            console.print(f"[green]Results saved to {output_file}[/green]")
+        except Exception as e:
+            console.print(f"[red]Error saving to file: {str(e)}[/red]")
+
+
+def _display_replay_diff(result, output_file):
+    """Display the outcome of an offline replay against the original review."""
+    
+    calls = result["model_calls"]
+    status = "[green]Identical to original[/green]" if result["identical"] else "[yellow]Differs from original[/yellow]"
+    console.print(Panel(
+        f"{status}\n"
+        f"Model calls: {calls['served']} served / {calls['recorded']} recorded / {calls['missed']} missed\n"
+        f"Duration: {result['duration_ms']} ms",
+        title=f"Replay - Session {result['session_id']}"
+    ))
+    
+    differences = result["differences"]
+    if differences:
+        diff_table = Table(title="Differences")
+        diff_table.add_column("Field", style="cyan")
+        diff_table.add_column("Original", style="red")
+        diff_table.add_column("Replayed", style="green")
+        
+        for field, change in differences.items():
+            if field == "comments":
+                for comment in change["removed"]:
+                    diff_table.add_row("comment", f"{comment['file_path']}:{comment['line_number']} {comment['comment_text']}", "")
+                for comment in change["added"]:
+                    diff_table.add_row("comment", "", f"{comment['file_path']}:{comment['line_number']} {comment['comment_text']}")
+            else:
+                diff_table.add_row(field, str(change["original"]), str(change["replayed"]))
+        
+        console.print(diff_table)
+    
+    # Save to file if requested
+    if output_file:
+        try:
+            with open(output_file, 'w') as f:
+                json.dump(result, f, indent=2, default=str)
+            console.print(f"[green]Replay saved to {output_file}[/green]")
+        except Exception as e:
+            console.print(f"[red]Error saving to file: {str(e)}[/red]")
+
+
+def _display_replay_comparison(replay_info):
+    """Display a replayed review side by side with the original."""
+    
+    console.print(f"[dim]Reused stages: {', '.join(replay_info['reused_stages']) or 'none'}[/dim]")
+    console.print(f"[dim]Recomputed stages: {', '.join(replay_info['recomputed_stages'])}[/dim]")
+    
+    table = Table(title=f"Original ({replay_info['original_session_id']}) vs Replay")
+    table.add_column("Field", style="cyan")
+    table.add_column("Original", style="white")
+    table.add_column("Replay", style="white")
+    
+    for row in replay_info["comparison"]:
+        style = "yellow" if row["changed"] else None
+        original = "" if row["original"] is None else str(row["original"])
+        replayed = "" if row["replayed"] is None else str(row["replayed"])
+        table.add_row(row["field"], original, replayed, style=style)
+    
+    console.print(table)
+
+
 def _display_sessions_list(sessions_list, output_file):
     """Display list of review sessions."""
     
@@ -358,6 +681,28 @@ def _display_statistics(stats):
             repo_table.add_row(repo, str(count))
         
         console.print(repo_table)
+    
+    # Preset distribution
+    if stats.get('preset_distribution'):
+        preset_table = Table(title="Criteria Preset Distribution")
+        preset_table.add_column("Preset", style="cyan")
+        preset_table.add_column("Count", style="green")
+        
+        for preset, count in sorted(stats['preset_distribution'].items(), key=lambda x: x[1], reverse=True):
+            preset_table.add_row(preset, str(count))
+        
+        console.print(preset_table)
+    
+    # Daily rollup
+    if stats.get('daily_distribution'):
+        daily_table = Table(title="Sessions per Day")
+        daily_table.add_column("Day", style="cyan")
+        daily_table.add_column("Count", style="green")
+        
+        for day, count in sorted(stats['daily_distribution'].items()):
+            daily_table.add_row(day, str(count))
+        
+        console.print(daily_table)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import re
 from app_logging.schemas.models import RetrievedDocument
 
@@ -48,16 +48,22 @@ class CriteriaProcessor:
     
     def process_criteria(self, criteria_text: str) -> Dict[str, Any]:
         """Process user-provided criteria and return structured guidelines."""
-        criteria_lower = criteria_text.lower().strip()
-        
         # Check for preset criteria
-        for preset_name, preset_data in self.preset_criteria.items():
-            if preset_name in criteria_lower:
-                return self._enhance_preset_criteria(preset_name, preset_data, criteria_text)
+        preset_name = self.match_preset(criteria_text)
+        if preset_name is not None:
+            return self._enhance_preset_criteria(preset_name, self.preset_criteria[preset_name], criteria_text)
         
         # Process custom criteria
         return self._process_custom_criteria(criteria_text)
     
+    def match_preset(self, criteria_text: Optional[str]) -> Optional[str]:
+        """Name of the preset the criteria text selects, or None for custom criteria."""
+        criteria_lower = (criteria_text or "").lower().strip()
+        for preset_name in self.preset_criteria:
+            if preset_name in criteria_lower:
+                return preset_name
+        return None
+    
     def _enhance_preset_criteria(self, preset_name: str, preset_data: Dict[str, Any], 
                                 custom_text: str) -> Dict[str, Any]:
         """Enhance preset criteria with custom additions."""
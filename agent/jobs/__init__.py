@@ -0,0 +1,3 @@
+"""
+Durable review job queue and worker pool.
+"""
@@ -0,0 +1,312 @@
+from typing import List, Dict, Any, Optional, Union
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+from config.settings import settings
+
+
+# Named priority levels; lower values are claimed first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Statuses a job can be in; "queued" and "running" are active
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class QueueFull(Exception):
+    """Raised when enqueueing would exceed ``settings.job_max_depth`` queued jobs."""
+
+
+@dataclass
+class Job:
+    """One queued review."""
+    job_id: int
+    repo: str
+    pr_number: int
+    head_sha: Optional[str]
+    criteria_text: str
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    enqueued_at: float
+    available_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    lease_expires_at: Optional[float] = None
+    session_id: Optional[str] = None
+    last_error: Optional[str] = None
+
+
+def _priority_value(priority: Union[str, int]) -> int:
+    if isinstance(priority, int):
+        return priority
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}; use one of {', '.join(PRIORITIES)}")
+    return PRIORITIES[priority]
+
+
+class JobQueue:
+    """Durable SQLite queue of review jobs.
+
+    Jobs are claimed by priority, then age, skipping repositories that already
+    have ``per_repo_limit`` jobs running. A claim holds a lease that its worker
+    extends with ``heartbeat``; jobs whose lease expired (their worker died) go
+    back to the queue, or fail once they used up their attempts. The lease
+    expiry returned by the claim identifies it, so a worker whose lease was
+    lost can no longer complete or fail the job. Failed attempts are retried
+    with exponential backoff until ``max_attempts``.
+
+    Jobs are deduplicated on (repo, PR, head SHA, criteria): enqueueing a job
+    that is already queued, running or (for a known head SHA) succeeded
+    returns the existing job instead of adding another. New jobs are refused
+    with QueueFull once ``max_depth`` jobs are waiting.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_depth: Optional[int] = None):
+        self.max_depth = settings.job_max_depth if max_depth is None else max_depth
+        db_path = db_path or settings.job_queue_path or str(Path(settings.logs_dir) / "job_queue.db")
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Autocommit mode; every write runs in an explicit BEGIN IMMEDIATE so
+        # several worker processes can share one queue file
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                repo TEXT NOT NULL,
+                pr_number INTEGER NOT NULL,
+                head_sha TEXT,
+                criteria_text TEXT NOT NULL,
+                dedup_key TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                enqueued_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                lease_expires_at REAL,
+                session_id TEXT,
+                last_error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, available_at, job_id);
+            CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+            """
+        )
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def dedup_key(repo: str, pr_number: int, head_sha: Optional[str], criteria_text: str) -> str:
+        return f"{repo}#{pr_number}@{head_sha or ''}:{criteria_text}"
+
+    def enqueue(self, repo: str, pr_number: int, criteria_text: str, head_sha: Optional[str] = None,
+                priority: Union[str, int] = "normal", max_attempts: Optional[int] = None) -> Job:
+        """Add a job, or return the existing job for the same (repo, PR, head SHA, criteria)."""
+        key = self.dedup_key(repo, pr_number, head_sha, criteria_text)
+        # Without a head SHA a finished review may be for older commits, so only active jobs count
+        duplicate_statuses = (QUEUED, RUNNING, SUCCEEDED) if head_sha else (QUEUED, RUNNING)
+        now = time.time()
+
+        with self._transaction() as conn:
+            existing = conn.execute(
+                f"""SELECT * FROM jobs WHERE dedup_key = ? AND status IN ({', '.join('?' * len(duplicate_statuses))})
+                    ORDER BY job_id DESC LIMIT 1""",
+                (key, *duplicate_statuses)
+            ).fetchone()
+            if existing is not None:
+                # A repeat at higher priority promotes the queued job
+                new_priority = _priority_value(priority)
+                if existing["status"] == QUEUED and new_priority < existing["priority"]:
+                    conn.execute("UPDATE jobs SET priority = ? WHERE job_id = ?", (new_priority, existing["job_id"]))
+                    return self._job(conn.execute("SELECT * FROM jobs WHERE job_id = ?",
+                                                  (existing["job_id"],)).fetchone())
+                return self._job(existing)
+
+            if self.max_depth:
+                depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+                if depth >= self.max_depth:
+                    raise QueueFull(f"Job queue is full ({depth} queued jobs)")
+
+            cursor = conn.execute(
+                """INSERT INTO jobs (repo, pr_number, head_sha, criteria_text, dedup_key, priority, status,
+                                     max_attempts, enqueued_at, available_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (repo, pr_number, head_sha, criteria_text, key, _priority_value(priority), QUEUED,
+                 max_attempts or settings.job_max_attempts, now, now)
+            )
+            return self._job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (cursor.lastrowid,)).fetchone())
+
+    def claim(self, per_repo_limit: Optional[int] = None) -> Optional[Job]:
+        """Lease the next runnable job, or return None when nothing can run now."""
+        per_repo_limit = settings.job_per_repo_limit if per_repo_limit is None else per_repo_limit
+        now = time.time()
+
+        with self._transaction() as conn:
+            # Jobs whose worker died without finishing go back to the queue unless out of attempts
+            conn.execute(
+                """UPDATE jobs SET status = ?, finished_at = ?, lease_expires_at = NULL,
+                                  last_error = 'Lease expired after ' || attempts || ' attempts'
+                   WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts""",
+                (FAILED, now, RUNNING, now)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_expires_at = NULL WHERE status = ? AND lease_expires_at < ?",
+                (QUEUED, RUNNING, now)
+            )
+            running = {
+                row["repo"]: row["running"]
+                for row in conn.execute("SELECT repo, COUNT(*) AS running FROM jobs WHERE status = ? GROUP BY repo",
+                                        (RUNNING,))
+            }
+            candidates = conn.execute(
+                """SELECT * FROM jobs WHERE status = ? AND available_at <= ?
+                   ORDER BY priority, available_at, job_id""",
+                (QUEUED, now)
+            )
+            for row in candidates:
+                if per_repo_limit and running.get(row["repo"], 0) >= per_repo_limit:
+                    continue
+                conn.execute(
+                    """UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_expires_at = ?
+                       WHERE job_id = ?""",
+                    (RUNNING, now, now + settings.job_lease_seconds, row["job_id"])
+                )
+                return self._job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone())
+        return None
+
+    def heartbeat(self, job_id: int, lease_expires_at: float) -> Optional[float]:
+        """Extend a held lease by ``job_lease_seconds``; returns the new expiry, or None if the lease was lost."""
+        renewed = time.time() + settings.job_lease_seconds
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE job_id = ? AND status = ? AND lease_expires_at = ?",
+                (renewed, job_id, RUNNING, lease_expires_at)
+            )
+        return renewed if cursor.rowcount else None
+
+    def complete(self, job_id: int, lease_expires_at: float, session_id: Optional[str] = None) -> bool:
+        """Mark a running job as succeeded; False if the lease was lost and the job left untouched."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """UPDATE jobs SET status = ?, finished_at = ?, lease_expires_at = NULL, session_id = ?, last_error = NULL
+                   WHERE job_id = ? AND status = ? AND lease_expires_at = ?""",
+                (SUCCEEDED, time.time(), session_id, job_id, RUNNING, lease_expires_at)
+            )
+        return bool(cursor.rowcount)
+
+    def fail(self, job_id: int, lease_expires_at: float, error: str,
+             session_id: Optional[str] = None) -> Optional[Job]:
+        """Record a failed attempt: requeue with backoff, or mark failed after the last attempt.
+
+        Returns None, leaving the job untouched, if the lease was lost.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ? AND status = ? AND lease_expires_at = ?",
+                               (job_id, RUNNING, lease_expires_at)).fetchone()
+            if row is None:
+                return None
+            if row["attempts"] < row["max_attempts"]:
+                delay = min(settings.job_backoff_seconds * 2 ** (row["attempts"] - 1), settings.job_backoff_max_seconds)
+                conn.execute(
+                    """UPDATE jobs SET status = ?, available_at = ?, lease_expires_at = NULL, session_id = ?, last_error = ?
+                       WHERE job_id = ?""",
+                    (QUEUED, now + delay, session_id, error, job_id)
+                )
+            else:
+                conn.execute(
+                    """UPDATE jobs SET status = ?, finished_at = ?, lease_expires_at = NULL, session_id = ?, last_error = ?
+                       WHERE job_id = ?""",
+                    (FAILED, now, session_id, error, job_id)
+                )
+            return self._job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Most recent jobs first, optionally filtered by status."""
+        query, params = "SELECT * FROM jobs", []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY job_id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [self._job(row) for row in self._conn.execute(query, params)]
+
+    def active_count(self) -> int:
+        """Jobs queued (including those waiting out a backoff) or running."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)",
+                                      (QUEUED, RUNNING)).fetchone()[0]
+
+    def metrics(self, window_seconds: int = 3600) -> Dict[str, Any]:
+        """Queue depth per status and priority, running jobs per repo, and wait times.
+
+        Wait time is the time from enqueue to the latest claim, over jobs
+        started within ``window_seconds``.
+        """
+        now = time.time()
+        priority_names = {value: name for name, value in PRIORITIES.items()}
+        with self._lock:
+            by_status = {row["status"]: row["count"] for row in self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")}
+            queued_by_priority = {
+                priority_names.get(row["priority"], str(row["priority"])): row["count"]
+                for row in self._conn.execute(
+                    "SELECT priority, COUNT(*) AS count FROM jobs WHERE status = ? GROUP BY priority", (QUEUED,))
+            }
+            running_by_repo = {row["repo"]: row["count"] for row in self._conn.execute(
+                "SELECT repo, COUNT(*) AS count FROM jobs WHERE status = ? GROUP BY repo", (RUNNING,))}
+            oldest = self._conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            waits = sorted(row[0] for row in self._conn.execute(
+                "SELECT started_at - enqueued_at FROM jobs WHERE started_at >= ?", (now - window_seconds,)))
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))], 3)
+
+        return {
+            "depth": by_status.get(QUEUED, 0),
+            "max_depth": self.max_depth,
+            "running": by_status.get(RUNNING, 0),
+            "succeeded": by_status.get(SUCCEEDED, 0),
+            "failed": by_status.get(FAILED, 0),
+            "queued_by_priority": queued_by_priority,
+            "running_by_repo": running_by_repo,
+            "oldest_queued_age_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "wait_seconds": {
+                "window_seconds": window_seconds,
+                "count": len(waits),
+                "mean": round(sum(waits) / len(waits), 3) if waits else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 3) if waits else None
+            }
+        }
+
+    def _job(self, row: sqlite3.Row) -> Job:
+        return Job(**{field: row[field] for field in Job.__dataclass_fields__})
@@ -0,0 +1,94 @@
+from typing import Dict, Any, Optional
+import asyncio
+
+from config.settings import settings
+from .job_queue import JobQueue, Job
+
+
+class ReviewWorkerPool:
+    """Runs queued review jobs on a fixed number of workers.
+
+    Workers share one orchestrator, so every job reuses the same GitHub client,
+    model client and caches. A worker only claims a job when it is free, which
+    keeps at most ``workers`` reviews in flight regardless of queue depth; the
+    queue itself enforces the per-repository cap. While a review runs its
+    worker renews the job's lease every ``heartbeat_interval`` seconds.
+    """
+
+    def __init__(self, orchestrator: Any, job_queue: JobQueue, workers: Optional[int] = None,
+                 per_repo_limit: Optional[int] = None, poll_interval: Optional[float] = None,
+                 heartbeat_interval: Optional[float] = None):
+        self.orchestrator = orchestrator
+        self.job_queue = job_queue
+        self.workers = workers or settings.job_workers
+        self.per_repo_limit = settings.job_per_repo_limit if per_repo_limit is None else per_repo_limit
+        self.poll_interval = settings.job_poll_interval_seconds if poll_interval is None else poll_interval
+        self.heartbeat_interval = (settings.job_heartbeat_seconds if heartbeat_interval is None
+                                   else heartbeat_interval)
+        self.processed = {"succeeded": 0, "retried": 0, "failed": 0, "lost": 0}
+        self._stopping = False
+
+    def stop(self):
+        """Let workers finish their current job and exit."""
+        self._stopping = True
+
+    async def run(self, stop_when_idle: bool = False) -> Dict[str, int]:
+        """Run the workers until stopped, or until the queue drains when ``stop_when_idle``."""
+        self._stopping = False
+        await asyncio.gather(*(self._worker(stop_when_idle) for _ in range(self.workers)))
+        return dict(self.processed)
+
+    async def _worker(self, stop_when_idle: bool):
+        while not self._stopping:
+            job = await asyncio.to_thread(self.job_queue.claim, self.per_repo_limit)
+            if job is None:
+                # Jobs still waiting on a backoff or a busy repository keep the pool alive
+                if stop_when_idle and await asyncio.to_thread(self.job_queue.active_count) == 0:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.run_job(job)
+
+    async def run_job(self, job: Job) -> Job:
+        """Review one claimed job and record the outcome in the queue.
+
+        If the lease was lost meanwhile (another worker reclaimed the job) the
+        outcome is dropped and counted as ``lost``.
+        """
+        done = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job, done))
+        try:
+            result = await self.orchestrator.areview_pull_request(job.repo, job.pr_number, job.criteria_text)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        finally:
+            # Let an in-flight renewal finish so the lease below is the current one
+            done.set()
+            await heartbeat
+
+        if result.get("success"):
+            recorded = await asyncio.to_thread(self.job_queue.complete, job.job_id, job.lease_expires_at,
+                                               result.get("session_id"))
+            self.processed["succeeded" if recorded else "lost"] += 1
+            return await asyncio.to_thread(self.job_queue.get, job.job_id)
+
+        updated = await asyncio.to_thread(self.job_queue.fail, job.job_id, job.lease_expires_at,
+                                          result.get("error") or "Review failed", result.get("session_id"))
+        if updated is None:
+            self.processed["lost"] += 1
+            return await asyncio.to_thread(self.job_queue.get, job.job_id)
+        self.processed["failed" if updated.status == "failed" else "retried"] += 1
+        return updated
+
+    async def _heartbeat(self, job: Job, done: asyncio.Event):
+        """Renew the job's lease until ``done`` is set or the lease is lost."""
+        while True:
+            try:
+                await asyncio.wait_for(done.wait(), self.heartbeat_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            renewed = await asyncio.to_thread(self.job_queue.heartbeat, job.job_id, job.lease_expires_at)
+            if renewed is None:
+                return
+            job.lease_expires_at = renewed
@@ -0,0 +1,396 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter
+import time
+
+from langchain.schema import AIMessage, BaseMessage
+
+from app_logging.schemas.models import PRReview, ReasoningStep, RetrievedDocument
+from ..criteria.criteria_processor import CriteriaProcessor
+from ..providers.github_client import GitHubProvider, PRInfo, FileDiff
+from ..retrieval.context_packer import ContextPacker, _heuristic_token_count
+from ..reviewer.pr_reviewer import PRReviewer
+from ..reviewer.response_cache import ResponseCache
+from ..reviewer.stages import STAGE_ORDER, reusable_stages
+from ..storage.blob_store import BlobStore, to_jsonable
+from ..storage.session_archive import compact_steps
+
+
+class ReplayMiss(Exception):
+    """Raised when a replay needs a provider or model response that was never recorded."""
+
+
+class RecordedGitHubClient(GitHubProvider):
+    """Serves the PR recorded in a session; every other provider call is a replay miss."""
+
+    def __init__(self, repo: str, pr_info: PRInfo):
+        self.repo = repo
+        self.pr_info = pr_info
+
+    def get_pr(self, repo: str, pr_number: int) -> PRInfo:
+        if repo != self.repo or pr_number != self.pr_info.pr_number:
+            raise ReplayMiss(f"No recorded PR {repo}#{pr_number}")
+        return self.pr_info
+
+    def get_file_content(self, repo: str, file_path: str, ref: str = "main") -> str:
+        raise ReplayMiss(f"No recorded content for {file_path}@{ref}")
+
+    def get_repo_files(self, repo: str, ref: str = "main") -> List[str]:
+        raise ReplayMiss(f"No recorded file list for {repo}@{ref}")
+
+    def get_commit_history(self, repo: str, file_path: str, limit: int = 5) -> List[Dict[str, Any]]:
+        raise ReplayMiss(f"No recorded commit history for {file_path}")
+
+
+class RecordedLLM:
+    """Stands in for the chat model, answering each prompt with its recorded response.
+
+    Prompts are matched on the same key the response cache uses, computed with
+    the model parameters the session was recorded with. Prompts that were never
+    recorded (because prompt construction changed since) are collected in
+    ``misses`` and raise ReplayMiss, which the reviewer handles like a model error.
+    """
+
+    def __init__(self, responses: Dict[str, str], model_params: Dict[str, Any]):
+        self.responses = responses
+        self.model_params = model_params
+        self.served: List[str] = []
+        self.misses: List[str] = []
+
+    async def ainvoke(self, messages: List[BaseMessage]) -> AIMessage:
+        key = ResponseCache.make_key(messages, self.model_params)
+        if key not in self.responses:
+            self.misses.append(key)
+            raise ReplayMiss(f"No recorded response for prompt {key[:12]}")
+        self.served.append(key)
+        return AIMessage(content=self.responses[key])
+
+    async def astream(self, messages: List[BaseMessage]):
+        yield await self.ainvoke(messages)
+
+
+class RecordedContextRetriever:
+    """Retriever for offline replays, where every retrieval stage is served from the recording.
+
+    Map-reduce reviews repack each file group from the recorded candidates, so
+    when the recorded context kept them, ``context_packer`` is rebuilt with the
+    budget, chunk size and tokenizer that packed the original context.
+    """
+
+    def __init__(self, context: Optional[Dict[str, Any]] = None, model: Optional[str] = None):
+        self.criteria_processor = CriteriaProcessor()
+        self.context_packer = None
+        packing = (context or {}).get("packing")
+        if isinstance(packing, dict) and "candidates" in context:
+            count_tokens = _heuristic_token_count if packing.get("tokenizer") == "heuristic" else None
+            self.context_packer = ContextPacker(model=model, budget_tokens=packing.get("budget_tokens"),
+                                                chunk_tokens=packing.get("chunk_tokens"),
+                                                count_tokens=count_tokens)
+
+    async def acollect_pr_candidates(self, repo: str, pr_info: Any) -> Dict[str, Any]:
+        raise ReplayMiss("PR documents were not recorded")
+
+    async def aget_enhanced_context(self, repo: str, pr_info: Any, criteria_data: Dict[str, Any],
+                                    pr_documents: Optional[List[RetrievedDocument]] = None,
+                                    pr_stages: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        raise ReplayMiss("Context was not recorded")
+
+
+class _ReplayStepLog:
+    """In-memory step sink so replays never write session logs or blobs."""
+
+    current_session = None
+
+    def __init__(self):
+        self.steps: List[ReasoningStep] = []
+
+    def log_step(self, step: ReasoningStep):
+        self.steps.append(step)
+
+
+class _ReplayReviewer(PRReviewer):
+    """PRReviewer that reuses the recorded file grouping and never touches the response cache."""
+
+    def __init__(self, session_logger: _ReplayStepLog, context_retriever: RecordedContextRetriever,
+                 llm: RecordedLLM, groups: Optional[List[List[str]]]):
+        super().__init__(session_logger, context_retriever, llm=llm, blob_store=BlobStore())
+        self.response_cache = None
+        self.recorded_groups = groups
+
+    def _plan_review_groups(self, pr_info: Any, context: Dict[str, Any]) -> List[List[Any]]:
+        # Grouping depends on the tokenizer available at record time, so replay the recorded plan
+        if not self.recorded_groups:
+            return [pr_info.files_changed]
+        diffs = {file_diff.file_path: file_diff for file_diff in pr_info.files_changed}
+        return [[diffs[path] for path in group if path in diffs] for group in self.recorded_groups]
+
+
+def collect_model_calls(value: Any) -> Dict[str, str]:
+    """Find every recorded ``{"prompt_key", "response"}`` pair in a step output."""
+    calls: Dict[str, str] = {}
+    if isinstance(value, dict):
+        if isinstance(value.get("prompt_key"), str) and isinstance(value.get("response"), str):
+            calls[value["prompt_key"]] = value["response"]
+        for item in value.values():
+            calls.update(collect_model_calls(item))
+    elif isinstance(value, list):
+        for item in value:
+            calls.update(collect_model_calls(item))
+    return calls
+
+
+def diff_reviews(original: Dict[str, Any], replayed: Dict[str, Any]) -> Dict[str, Any]:
+    """Field-level differences between two review dicts; comments are compared as multisets."""
+    differences: Dict[str, Any] = {}
+    for field in sorted(set(original) | set(replayed)):
+        if field == "comments":
+            continue
+        if original.get(field) != replayed.get(field):
+            differences[field] = {"original": original.get(field), "replayed": replayed.get(field)}
+
+    def comment_key(comment: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (comment.get("file_path"), comment.get("line_number"),
+                comment.get("severity"), comment.get("comment_text"))
+
+    original_comments = Counter(comment_key(c) for c in original.get("comments") or [])
+    replayed_comments = Counter(comment_key(c) for c in replayed.get("comments") or [])
+    removed = original_comments - replayed_comments
+    added = replayed_comments - original_comments
+    if removed or added:
+        fields = ("file_path", "line_number", "severity", "comment_text")
+        differences["comments"] = {
+            "removed": [dict(zip(fields, key)) for key in removed.elements()],
+            "added": [dict(zip(fields, key)) for key in added.elements()]
+        }
+    return differences
+
+
+def side_by_side(original: Dict[str, Any], replayed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Row-aligned comparison of two review dicts.
+
+    One row per summary field, one for package suggestions, then one per
+    commented ``file:line`` holding every comment at that location.
+    """
+    rows = []
+    for field in original:
+        if field in ("comments", "package_suggestions"):
+            continue
+        rows.append({"field": field, "original": original.get(field), "replayed": replayed.get(field)})
+
+    def package_names(review: Dict[str, Any]) -> str:
+        return ", ".join(package["name"] for package in review.get("package_suggestions") or [])
+
+    rows.append({"field": "package_suggestions", "original": package_names(original),
+                 "replayed": package_names(replayed)})
+
+    def comments_by_location(review: Dict[str, Any]) -> Dict[Tuple[str, int], str]:
+        located: Dict[Tuple[str, int], List[str]] = {}
+        for comment in review.get("comments") or []:
+            located.setdefault((comment["file_path"], comment["line_number"]), []).append(
+                f"[{comment.get('severity', 'info')}] {comment['comment_text']}")
+        return {location: "\n".join(texts) for location, texts in located.items()}
+
+    original_comments = comments_by_location(original)
+    replayed_comments = comments_by_location(replayed)
+    for file_path, line_number in sorted(set(original_comments) | set(replayed_comments)):
+        location = (file_path, line_number)
+        rows.append({"field": f"{file_path}:{line_number}", "original": original_comments.get(location, ""),
+                     "replayed": replayed_comments.get(location, "")})
+
+    for row in rows:
+        row["changed"] = row["original"] != row["replayed"]
+    return rows
+
+
+class ReplayEngine:
+    """Rebuilds a review from its recorded steps without network access or an API key.
+
+    The PR comes from the recorded retrieval input, the context from the
+    recorded retrieval output and every model call from the recorded responses.
+    Criteria processing, response parsing, comment anchoring and scoring are
+    executed again by the current code, and the result is diffed against the
+    session's original review, which makes a replay usable as a regression check.
+    """
+
+    def __init__(self, session_logger: Any, blob_store: BlobStore):
+        self.session_logger = session_logger
+        self.blob_store = blob_store
+
+    async def areplay(self, session_id: str) -> Dict[str, Any]:
+        """Replay one session offline and diff it against the original run.
+
+        Retrieval stages are served from the recording; every later stage runs
+        again with the model answering from its recorded responses. Sessions
+        reviewed under several criteria sets replay each set from its
+        ``criteria_<n>/`` steps and diff the recombined review.
+        """
+        started = time.perf_counter()
+        recording = self.load_recording(session_id)
+        if "error" in recording:
+            return recording
+        parts = recording.get("criteria_recordings") or [recording]
+        if any("context_retrieval" not in part["stages"] for part in parts):
+            return {"error": "Session did not record its retrieved context"}
+        if not all(part["responses"] for part in parts):
+            return {"error": "Session has no recorded model responses; only sessions recorded "
+                             "since raw responses are logged can be replayed offline"}
+
+        provider = RecordedGitHubClient(recording["repo"], recording["pr_info"])
+        pr_info = provider.get_pr(recording["repo"], recording["pr_number"])
+        reviews: Dict[str, PRReview] = {}
+        differences: Dict[str, Any] = {}
+        served = missed = 0
+        for index, part in enumerate(parts):
+            llm = RecordedLLM(part["responses"], part["model_params"])
+            step_log = _ReplayStepLog()
+            retriever = RecordedContextRetriever(part["stages"]["context_retrieval"]["context_summary"],
+                                                 part["model_params"].get("model"))
+            reviewer = _ReplayReviewer(step_log, retriever, llm, part["groups"])
+            recorded_stages = {stage: output for stage, output in part["stages"].items()
+                               if stage in ("pr_retrieval", "context_retrieval")}
+
+            reviews[part["criteria_text"]] = await reviewer.areview_pr(
+                recording["repo"], pr_info, part["criteria_text"], recorded_stages=recorded_stages)
+
+            served, missed = served + len(llm.served), missed + len(llm.misses)
+            replayed_steps = {step.step_id: step for step in step_log.steps}
+            criteria_data = to_jsonable(replayed_steps["criteria_processing"].output.get("criteria_data"))
+            if criteria_data != part["criteria_data"]:
+                key = "criteria_data" if part is recording else f"criteria_{index}/criteria_data"
+                differences[key] = {"original": part["criteria_data"], "replayed": criteria_data}
+
+        if recording.get("criteria_sets"):
+            review = PRReviewer.combine_criteria_reviews(reviews)
+        else:
+            review = reviews[recording["criteria_text"]]
+        replayed = review.model_dump(mode="json")
+        differences = {**diff_reviews(recording["original_review"], replayed), **differences}
+
+        return {
+            "session_id": session_id,
+            "identical": not differences and not missed,
+            "differences": differences,
+            "model_calls": {"recorded": sum(len(part["responses"]) for part in parts), "served": served,
+                            "missed": missed},
+            "review": replayed,
+            "original_review": recording["original_review"],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def reusable_outputs(self, recording: Dict[str, Any], changed: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Recorded stage outputs that stay valid when ``changed`` inputs change."""
+        return {stage: recording["stages"][stage] for stage in reusable_stages(changed)
+                if stage in recording["stages"]}
+
+    def load_recording(self, session_id: str) -> Dict[str, Any]:
+        """Collect the recorded inputs, stage outputs, responses and outcome of a session.
+
+        For multi-criteria sessions ``criteria_sets`` lists the criteria and
+        ``criteria_recordings`` holds one recording per set, built from its
+        ``criteria_<n>/`` steps; the top-level stages are the shared ones.
+        """
+        session = self.session_logger.get_session(session_id)
+        if not session:
+            return {"error": "Session not found"}
+
+        steps: Dict[str, Dict[str, Any]] = {}
+        for step in compact_steps(self.session_logger.get_session_steps(session_id)):
+            steps[step.step_id] = {
+                "input": self.blob_store.resolve(session_id, step.input),
+                "output": self.blob_store.resolve(session_id, step.output),
+                "model_params": step.model_params
+            }
+
+        pr_step = steps.get("pr_retrieval") or steps.get("context_retrieval")
+        if not pr_step or "pr_info" not in pr_step["input"]:
+            return {"error": "Session did not record the reviewed PR"}
+
+        original_review = session.final_review.model_dump(mode="json") if session.final_review else (
+            steps.get("review_summary", {}).get("output", {}).get("summary"))
+        if not isinstance(original_review, dict):
+            return {"error": "Session has no review to compare against"}
+
+        pr_info = self._rebuild_pr_info(pr_step["input"]["pr_info"])
+        recording = {
+            "repo": pr_step["input"]["repo"],
+            "pr_number": pr_info.pr_number,
+            "pr_info": pr_info,
+            "criteria_text": session.criteria_text,
+            "criteria_sets": None,
+            "original_review": original_review,
+            **self._stage_recording(steps)
+        }
+
+        criteria_sets = (session.pr_info or {}).get("criteria_sets")
+        if criteria_sets:
+            recording["criteria_sets"] = list(criteria_sets)
+            recording["criteria_recordings"] = []
+            for index, criteria_text in enumerate(criteria_sets):
+                prefix = f"criteria_{index}/"
+                criteria_steps = {step_id[len(prefix):]: step for step_id, step in steps.items()
+                                  if step_id.startswith(prefix)}
+                criteria_steps.setdefault("pr_retrieval", steps.get("pr_retrieval", {"output": {}}))
+                recording["criteria_recordings"].append(
+                    {"criteria_text": criteria_text, **self._stage_recording(criteria_steps)})
+            recording["responses"] = {key: response for part in recording["criteria_recordings"]
+                                      for key, response in part["responses"].items()}
+        return recording
+
+    def _stage_recording(self, steps: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Rebuilt stage outputs, criteria data and model calls of one review's steps."""
+        stages = {}
+        for stage in STAGE_ORDER:
+            output = self._rebuild_stage_output(stage, steps.get(stage, {}).get("output", {}))
+            if output is not None:
+                stages[stage] = output
+        if "pr_retrieval" not in stages and "context_retrieval" in stages:
+            # Sessions recorded before PR retrieval was its own stage: the PR documents
+            # that made it into the packed context are the ones tagged with a type
+            stages["pr_retrieval"] = {"documents": [
+                doc for doc in stages["context_retrieval"]["context_summary"]["documents"]
+                if "type" in (doc.metadata or {})
+            ]}
+
+        generation = steps.get("review_generation", {"output": {}, "model_params": {}})
+        return {
+            "criteria_data": steps.get("criteria_processing", {}).get("output", {}).get("criteria_data"),
+            "stages": stages,
+            "responses": collect_model_calls(generation["output"]),
+            "model_params": generation["model_params"] or {},
+            "groups": generation["output"].get("groups") if generation["output"].get("strategy") == "map_reduce" else None
+        }
+
+    def _rebuild_stage_output(self, stage: str, output: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Turn a recorded step output back into the objects the stage produced.
+
+        Returns None for stages that never finished (their output is still the
+        placeholder logged when the step started).
+        """
+        output = {key: value for key, value in output.items() if key != "reused"}
+        if stage == "criteria_processing" and isinstance(output.get("criteria_data"), dict):
+            return output
+        if stage == "pr_retrieval" and isinstance(output.get("documents"), list):
+            return {**output, "documents": [RetrievedDocument.model_validate(doc) for doc in output["documents"]]}
+        if stage == "context_retrieval" and isinstance(output.get("context_summary"), dict):
+            context = self._rebuild_context(output["context_summary"])
+            return {**output, "retrieved_docs": context["documents"], "context_summary": context}
+        if stage == "review_generation" and isinstance(output.get("review"), dict):
+            return {**output, "review": PRReview.model_validate(output["review"])}
+        if stage == "review_summary" and isinstance(output.get("summary"), dict):
+            return {**output, "summary": PRReview.model_validate(output["summary"])}
+        return None
+
+    def _rebuild_pr_info(self, data: Dict[str, Any]) -> PRInfo:
+        files = [FileDiff(**file_diff) for file_diff in data.get("files_changed", [])]
+        return PRInfo(**{**data, "files_changed": files})
+
+    def _rebuild_context(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        context = dict(data)
+        context["documents"] = [RetrievedDocument.model_validate(doc) for doc in data.get("documents", [])]
+        if isinstance(data.get("candidates"), list):
+            context["candidates"] = [RetrievedDocument.model_validate(doc) for doc in data["candidates"]]
+        if isinstance(data.get("context_by_type"), dict):
+            context["context_by_type"] = {
+                doc_type: [RetrievedDocument.model_validate(doc) for doc in docs]
+                for doc_type, docs in data["context_by_type"].items()
+            }
+        return context
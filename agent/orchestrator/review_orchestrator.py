@@ -1,35 +1,102 @@
+import asyncio
 import uuid
-from datetime import datetime
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable, TYPE_CHECKING
 from pathlib import Path
 
 from app_logging.logger.session_logger import SessionLogger
-from ..reviewer.pr_reviewer import PRReviewer
 from ..retrieval.context_retriever import ContextRetriever
 from ..criteria.criteria_processor import CriteriaProcessor
-from ..providers.github_client import MockGitHubClient
-from app_logging.schemas.models import SessionLog, PRReview
+from ..providers.github_client import PRInfo, create_github_client
+from ..storage.session_index import SessionIndex, IndexedSessionLogger
+from ..storage.session_archive import SessionArchive
+from ..storage.blob_store import BlobStore, to_jsonable
+from ..reviewer.stages import STAGE_ORDER, run_blocking
+from app_logging.schemas.models import SessionLog, PRReview, Comment
 from config.settings import settings
 
+if TYPE_CHECKING:
+    from ..reviewer.pr_reviewer import PRReviewer, CommentCallback
+    from .replay_engine import ReplayEngine
+
+
+def validate_batch_job(job: Any) -> Dict[str, Any]:
+    """Check one batch job and normalize its PR number; raises ValueError describing the problem."""
+    if not isinstance(job, dict):
+        raise ValueError(f"expected a JSON object, got {type(job).__name__}")
+    if "repo" not in job or "pr" not in job:
+        raise ValueError("missing 'repo' or 'pr'")
+    if not isinstance(job["repo"], str) or not job["repo"]:
+        raise ValueError("'repo' must be a non-empty string")
+    pr = job["pr"]
+    if isinstance(pr, bool) or not (isinstance(pr, int) or (isinstance(pr, str) and pr.strip().isdigit())):
+        raise ValueError(f"'pr' must be a PR number, got {pr!r}")
+    if job.get("criteria") is not None and not isinstance(job["criteria"], str):
+        raise ValueError("'criteria' must be a string")
+    return {**job, "pr": int(pr)}
+
 
 class ReviewOrchestrator:
     """Orchestrates the complete PR review process."""
     
     def __init__(self):
-        self.session_logger = SessionLogger()
-        self.github_client = MockGitHubClient()
+        self.session_index = SessionIndex()
+        self.session_archive = SessionArchive()
+        self.blob_store = BlobStore()
+        self.session_logger = IndexedSessionLogger(self.session_index, session_archive=self.session_archive)
+        self.github_client = create_github_client()
         self.criteria_processor = CriteriaProcessor()
         self.context_retriever = ContextRetriever(self.github_client, self.criteria_processor)
-        self.pr_reviewer = PRReviewer(self.session_logger, self.context_retriever)
     
-    def review_pull_request(self, repo: str, pr_number: int, criteria_text: str) -> Dict[str, Any]:
-        """Execute a complete PR review workflow."""
+    # The reviewer pulls in LangChain and builds the model client, so it is only
+    # created (and imported) once a command actually reviews something
+    @cached_property
+    def pr_reviewer(self) -> "PRReviewer":
+        from ..reviewer.pr_reviewer import PRReviewer
+        return PRReviewer(self.session_logger, self.context_retriever, blob_store=self.blob_store)
+    
+    @cached_property
+    def replay_engine(self) -> "ReplayEngine":
+        from .replay_engine import ReplayEngine
+        return ReplayEngine(self.session_logger, self.blob_store)
+    
+    def _session_reviewer(self, session_logger: IndexedSessionLogger) -> "PRReviewer":
+        """A reviewer logging to ``session_logger`` that shares the LLM client and response cache."""
+        from ..reviewer.pr_reviewer import PRReviewer
+        return PRReviewer(session_logger, self.context_retriever, llm=self.pr_reviewer.llm,
+                          response_cache=self.pr_reviewer.response_cache, blob_store=self.blob_store)
+    
+    def review_pull_request(self, repo: str, pr_number: int, criteria_text: str,
+                            on_comment: Optional["CommentCallback"] = None) -> Dict[str, Any]:
+        """Execute a complete PR review workflow.
+        
+        Raises RuntimeError when called from a running event loop; await areview_pull_request there.
+        """
+        return run_blocking(self.areview_pull_request(repo, pr_number, criteria_text, on_comment))
+    
+    async def areview_pull_request(self, repo: str, pr_number: int, criteria_text: str,
+                                   on_comment: Optional["CommentCallback"] = None,
+                                   pr_info: Optional[PRInfo] = None,
+                                   recorded_stages: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Execute a complete PR review workflow without blocking the event loop.
+        
+        Each call gets its own session logger and reviewer (sharing the LLM client
+        and response cache),
+        so many reviews can be in flight on one event loop at once. ``on_comment``
+        switches generation to streaming and receives each comment as it arrives.
+        ``pr_info`` and ``recorded_stages`` let a replay reuse a recorded PR and
+        recorded stage outputs instead of fetching and recomputing them.
+        """
         session_id = self._generate_session_id()
+        session_logger = IndexedSessionLogger(self.session_index, session_archive=self.session_archive)
+        pr_reviewer = self._session_reviewer(session_logger)
         
         try:
             # Start session logging
-            pr_info = self.github_client.get_pr(repo, pr_number)
-            session = self.session_logger.start_session(
+            if pr_info is None:
+                pr_info = await self.github_client.aget_pr(repo, pr_number)
+            session = session_logger.start_session(
                 session_id=session_id,
                 pr_info={
                     "repo": repo,
@@ -44,10 +111,11 @@ class ReviewOrchestrator:
             )
             
             # Execute review
-            review = self.pr_reviewer.review_pr(repo, pr_info, criteria_text)
+            review = await pr_reviewer.areview_pr(repo, pr_info, criteria_text, on_comment,
+                                                  recorded_stages=recorded_stages)
             
             # Complete session
-            completed_session = self.session_logger.complete_session(review)
+            completed_session = session_logger.complete_session(review)
             
             return {
                 "session_id": session_id,
@@ -76,8 +144,8 @@ class ReviewOrchestrator:
             )
             
             # Complete session with error
-            if hasattr(self.session_logger, 'current_session') and self.session_logger.current_session:
-                self.session_logger.complete_session(error_review, success=False, error_message=error_message)
+            if hasattr(session_logger, 'current_session') and session_logger.current_session:
+                session_logger.complete_session(error_review, success=False, error_message=error_message)
             
             return {
                 "session_id": session_id,
@@ -92,107 +160,258 @@ class ReviewOrchestrator:
                 }
             }
     
-    def get_session_details(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get detailed information about a review session."""
+    def review_pull_request_multi(self, repo: str, pr_number: int, criteria_texts: List[str],
+                                  on_comment: Optional[Callable[[str, Comment], None]] = None) -> Dict[str, Any]:
+        """Review one PR under several criteria sets in a single combined session (blocking)."""
+        return run_blocking(self.areview_pull_request_multi(repo, pr_number, criteria_texts, on_comment))
+    
+    async def areview_pull_request_multi(self, repo: str, pr_number: int, criteria_texts: List[str],
+                                         on_comment: Optional[Callable[[str, Comment], None]] = None
+                                         ) -> Dict[str, Any]:
+        """Review one PR under several criteria sets without blocking the event loop.
+        
+        The PR is fetched and its repository, file and commit context retrieved
+        once; the per-criteria reviews are then generated concurrently. The
+        result holds each review keyed by criteria, plus a combined review that
+        becomes the session's final review.
+        """
+        session_id = self._generate_session_id()
+        criteria_texts = list(dict.fromkeys(criteria_texts))
+        combined_criteria = " | ".join(criteria_texts)
+        session_logger = IndexedSessionLogger(self.session_index, session_archive=self.session_archive)
+        pr_reviewer = self._session_reviewer(session_logger)
+        
+        def metadata() -> Dict[str, Any]:
+            return {
+                "repo": repo,
+                "pr_number": pr_number,
+                "criteria": criteria_texts,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        
+        try:
+            pr_info = await self.github_client.aget_pr(repo, pr_number)
+            session_logger.start_session(
+                session_id=session_id,
+                pr_info={
+                    "repo": repo,
+                    "pr_number": pr_number,
+                    "title": pr_info.title,
+                    "description": pr_info.description,
+                    "files_changed": len(pr_info.files_changed),
+                    "total_additions": pr_info.total_additions,
+                    "total_deletions": pr_info.total_deletions,
+                    "criteria_sets": criteria_texts
+                },
+                criteria_text=combined_criteria
+            )
+            
+            reviews = await pr_reviewer.areview_pr_multi(repo, pr_info, criteria_texts, on_comment)
+            combined_review = pr_reviewer.combine_criteria_reviews(reviews)
+            completed_session = session_logger.complete_session(combined_review)
+            
+            return {
+                "session_id": session_id,
+                "success": True,
+                "reviews": {criteria: review.model_dump() for criteria, review in reviews.items()},
+                "review": combined_review.model_dump(),
+                "session": completed_session.model_dump(),
+                "metadata": metadata()
+            }
+            
+        except Exception as e:
+            error_message = str(e)
+            print(f"Error during PR review: {error_message}")
+            
+            if hasattr(session_logger, 'current_session') and session_logger.current_session:
+                error_review = PRReview(
+                    comments=[],
+                    package_suggestions=[],
+                    comment_summary="Review failed due to error",
+                    high_level_summary_md="**Review failed**"
+                )
+                session_logger.complete_session(error_review, success=False, error_message=error_message)
+            
+            return {
+                "session_id": session_id,
+                "success": False,
+                "error": error_message,
+                "reviews": None,
+                "review": None,
+                "metadata": metadata()
+            }
+    
+    async def areview_batch(self, jobs: List[Dict[str, Any]], max_concurrency: Optional[int] = None,
+                            default_criteria: str = "strict style") -> AsyncIterator[Dict[str, Any]]:
+        """Review many PRs concurrently, yielding each result as soon as it finishes.
+        
+        Each job is a dict with ``repo``, ``pr`` and optional ``criteria``. All jobs
+        share this orchestrator's GitHub client, LLM client and caches; at most
+        ``max_concurrency`` reviews run at once.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or settings.batch_max_concurrency)
+        
+        async def run_job(index: int, job: Any) -> Dict[str, Any]:
+            # A bad job fails on its own; it must never cancel the reviews running beside it
+            try:
+                job = validate_batch_job(job)
+                criteria_text = job.get("criteria") or default_criteria
+                async with semaphore:
+                    result = await self.areview_pull_request(job["repo"], job["pr"], criteria_text)
+            except Exception as e:
+                fields = job if isinstance(job, dict) else {}
+                result = {
+                    "session_id": None,
+                    "success": False,
+                    "error": str(e),
+                    "reviews": None,
+                    "review": None,
+                    "metadata": {
+                        "repo": fields.get("repo"),
+                        "pr_number": fields.get("pr"),
+                        "criteria": fields.get("criteria") or default_criteria,
+                        "timestamp": datetime.utcnow().isoformat()
+                    }
+                }
+            return {"index": index, **result}
+        
+        tasks = [asyncio.create_task(run_job(index, job)) for index, job in enumerate(jobs)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def get_session_details(self, session_id: str, resolve_blobs: bool = True) -> Optional[Dict[str, Any]]:
+        """Get detailed information about a review session.
+        
+        Blob references in step inputs/outputs are expanded unless ``resolve_blobs`` is False.
+        """
         session = self.session_logger.get_session(session_id)
         if not session:
             return None
         
         # Get detailed steps
         steps = self.session_logger.get_session_steps(session_id)
+        step_dicts = [step.model_dump() for step in steps]
+        if resolve_blobs:
+            for step in step_dicts:
+                step["input"] = self.blob_store.resolve(session_id, step["input"])
+                step["output"] = self.blob_store.resolve(session_id, step["output"])
         
         return {
             "session": session.model_dump(),
-            "steps": [step.model_dump() for step in steps],
+            "steps": step_dicts,
             "step_count": len(steps)
         }
     
     def list_sessions(self) -> Dict[str, Any]:
-        """List all available review sessions."""
-        session_ids = self.session_logger.list_sessions()
+        """List all available review sessions from the session index."""
+        self.session_index.backfill(self.session_logger)
         sessions = []
         
-        for session_id in session_ids:
-            session_info = self.get_session_details(session_id)
-            if session_info:
-                sessions.append({
-                    "session_id": session_id,
-                    "summary": {
-                        "repo": session_info["session"]["pr_info"].get("repo", "Unknown"),
-                        "pr_number": session_info["session"]["pr_info"].get("pr_number", "Unknown"),
-                        "criteria": session_info["session"]["criteria_text"][:100] + "...",
-                        "success": session_info["session"]["success"],
-                        "timestamp": session_info["session"]["start_time"]
-                    }
-                })
+        for row in self.session_index.list_sessions():
+            sessions.append({
+                "session_id": row["session_id"],
+                "summary": {
+                    "repo": row["repo"] or "Unknown",
+                    "pr_number": row["pr_number"] if row["pr_number"] is not None else "Unknown",
+                    "criteria": (row["criteria_text"] or "")[:100] + "...",
+                    "success": bool(row["success"]),
+                    "timestamp": row["start_time"],
+                    "comment_count": row["comment_count"]
+                }
+            })
         
         return {
             "total_sessions": len(sessions),
             "sessions": sessions
         }
     
-    def replay_session(self, session_id: str, new_criteria: str = None) -> Dict[str, Any]:
-        """Replay a session with potentially new criteria."""
-        original_session = self.session_logger.get_session(session_id)
-        if not original_session:
-            return {"error": "Session not found"}
-        
-        # Use new criteria if provided, otherwise use original
-        criteria_text = new_criteria or original_session.criteria_text
-        
-        # Extract original parameters
-        pr_info = original_session.pr_info
-        repo = pr_info.get("repo", "demo-repo")
-        pr_number = pr_info.get("pr_number", 1)
-        
-        # Execute new review
-        return self.review_pull_request(repo, pr_number, criteria_text)
-    
-    def get_review_statistics(self) -> Dict[str, Any]:
-        """Get statistics about all review sessions."""
-        sessions = self.session_logger.list_sessions()
-        
-        total_sessions = len(sessions)
-        successful_sessions = 0
-        failed_sessions = 0
-        total_comments = 0
-        total_package_suggestions = 0
-        
-        criteria_counts = {}
-        repo_counts = {}
-        
-        for session_id in sessions:
-            session_details = self.get_session_details(session_id)
-            if session_details:
-                session = session_details["session"]
-                
-                if session["success"]:
-                    successful_sessions += 1
-                    if session.get("final_review"):
-                        review = session["final_review"]
-                        total_comments += len(review.get("comments", []))
-                        total_package_suggestions += len(review.get("package_suggestions", []))
-                else:
-                    failed_sessions += 1
-                
-                # Count criteria usage
-                criteria = session["criteria_text"][:50]  # Truncate for grouping
-                criteria_counts[criteria] = criteria_counts.get(criteria, 0) + 1
-                
-                # Count repo usage
-                repo = session["pr_info"].get("repo", "Unknown")
-                repo_counts[repo] = repo_counts.get(repo, 0) + 1
+    def reindex_sessions(self) -> int:
+        """Index any logged sessions missing from the session index."""
+        return self.session_index.backfill(self.session_logger, force=True)
+    
+    def replay_session(self, session_id: str, new_criteria: str = None, live: bool = False) -> Dict[str, Any]:
+        """Replay a session with potentially new criteria (blocking wrapper around areplay_session)."""
+        return run_blocking(self.areplay_session(session_id, new_criteria, live))
+    
+    async def areplay_session(self, session_id: str, new_criteria: str = None, live: bool = False) -> Dict[str, Any]:
+        """Replay a session with potentially new criteria.
+        
+        Without new criteria the session is replayed offline from its recorded
+        PR, context and model responses, and the result is diffed against the
+        original review. With new criteria only the stages the criteria feed
+        are recomputed; the recorded PR and its repository, file and commit
+        documents are reused. ``live`` re-runs the whole review against GitHub
+        and the model. Both produce a new session plus a side-by-side
+        comparison with the original review.
+        
+        Multi-criteria sessions rerun live under their original criteria sets;
+        new criteria replace all the sets with a single review that reuses the
+        shared PR retrieval.
+        """
+        from .replay_engine import side_by_side
+        
+        if not new_criteria and not live:
+            return await self.replay_engine.areplay(session_id)
+        
+        recording = await asyncio.to_thread(self.replay_engine.load_recording, session_id)
+        if "error" in recording:
+            return recording
+        
+        if recording["criteria_sets"] and not new_criteria:
+            recorded_stages = {}
+            result = await self.areview_pull_request_multi(
+                recording["repo"], recording["pr_number"], recording["criteria_sets"]
+            )
+        else:
+            # Use new criteria if provided, otherwise use original
+            criteria_text = new_criteria or recording["criteria_text"]
+            changed = ["criteria_text"] if criteria_text != recording["criteria_text"] else []
+            recorded_stages = {} if live else self.replay_engine.reusable_outputs(recording, changed)
+            
+            result = await self.areview_pull_request(
+                recording["repo"], recording["pr_number"], criteria_text,
+                pr_info=None if live else recording["pr_info"],
+                recorded_stages=recorded_stages
+            )
+        
+        if result["success"]:
+            result["replay"] = {
+                "original_session_id": session_id,
+                "reused_stages": list(recorded_stages),
+                "recomputed_stages": [stage for stage in STAGE_ORDER if stage not in recorded_stages],
+                "comparison": side_by_side(recording["original_review"], to_jsonable(result["review"]))
+            }
+        return result
+    
+    def get_review_statistics(self, repo: Optional[str] = None, since: Optional[str] = None) -> Dict[str, Any]:
+        """Get statistics about review sessions from the materialized counters.
+        
+        Every logged session is counted; sessions that never completed count as
+        failed. ``repo`` and ``since`` (``YYYY-MM-DD``) filter on the rollup buckets.
+        """
+        self.session_index.backfill(self.session_logger)
+        stats = self.session_index.statistics(repo=repo, since=since)
+        
+        total_sessions = stats["total_sessions"]
+        successful_sessions = stats["successful_sessions"]
+        total_comments = stats["total_comments"]
         
         return {
             "total_sessions": total_sessions,
             "successful_sessions": successful_sessions,
-            "failed_sessions": failed_sessions,
+            "failed_sessions": stats["failed_sessions"],
             "success_rate": successful_sessions / total_sessions if total_sessions > 0 else 0,
             "total_comments": total_comments,
-            "total_package_suggestions": total_package_suggestions,
+            "total_package_suggestions": stats["total_package_suggestions"],
             "average_comments_per_session": total_comments / successful_sessions if successful_sessions > 0 else 0,
-            "criteria_distribution": criteria_counts,
-            "repository_distribution": repo_counts
+            "criteria_distribution": stats["criteria_distribution"],
+            "repository_distribution": stats["repository_distribution"],
+            "preset_distribution": stats["preset_distribution"],
+            "daily_distribution": stats["daily_distribution"]
         }
     
     def _generate_session_id(self) -> str:
@@ -201,11 +420,56 @@ class ReviewOrchestrator:
         unique_id = str(uuid.uuid4())[:8]
         return f"review_{timestamp}_{unique_id}"
     
-    def cleanup_old_sessions(self, days_to_keep: int = 30) -> Dict[str, Any]:
-        """Clean up old session logs."""
-        # This is a placeholder for cleanup functionality
-        # In a production system, you might want to implement actual cleanup
+    def cleanup_old_sessions(self, days_to_keep: Optional[int] = None,
+                             archive_after_days: Optional[int] = None) -> Dict[str, Any]:
+        """Apply log retention: archive old sessions and delete expired ones.
+        
+        Sessions older than ``archive_after_days`` are compacted to the last
+        version of each step and moved into per-day gzip bundles. Sessions and
+        bundles older than ``days_to_keep`` are deleted. Archived sessions stay
+        readable through ``get_session_details`` and ``replay_session``.
+        """
+        days_to_keep = settings.session_retention_days if days_to_keep is None else days_to_keep
+        archive_after_days = settings.session_archive_after_days if archive_after_days is None else archive_after_days
+        self.session_index.backfill(self.session_logger)
+        
+        now = datetime.utcnow()
+        retention_cutoff = (now - timedelta(days=days_to_keep)).isoformat()
+        archive_cutoff = (now - timedelta(days=archive_after_days)).isoformat()
+        
+        # Delete expired sessions first so they are never archived just to be removed
+        expired = self.session_index.sessions_started_before(retention_cutoff)
+        for row in expired:
+            if row["archive_day"] is None:
+                self.session_logger.delete_session(row["session_id"])
+            self.blob_store.delete_session(row["session_id"])
+        self.session_index.delete_sessions([row["session_id"] for row in expired])
+        deleted_bundles = self.session_archive.delete_before(retention_cutoff[:10])
+        
+        # Archive what remains past the archive cutoff, one bundle per start day
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for row in self.session_index.sessions_started_before(archive_cutoff, archived=False):
+            by_day.setdefault((row["start_time"] or "")[:10], []).append(row)
+        
+        archived_count = 0
+        for day, rows in by_day.items():
+            records = []
+            for row in rows:
+                session = self.session_logger.get_session(row["session_id"])
+                if session is not None:
+                    records.append((session, self.session_logger.get_session_steps(row["session_id"])))
+            
+            self.session_archive.archive_sessions(day, records)
+            self.session_index.mark_archived([session.session_id for session, _ in records], day)
+            for session, _ in records:
+                self.session_logger.delete_session(session.session_id)
+            archived_count += len(records)
+        
         return {
-            "message": "Cleanup functionality not implemented in MVP",
-            "days_to_keep": days_to_keep
-        } 
\ No newline at end of file
+            "days_to_keep": days_to_keep,
+            "archive_after_days": archive_after_days,
+            "deleted_sessions": len(expired),
+            "deleted_archive_days": deleted_bundles,
+            "archived_sessions": archived_count,
+            "archive_size_bytes": self.session_archive.size_bytes()
+        }
\ No newline at end of file
@@ -0,0 +1,202 @@
+from typing import List, Dict, Any, Optional
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .github_client import GitHubProvider, PRInfo
+from config.settings import settings
+
+
+COMMIT_SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
+class ProviderCache:
+    """Content-addressed on-disk cache with size-bounded LRU eviction.
+
+    Payloads are stored once per content hash under ``blobs/``; a SQLite index
+    maps cache keys to hashes and tracks last access for eviction. Identical
+    content fetched under different keys (e.g. the same README at two commits)
+    shares one blob.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_dir / "index.db"), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        """Return the cached payload for ``key``, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and (max_age is None or now - row[1] <= max_age):
+                blob_path = self._blob_path(row[0])
+                if blob_path.exists():
+                    self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self.hits += 1
+                    return json.loads(blob_path.read_bytes())
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, payload: Any):
+        """Store ``payload`` under ``key`` and evict least-recently-used entries if over budget."""
+        data = json.dumps(payload).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            blob_path = self._blob_path(digest)
+            if not blob_path.exists():
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = blob_path.with_suffix(".tmp")
+                tmp_path.write_bytes(data)
+                tmp_path.replace(blob_path)
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, digest, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, digest, len(data), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def total_bytes(self) -> int:
+        """Bytes used by distinct blobs."""
+        with self._lock:
+            return self._total_bytes()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total_bytes = self._total_bytes()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def _total_bytes(self) -> int:
+        row = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY digest)"
+        ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        """Drop least-recently-used entries until the distinct blob size fits the budget."""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, digest, size FROM entries ORDER BY last_access ASC").fetchall()
+        for key, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.evictions += 1
+
+            still_referenced = self._conn.execute(
+                "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if not still_referenced:
+                self._blob_path(digest).unlink(missing_ok=True)
+                total -= size
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+
+class CachedGitHubClient(GitHubProvider):
+    """Wraps any GitHub provider with a persistent cache for repository content.
+
+    File contents and file listings are keyed by (repo, ref, path). Entries for
+    a commit SHA never expire; entries for a branch name expire after
+    ``provider_cache_ref_ttl_seconds`` because the branch can move. PRs and
+    commit histories are always fetched from the wrapped provider.
+    """
+
+    def __init__(self, provider: GitHubProvider, cache: Optional[ProviderCache] = None):
+        self.provider = provider
+        self.cache = cache or ProviderCache(settings.provider_cache_dir, settings.provider_cache_max_bytes)
+
+    def get_pr(self, repo: str, pr_number: int) -> PRInfo:
+        """Get PR information and diff."""
+        return self.provider.get_pr(repo, pr_number)
+
+    def get_file_content(self, repo: str, file_path: str, ref: str = "main") -> str:
+        """Get file content from a specific branch/ref."""
+        key = self._cache_key("file", repo, ref, file_path)
+        content = self.cache.get(key, self._max_age(ref))
+        if content is None:
+            content = self.provider.get_file_content(repo, file_path, ref)
+            self.cache.put(key, content)
+        return content
+
+    def get_repo_files(self, repo: str, ref: str = "main") -> List[str]:
+        """Get list of files in the repository."""
+        key = self._cache_key("tree", repo, ref)
+        files = self.cache.get(key, self._max_age(ref))
+        if files is None:
+            files = self.provider.get_repo_files(repo, ref)
+            self.cache.put(key, files)
+        return files
+
+    def get_commit_history(self, repo: str, file_path: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Get commit history for a specific file."""
+        return self.provider.get_commit_history(repo, file_path, limit)
+
+    def get_repo_tree(self, repo: str, ref: str = "main") -> Dict[str, Optional[str]]:
+        """Map each file path at ``ref`` to its git blob SHA."""
+        key = self._cache_key("blob_tree", repo, ref)
+        tree = self.cache.get(key, self._max_age(ref))
+        if tree is None:
+            tree = self.provider.get_repo_tree(repo, ref)
+            self.cache.put(key, tree)
+        return tree
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the underlying cache."""
+        return self.cache.stats()
+
+    @staticmethod
+    def _cache_key(kind: str, repo: str, ref: str, path: str = "") -> str:
+        return json.dumps([kind, repo, ref, path])
+
+    @staticmethod
+    def _max_age(ref: str) -> Optional[float]:
+        """Commit SHAs are immutable; branch names get a TTL."""
+        if COMMIT_SHA_PATTERN.match(ref):
+            return None
+        return settings.provider_cache_ref_ttl_seconds
@@ -0,0 +1,201 @@
+from typing import List, Optional, Tuple
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+import re
+
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+ADDED = ord("+")
+DELETED = ord("-")
+CONTEXT = ord(" ")
+
+
+class Hunk:
+    """One ``@@`` hunk: parallel arrays of line kinds and old/new line numbers (0 when absent)."""
+
+    __slots__ = ("old_start", "old_count", "new_start", "new_count", "kinds", "old_lines", "new_lines")
+
+    def __init__(self, old_start: int, old_count: int, new_start: int, new_count: int):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.kinds = bytearray()
+        self.old_lines = array("i")
+        self.new_lines = array("i")
+
+    @property
+    def old_end(self) -> int:
+        return self.old_start + max(self.old_count, 1) - 1
+
+    @property
+    def new_end(self) -> int:
+        return self.new_start + max(self.new_count, 1) - 1
+
+
+class DiffIndex:
+    """Compact line index over a parsed unified diff."""
+
+    __slots__ = ("hunks", "added_lines", "deleted_lines", "changed_lines")
+
+    def __init__(self, hunks: List[Hunk]):
+        self.hunks = hunks
+        self.added_lines = array("i")    # New-side line numbers of added lines
+        self.deleted_lines = array("i")  # Old-side line numbers of deleted lines
+        changed = set()
+
+        for hunk in hunks:
+            pending_deletion = False
+            for kind, old_line, new_line in zip(hunk.kinds, hunk.old_lines, hunk.new_lines):
+                if kind == ADDED:
+                    self.added_lines.append(new_line)
+                    changed.add(new_line)
+                    pending_deletion = False
+                elif kind == DELETED:
+                    self.deleted_lines.append(old_line)
+                    pending_deletion = True
+                elif pending_deletion:
+                    # A pure deletion is anchored to the next surviving new-side line
+                    changed.add(new_line)
+                    pending_deletion = False
+            if pending_deletion:
+                changed.add(max(hunk.new_end, 1))
+
+        # New-side lines a comment can anchor to: additions plus deletion points
+        self.changed_lines = array("i", sorted(changed))
+
+    def __bool__(self) -> bool:
+        return bool(self.hunks)
+
+    def first_changed_line(self) -> int:
+        """First changed new-side line, or 1 when the diff has no hunks."""
+        return self.changed_lines[0] if self.changed_lines else 1
+
+    def changed_line_ranges(self) -> List[Tuple[int, int]]:
+        """Inclusive new-side ranges of consecutive changed lines."""
+        ranges: List[Tuple[int, int]] = []
+        for line in self.changed_lines:
+            if ranges and line == ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], line)
+            else:
+                ranges.append((line, line))
+        return ranges
+
+    def hunk_ranges(self, side: str = "new", context_lines: int = 0) -> List[Tuple[int, int]]:
+        """Inclusive line ranges covered by hunks on ``side`` ("old" or "new"), widened and merged."""
+        ranges: List[Tuple[int, int]] = []
+        for hunk in self.hunks:
+            start, end = (hunk.old_start, hunk.old_end) if side == "old" else (hunk.new_start, hunk.new_end)
+            start, end = max(1, start - context_lines), end + context_lines
+            if ranges and start <= ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], max(end, ranges[-1][1]))
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def old_to_new(self, old_line: int) -> Optional[int]:
+        """Map an old-side line to the new side; None when the line was deleted."""
+        return self._map_line(old_line, from_old=True)
+
+    def new_to_old(self, new_line: int) -> Optional[int]:
+        """Map a new-side line to the old side; None when the line was added."""
+        return self._map_line(new_line, from_old=False)
+
+    def anchor_line(self, line_number: int) -> int:
+        """Snap a new-side line to the diff: kept if inside a hunk, else the nearest changed line."""
+        if not self.changed_lines:
+            return max(1, line_number)
+
+        for hunk in self.hunks:
+            if hunk.new_start <= line_number <= hunk.new_end:
+                return line_number
+
+        position = bisect_left(self.changed_lines, line_number)
+        candidates = self.changed_lines[max(0, position - 1):position + 1]
+        return min(candidates, key=lambda line: (abs(line - line_number), line))
+
+    def _map_line(self, line: int, from_old: bool) -> Optional[int]:
+        offset = 0
+        for hunk in self.hunks:
+            start, end = (hunk.old_start, hunk.old_end) if from_old else (hunk.new_start, hunk.new_end)
+            if line < start:
+                break
+            if line <= end:
+                source, target = (hunk.old_lines, hunk.new_lines) if from_old else (hunk.new_lines, hunk.old_lines)
+                for source_line, target_line in zip(source, target):
+                    if source_line == line:
+                        return target_line or None
+                return None
+            offset += (hunk.new_count - hunk.old_count) if from_old else (hunk.old_count - hunk.new_count)
+        return line + offset
+
+
+@lru_cache(maxsize=1024)
+def parse_unified_diff(diff_text: str) -> DiffIndex:
+    """Parse unified diff text (a full ``git diff`` or a bare GitHub patch) into a DiffIndex.
+
+    Lines are processed in a single pass; file headers and anything outside a
+    hunk are skipped. Results are cached by diff text.
+    """
+    hunks: List[Hunk] = []
+    hunk: Optional[Hunk] = None
+    old_line = new_line = 0
+    old_remaining = new_remaining = 0
+
+    for line in (diff_text or "").splitlines():
+        if line.startswith("@@"):
+            match = HUNK_HEADER_PATTERN.match(line)
+            if not match:
+                hunk = None
+                continue
+            old_line, new_line = int(match.group(1)), int(match.group(3))
+            hunk = Hunk(
+                old_start=old_line,
+                old_count=int(match.group(2)) if match.group(2) is not None else 1,
+                new_start=new_line,
+                new_count=int(match.group(4)) if match.group(4) is not None else 1
+            )
+            hunks.append(hunk)
+            old_remaining, new_remaining = hunk.old_count, hunk.new_count
+        elif hunk is None or line.startswith("\\"):
+            continue
+        elif line.startswith("+"):
+            hunk.kinds.append(ADDED)
+            hunk.old_lines.append(0)
+            hunk.new_lines.append(new_line)
+            new_line += 1
+            new_remaining -= 1
+        elif line.startswith("-"):
+            hunk.kinds.append(DELETED)
+            hunk.old_lines.append(old_line)
+            hunk.new_lines.append(0)
+            old_line += 1
+            old_remaining -= 1
+        else:
+            hunk.kinds.append(CONTEXT)
+            hunk.old_lines.append(old_line)
+            hunk.new_lines.append(new_line)
+            old_line += 1
+            new_line += 1
+            old_remaining -= 1
+            new_remaining -= 1
+
+        # Stop at the end of the hunk so file headers that follow are not read as lines
+        if hunk is not None and old_remaining <= 0 and new_remaining <= 0:
+            hunk = None
+
+    return DiffIndex(hunks)
+
+
+def excerpt_lines(content: str, ranges: List[Tuple[int, int]]) -> str:
+    """Render the given inclusive line ranges of ``content`` with line numbers."""
+    lines = content.splitlines()
+    parts = []
+    for start, end in ranges:
+        end = min(end, len(lines))
+        if start > end:
+            continue
+        parts.append("\n".join(f"{number:>5} | {lines[number - 1]}" for number in range(start, end + 1)))
+    return "\n...\n".join(parts)
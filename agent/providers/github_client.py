@@ -1,8 +1,20 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from dataclasses import dataclass
+from urllib.parse import quote
+import asyncio
+import hashlib
 import json
+import threading
+import time
 from pathlib import Path
 
+import httpx
+
+from .diff_parser import DiffIndex, parse_unified_diff
+from config.settings import settings
+
 
 @dataclass
 class FileDiff:
@@ -12,6 +24,10 @@ class FileDiff:
     deletions: int
     diff_content: str
     status: str
+    
+    def hunk_index(self) -> DiffIndex:
+        """Parsed hunk/line index of ``diff_content`` (cached per diff text)."""
+        return parse_unified_diff(self.diff_content)
 
 
 @dataclass
@@ -25,9 +41,69 @@ class PRInfo:
     files_changed: List[FileDiff]
     total_additions: int
     total_deletions: int
+    base_sha: Optional[str] = None
+    head_sha: Optional[str] = None
+
+
+class GitHubProvider(ABC):
+    """Base class for GitHub providers.
+    
+    Subclasses implement the blocking methods; the async variants default to
+    running them on a worker thread so the event loop is never blocked.
+    """
+    
+    @abstractmethod
+    def get_pr(self, repo: str, pr_number: int) -> PRInfo:
+        ...
+    
+    @abstractmethod
+    def get_file_content(self, repo: str, file_path: str, ref: str = "main") -> str:
+        ...
+    
+    @abstractmethod
+    def get_repo_files(self, repo: str, ref: str = "main") -> List[str]:
+        ...
+    
+    @abstractmethod
+    def get_commit_history(self, repo: str, file_path: str, limit: int = 5) -> List[Dict[str, Any]]:
+        ...
+    
+    def get_repo_tree(self, repo: str, ref: str = "main") -> Dict[str, Optional[str]]:
+        """Map each file path at ``ref`` to its git blob SHA.
+        
+        Providers that cannot list blob SHAs cheaply report None, and callers
+        hash the content themselves.
+        """
+        return {path: None for path in self.get_repo_files(repo, ref)}
+    
+    async def aget_pr(self, repo: str, pr_number: int) -> PRInfo:
+        """Async variant of get_pr."""
+        return await asyncio.to_thread(self.get_pr, repo, pr_number)
+    
+    async def aget_file_content(self, repo: str, file_path: str, ref: str = "main") -> str:
+        """Async variant of get_file_content."""
+        return await asyncio.to_thread(self.get_file_content, repo, file_path, ref)
+    
+    async def aget_repo_files(self, repo: str, ref: str = "main") -> List[str]:
+        """Async variant of get_repo_files."""
+        return await asyncio.to_thread(self.get_repo_files, repo, ref)
+    
+    async def aget_commit_history(self, repo: str, file_path: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Async variant of get_commit_history."""
+        return await asyncio.to_thread(self.get_commit_history, repo, file_path, limit)
+    
+    async def aget_repo_tree(self, repo: str, ref: str = "main") -> Dict[str, Optional[str]]:
+        """Async variant of get_repo_tree."""
+        return await asyncio.to_thread(self.get_repo_tree, repo, ref)
+
+
+def git_blob_sha(content: str) -> str:
+    """The SHA git assigns to a blob with this content (as listed in tree entries)."""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
 
 
-class MockGitHubClient:
+class MockGitHubClient(GitHubProvider):
     """Mock GitHub client for development and testing."""
     
     def __init__(self, mock_data_dir: str = "data/mock_repos"):
@@ -114,4 +190,271 @@ class MockGitHubClient:
                 "author": "developer@example.com",
                 "date": "2024-01-15T10:00:00Z"
             }
-        ] 
\ No newline at end of file
+        ] 
+
+
+class GitHubAPIError(Exception):
+    """Raised when the GitHub API returns an unrecoverable error."""
+    
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"GitHub API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class GitHubClient(GitHubProvider):
+    """GitHub REST API client built on a pooled httpx client.
+    
+    GET requests are sent conditionally with ``If-None-Match`` so unchanged
+    resources come back as 304s, which do not count against the rate limit.
+    Transient failures are retried with exponential backoff, and requests are
+    paced out once ``X-RateLimit-Remaining`` drops below the configured floor.
+    """
+    
+    RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+    
+    def __init__(self, token: Optional[str] = None, api_url: Optional[str] = None,
+                 pool_size: Optional[int] = None, max_retries: Optional[int] = None,
+                 backoff_seconds: Optional[float] = None, rate_limit_floor: Optional[int] = None,
+                 transport: Optional[httpx.BaseTransport] = None):
+        token = token or settings.github_token
+        pool_size = pool_size or settings.github_pool_size
+        self.max_retries = settings.github_max_retries if max_retries is None else max_retries
+        self.backoff_seconds = settings.github_backoff_seconds if backoff_seconds is None else backoff_seconds
+        self.rate_limit_floor = settings.github_rate_limit_floor if rate_limit_floor is None else rate_limit_floor
+        
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+            "User-Agent": "pr-review-agent",
+        }
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        
+        self.client = httpx.Client(
+            base_url=(api_url or settings.github_api_url).rstrip("/"),
+            headers=headers,
+            timeout=settings.github_timeout_seconds,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport,
+        )
+        
+        # (url, params, accept) -> (etag, payload) for conditional requests, least recently used first
+        self._etag_cache: "OrderedDict[Tuple[str, str, str], Tuple[str, Any]]" = OrderedDict()
+        self.etag_cache_entries = settings.github_etag_cache_entries
+        self._lock = threading.Lock()
+        self._rate_limit_remaining: Optional[int] = None
+        self._rate_limit_reset: Optional[float] = None
+    
+    def close(self):
+        """Close the underlying connection pool."""
+        self.client.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def get_pr(self, repo: str, pr_number: int) -> PRInfo:
+        """Get PR information and diff."""
+        data, _ = self._get(f"/repos/{repo}/pulls/{pr_number}")
+        files = self._get_paginated(f"/repos/{repo}/pulls/{pr_number}/files")
+        
+        files_changed = [
+            FileDiff(
+                file_path=file_data["filename"],
+                additions=file_data.get("additions", 0),
+                deletions=file_data.get("deletions", 0),
+                diff_content=file_data.get("patch", ""),
+                status=file_data.get("status", "modified")
+            )
+            for file_data in files
+        ]
+        
+        return PRInfo(
+            pr_number=data["number"],
+            title=data.get("title") or "",
+            description=data.get("body") or "",
+            base_branch=data["base"]["ref"],
+            head_branch=data["head"]["ref"],
+            files_changed=files_changed,
+            total_additions=data.get("additions", sum(f.additions for f in files_changed)),
+            total_deletions=data.get("deletions", sum(f.deletions for f in files_changed)),
+            base_sha=data["base"].get("sha"),
+            head_sha=data["head"].get("sha")
+        )
+    
+    def get_file_content(self, repo: str, file_path: str, ref: str = "main") -> str:
+        """Get file content from a specific branch/ref."""
+        content, _ = self._get(
+            f"/repos/{repo}/contents/{quote(file_path)}",
+            params={"ref": ref},
+            accept="application/vnd.github.raw",
+        )
+        return content
+    
+    def get_repo_files(self, repo: str, ref: str = "main") -> List[str]:
+        """Get list of files in the repository."""
+        return list(self.get_repo_tree(repo, ref))
+    
+    def get_repo_tree(self, repo: str, ref: str = "main") -> Dict[str, Optional[str]]:
+        """Map each file path at ``ref`` to its git blob SHA, from one recursive tree request.
+        
+        GitHub truncates recursive listings of very large trees; those are
+        walked one directory at a time instead, so no file is silently missed.
+        """
+        data, _ = self._get(f"/repos/{repo}/git/trees/{ref}", params={"recursive": "1"})
+        if data.get("truncated"):
+            return self._walk_tree(repo, ref)
+        return {entry["path"]: entry.get("sha") for entry in data.get("tree", []) if entry.get("type") == "blob"}
+    
+    def _walk_tree(self, repo: str, ref: str) -> Dict[str, Optional[str]]:
+        """List a tree with one non-recursive request per directory."""
+        files: Dict[str, Optional[str]] = {}
+        pending = [("", ref)]
+        while pending:
+            prefix, tree_sha = pending.pop()
+            data, _ = self._get(f"/repos/{repo}/git/trees/{tree_sha}")
+            if data.get("truncated"):
+                raise GitHubAPIError(422, f"Tree listing for {prefix or '/'} in {repo}@{ref} is truncated")
+            for entry in data.get("tree", []):
+                path = f"{prefix}{entry['path']}"
+                if entry.get("type") == "blob":
+                    files[path] = entry.get("sha")
+                elif entry.get("type") == "tree":
+                    pending.append((f"{path}/", entry["sha"]))
+        return files
+    
+    def get_commit_history(self, repo: str, file_path: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Get commit history for a specific file."""
+        data, _ = self._get(f"/repos/{repo}/commits", params={"path": file_path, "per_page": str(limit)})
+        
+        return [
+            {
+                "sha": commit["sha"],
+                "message": commit["commit"]["message"],
+                "author": commit["commit"]["author"].get("email") or commit["commit"]["author"].get("name"),
+                "date": commit["commit"]["author"]["date"]
+            }
+            for commit in data[:limit]
+        ]
+    
+    def _get_paginated(self, url: str, params: Optional[Dict[str, str]] = None) -> List[Any]:
+        """GET every page of a list endpoint by following ``Link: rel="next"``."""
+        items: List[Any] = []
+        params = {"per_page": "100", **(params or {})}
+        next_url: Optional[str] = url
+        
+        while next_url:
+            data, response = self._get(next_url, params=params)
+            items.extend(data)
+            next_link = response.links.get("next")
+            next_url = next_link["url"] if next_link else None
+            params = None  # The next link already carries the query string
+        
+        return items
+    
+    def _get(self, url: str, params: Optional[Dict[str, str]] = None,
+             accept: Optional[str] = None) -> Tuple[Any, httpx.Response]:
+        """Conditional GET with retries, returning the decoded payload and response."""
+        cache_key = (url, json.dumps(params or {}, sort_keys=True), accept or "")
+        headers = {"Accept": accept} if accept else {}
+        
+        with self._lock:
+            cached = self._etag_cache.get(cache_key)
+            if cached:
+                self._etag_cache.move_to_end(cache_key)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+        
+        response = self._request_with_retries(url, params, headers)
+        
+        if response.status_code == 304 and cached:
+            return cached[1], response
+        
+        if response.status_code >= 400:
+            raise GitHubAPIError(response.status_code, response.text[:200])
+        
+        payload = response.text if accept == "application/vnd.github.raw" else response.json()
+        
+        etag = response.headers.get("ETag")
+        if etag:
+            with self._lock:
+                self._etag_cache[cache_key] = (etag, payload)
+                self._etag_cache.move_to_end(cache_key)
+                while len(self._etag_cache) > self.etag_cache_entries:
+                    self._etag_cache.popitem(last=False)
+        
+        return payload, response
+    
+    def _request_with_retries(self, url: str, params: Optional[Dict[str, str]],
+                              headers: Dict[str, str]) -> httpx.Response:
+        """Send a GET, retrying transport errors, 5xx/429 and rate-limit 403s with backoff."""
+        attempt = 0
+        while True:
+            self._throttle()
+            try:
+                response = self.client.get(url, params=params, headers=headers)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self.backoff_seconds * (2 ** attempt))
+                attempt += 1
+                continue
+            
+            self._record_rate_limit(response)
+            
+            rate_limited = response.status_code == 403 and response.headers.get("X-RateLimit-Remaining") == "0"
+            if (response.status_code in self.RETRYABLE_STATUS_CODES or rate_limited) and attempt < self.max_retries:
+                time.sleep(self._retry_delay(response, attempt))
+                attempt += 1
+                continue
+            
+            return response
+    
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        """Honour Retry-After when the server sends it, otherwise back off exponentially."""
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_seconds * (2 ** attempt)
+    
+    def _record_rate_limit(self, response: httpx.Response):
+        """Track the most recent rate-limit headers."""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        with self._lock:
+            if remaining is not None and remaining.isdigit():
+                self._rate_limit_remaining = int(remaining)
+            if reset is not None and reset.isdigit():
+                self._rate_limit_reset = float(reset)
+    
+    def _throttle(self):
+        """Spread the remaining quota over the rest of the window once it runs low."""
+        with self._lock:
+            remaining = self._rate_limit_remaining
+            reset = self._rate_limit_reset
+        
+        if remaining is None or reset is None or remaining > self.rate_limit_floor:
+            return
+        
+        window = reset - time.time()
+        if window <= 0:
+            return
+        
+        time.sleep(window / max(remaining, 1) if remaining > 0 else window)
+
+
+def create_github_client() -> GitHubProvider:
+    """Create the configured GitHub provider: the real API client when a token is set.
+    
+    The real client is wrapped in the on-disk provider cache unless it is disabled.
+    """
+    if not settings.github_token:
+        return MockGitHubClient()
+    
+    client: GitHubProvider = GitHubClient()
+    if settings.provider_cache_enabled:
+        from .cached_client import CachedGitHubClient
+        client = CachedGitHubClient(client)
+    return client
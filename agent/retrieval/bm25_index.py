@@ -0,0 +1,278 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+import json
+import math
+import os
+import re
+import shutil
+
+import numpy as np
+
+from ..providers.github_client import GitHubProvider, PRInfo
+from .embeddings import STOP_WORDS, split_identifiers
+from .incremental_indexer import IncrementalIndex, IncrementalIndexer, IndexRefresh
+from .vector_index import chunk_file, diff_queries, is_indexable
+from config.settings import settings
+
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Arrays saved per index; every one is loaded memory-mapped
+_ARRAYS = ("offsets", "postings", "tfs", "doc_lengths", "doc_sources", "fwd_offsets", "fwd_terms", "fwd_tfs")
+
+
+def diff_identifiers(pr_info: PRInfo, limit: int = 64) -> List[str]:
+    """Lower-cased identifiers on the PR's changed lines, in order of first appearance."""
+    identifiers = []
+    for query in diff_queries(pr_info):
+        # The first line of a query is the file path, not code
+        for identifier in _IDENTIFIER.findall(query.split("\n", 1)[-1]):
+            lowered = identifier.lower()
+            if len(lowered) > 2 and lowered not in STOP_WORDS:
+                identifiers.append(lowered)
+    return list(dict.fromkeys(identifiers))[:limit]
+
+
+def _saved_versions(directory: Path) -> List[int]:
+    """Version numbers of the ``v<N>/`` array directories saved under ``directory``."""
+    return [int(entry.name[1:]) for entry in directory.glob("v*")
+            if entry.is_dir() and entry.name[1:].isdigit()]
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over code-aware tokens.
+
+    Documents are dicts with ``source`` and ``text``. Each term's postings are
+    a sorted slice of one int32 array of document ids (CSR layout, with
+    ``offsets`` per term) next to its term frequencies; the terms themselves
+    are a sorted list, so lookups are a binary search and a slice. A forward
+    copy of the postings (terms per document) lets the index be updated
+    without re-tokenizing untouched documents.
+
+    Saved indexes are loaded memory-mapped: opening one reads only the
+    vocabulary and document list, and a query touches only its terms' postings.
+    """
+
+    def __init__(self, terms: List[str], docs: List[Dict[str, Any]], sources: List[str],
+                 arrays: Dict[str, np.ndarray], avg_doc_length: float):
+        self.terms = terms
+        self.docs = docs
+        self.sources = sources
+        self.avg_doc_length = avg_doc_length or 1.0
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, docs: List[Dict[str, Any]]) -> "BM25Index":
+        counts = [Counter(split_identifiers(doc["text"])) for doc in docs]
+        terms = sorted({term for doc_counts in counts for term in doc_counts})
+        term_ids = {term: i for i, term in enumerate(terms)}
+
+        fwd_terms, fwd_tfs, lengths = [], [], []
+        for doc_counts in counts:
+            ids = sorted(term_ids[term] for term in doc_counts)
+            fwd_terms.extend(ids)
+            fwd_tfs.extend(doc_counts[terms[i]] for i in ids)
+            lengths.append(len(ids))
+        forward = {
+            "fwd_offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            "fwd_terms": np.array(fwd_terms, dtype=np.int32),
+            "fwd_tfs": np.array(fwd_tfs, dtype=np.float32),
+        }
+        return cls._from_forward(terms, docs, forward)
+
+    @classmethod
+    def _from_forward(cls, terms: List[str], docs: List[Dict[str, Any]],
+                      forward: Dict[str, np.ndarray]) -> "BM25Index":
+        """Invert the per-document postings into per-term postings sorted by document id."""
+        fwd_offsets, fwd_terms, fwd_tfs = forward["fwd_offsets"], forward["fwd_terms"], forward["fwd_tfs"]
+        doc_ids = np.repeat(np.arange(len(docs), dtype=np.int32), np.diff(fwd_offsets))
+        order = np.lexsort((doc_ids, fwd_terms))
+        counts = np.bincount(fwd_terms, minlength=len(terms))
+
+        doc_lengths = np.bincount(doc_ids, weights=fwd_tfs, minlength=len(docs)).astype(np.float32)
+        sources = sorted({doc["source"] for doc in docs})
+        source_ids = {source: i for i, source in enumerate(sources)}
+
+        arrays = {
+            "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            "postings": doc_ids[order],
+            "tfs": fwd_tfs[order],
+            "doc_lengths": doc_lengths,
+            "doc_sources": np.array([source_ids[doc["source"]] for doc in docs], dtype=np.int32),
+            **forward,
+        }
+        avg_doc_length = float(doc_lengths.mean()) if len(docs) else 1.0
+        return cls(terms, docs, sources, arrays, avg_doc_length)
+
+    def updated(self, docs: List[Dict[str, Any]], removed_sources: Iterable[str]) -> "BM25Index":
+        """A new index without documents from ``removed_sources`` and with ``docs`` added.
+
+        Only the new documents are tokenized; the kept ones contribute their
+        stored forward postings.
+        """
+        removed = set(removed_sources) | {doc["source"] for doc in docs}
+        keep = [i for i, doc in enumerate(self.docs) if doc["source"] not in removed]
+        added = BM25Index.build(docs)
+
+        terms = sorted(set(self.terms) | set(added.terms))
+        old_map = np.searchsorted(terms, self.terms).astype(np.int32) if self.terms else np.zeros(0, np.int32)
+        new_map = np.searchsorted(terms, added.terms).astype(np.int32) if added.terms else np.zeros(0, np.int32)
+
+        kept_slices = [slice(self.fwd_offsets[i], self.fwd_offsets[i + 1]) for i in keep]
+        kept_terms = [old_map[np.asarray(self.fwd_terms[s])] for s in kept_slices]
+        kept_tfs = [np.asarray(self.fwd_tfs[s]) for s in kept_slices]
+        lengths = [len(t) for t in kept_terms] + list(np.diff(added.fwd_offsets))
+        forward = {
+            "fwd_offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            "fwd_terms": np.concatenate(kept_terms + [new_map[added.fwd_terms], np.zeros(0, np.int32)]),
+            "fwd_tfs": np.concatenate(kept_tfs + [added.fwd_tfs, np.zeros(0, np.float32)]),
+        }
+        return BM25Index._from_forward(terms, [self.docs[i] for i in keep] + added.docs, forward)
+
+    def term_id(self, term: str) -> Optional[int]:
+        position = bisect_left(self.terms, term)
+        if position < len(self.terms) and self.terms[position] == term:
+            return position
+        return None
+
+    def lookup(self, term: str) -> np.ndarray:
+        """Sorted ids of the documents containing ``term`` (an exact, lower-cased token)."""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int32)
+        return np.asarray(self.postings[self.offsets[term_id]:self.offsets[term_id + 1]])
+
+    def contains(self, doc_id: int, term: str) -> bool:
+        docs = self.lookup(term)
+        position = np.searchsorted(docs, doc_id)
+        return bool(position < len(docs) and docs[position] == doc_id)
+
+    def search(self, query_terms: Iterable[str], top_k: int,
+               exclude_sources: Iterable[str] = ()) -> List[Tuple[int, float]]:
+        """Top-k (document id, BM25 score) pairs for ``query_terms``, best first."""
+        n = len(self.docs)
+        if n == 0 or top_k <= 0:
+            return []
+        k1, b = settings.bm25_k1, settings.bm25_b
+
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(query_terms):
+            term_id = self.term_id(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            if start == end:
+                continue
+            docs = np.asarray(self.postings[start:end])
+            tf = np.asarray(self.tfs[start:end])
+            idf = math.log(1 + (n - (end - start) + 0.5) / ((end - start) + 0.5))
+            length_norm = 1 - b + b * np.asarray(self.doc_lengths)[docs] / self.avg_doc_length
+            # Postings hold each document once per term, so fancy-index addition is safe
+            scores[docs] += idf * tf * (k1 + 1) / (tf + k1 * length_norm)
+
+        exclude_sources = set(exclude_sources)
+        excluded = [i for i, source in enumerate(self.sources) if source in exclude_sources]
+        if excluded:
+            scores[np.isin(self.doc_sources, excluded)] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        ranked = sorted(candidates, key=lambda i: (-scores[i], i))
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    def save(self, directory: str):
+        """Write the index as a new version under ``directory`` and switch to it.
+
+        The arrays go to a fresh ``v<N>/`` directory, then meta.json, which
+        names the version, is replaced atomically. Readers therefore see the
+        old or the new index whole, and arrays an older version has
+        memory-mapped are never rewritten. The previous version is kept for
+        readers that are still opening it; older ones are removed.
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        versions = _saved_versions(path)
+        version = max(versions, default=0) + 1
+        version_dir = path / f"v{version}"
+        version_dir.mkdir()
+        for name in _ARRAYS:
+            np.save(version_dir / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        meta = {"version": version, "terms": self.terms, "docs": self.docs, "sources": self.sources,
+                "avg_doc_length": self.avg_doc_length}
+        tmp = path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, path / "meta.json")
+
+        for old in versions:
+            if old < version - 1:
+                shutil.rmtree(path / f"v{old}", ignore_errors=True)
+        # Arrays of indexes saved before versioning sat next to meta.json
+        for name in _ARRAYS:
+            (path / f"{name}.npy").unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        path = Path(directory)
+        try:
+            meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+            array_dir = path / f"v{meta['version']}" if "version" in meta else path
+            arrays = {name: np.load(array_dir / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        except (OSError, ValueError):
+            return None
+        if len(arrays["doc_lengths"]) != len(meta["docs"]):
+            return None
+        return cls(meta["terms"], meta["docs"], meta["sources"], arrays, meta["avg_doc_length"])
+
+
+class KeywordIndexStore(IncrementalIndex):
+    """One BM25Index of file chunks per repository, refreshed incrementally as the base commit moves."""
+
+    name = "bm25"
+
+    def __init__(self, github_client: GitHubProvider, index_dir: Optional[str] = None,
+                 indexer: Optional[IncrementalIndexer] = None):
+        self.github_client = github_client
+        self.index_dir = Path(index_dir or settings.keyword_index_dir)
+        self.indexer = indexer or IncrementalIndexer(github_client)
+        self.last_refresh: Optional[IndexRefresh] = None
+        self._indexes: Dict[str, BM25Index] = {}
+
+    def get_index(self, repo: str, ref: str) -> BM25Index:
+        """The index for ``repo``, first brought up to date with ``ref``."""
+        self.last_refresh = self.indexer.refresh(repo, ref, self)
+        return self._indexes[repo]
+
+    def accepts(self, file_path: str) -> bool:
+        return is_indexable(file_path)
+
+    def has_state(self, repo: str) -> bool:
+        if repo not in self._indexes:
+            index = BM25Index.load(str(self._directory(repo)))
+            if index is None:
+                return False
+            self._indexes[repo] = index
+        return True
+
+    def apply_changes(self, repo: str, ref: str, changed: Dict[str, str], deleted: List[str]):
+        docs = [
+            {"source": chunk.file_path, "start_line": chunk.start_line, "end_line": chunk.end_line,
+             "text": chunk.text}
+            for path in sorted(changed)
+            if not changed[path].startswith("# Mock content")
+            and len(changed[path]) <= settings.vector_index_max_file_bytes
+            for chunk in chunk_file(path, changed[path])
+        ]
+        current = self._indexes.get(repo) or BM25Index.build([])
+        index = current.updated(docs, set(changed) | set(deleted))
+        index.save(str(self._directory(repo)))
+        self._indexes[repo] = index
+
+    def _directory(self, repo: str) -> Path:
+        return self.index_dir / re.sub(r"[^A-Za-z0-9._-]", "_", repo.replace("/", "__"))
@@ -0,0 +1,162 @@
+from typing import List, Dict, Any, Optional, Callable
+from dataclasses import dataclass, field
+
+from app_logging.schemas.models import RetrievedDocument
+from config.settings import settings
+
+
+def _heuristic_token_count(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used when tiktoken is unavailable."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def load_token_counter(model: Optional[str] = None) -> Callable[[str], int]:
+    """Return a token counting function for ``model``.
+
+    Uses tiktoken's encoding for the model when tiktoken is installed and its
+    encoding files are available, otherwise falls back to a character heuristic.
+    """
+    model = model or settings.openai_model
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return _heuristic_token_count
+
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class PackingResult:
+    """Documents selected for the prompt and a record of every packing decision."""
+    documents: List[RetrievedDocument]
+    budget_tokens: int
+    used_tokens: int
+    tokenizer: str
+    included: List[Dict[str, Any]] = field(default_factory=list)
+    dropped: List[Dict[str, Any]] = field(default_factory=list)
+    chunk_tokens: Optional[int] = None
+
+    def summary(self) -> Dict[str, Any]:
+        """Serializable summary of the packing decisions for the retrieval step log."""
+        return {
+            "budget_tokens": self.budget_tokens,
+            "used_tokens": self.used_tokens,
+            "tokenizer": self.tokenizer,
+            "chunk_tokens": self.chunk_tokens,
+            "included": self.included,
+            "dropped": self.dropped
+        }
+
+
+class ContextPacker:
+    """Packs retrieved documents into a per-model token budget.
+
+    Documents are split on line boundaries into chunks of at most
+    ``context_chunk_tokens`` tokens instead of being cut off. Chunks are then
+    added greedily by relevance per token until the budget is spent.
+    """
+
+    def __init__(self, model: Optional[str] = None, budget_tokens: Optional[int] = None,
+                 chunk_tokens: Optional[int] = None,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.model = model or settings.openai_model
+        self.budget_tokens = budget_tokens or settings.context_token_budgets.get(
+            self.model, settings.max_context_length
+        )
+        self.chunk_tokens = chunk_tokens or settings.context_chunk_tokens
+        self.count_tokens = count_tokens or load_token_counter(self.model)
+        self.tokenizer_name = "heuristic" if self.count_tokens is _heuristic_token_count else "tiktoken"
+
+    def pack(self, documents: List[RetrievedDocument], max_sources: Optional[int] = None) -> PackingResult:
+        """Select document chunks that fit the token budget.
+
+        ``max_sources`` optionally caps how many distinct documents may contribute chunks.
+        """
+        candidates = []
+        for doc_index, doc in enumerate(documents):
+            for chunk in self.split_document(doc):
+                tokens = self.count_tokens(self.format_header(chunk)) + self.count_tokens(chunk.content)
+                score = (chunk.relevance_score or 0) / tokens
+                candidates.append((doc_index, chunk, tokens, score))
+
+        # Highest relevance per token first; ties keep retrieval order
+        ranked = sorted(candidates, key=lambda c: (-c[3], c[0], c[1].metadata.get("chunk", 0)))
+
+        result = PackingResult(documents=[], budget_tokens=self.budget_tokens, used_tokens=0,
+                               tokenizer=self.tokenizer_name, chunk_tokens=self.chunk_tokens)
+        selected = []
+        sources = set()
+        for doc_index, chunk, tokens, score in ranked:
+            decision = {
+                "source": chunk.source,
+                "chunk": chunk.metadata.get("chunk", 0),
+                "tokens": tokens,
+                "relevance": chunk.relevance_score,
+                "relevance_per_token": round(score, 6)
+            }
+
+            if max_sources is not None and doc_index not in sources and len(sources) >= max_sources:
+                result.dropped.append({**decision, "reason": "max_sources"})
+            elif result.used_tokens + tokens > self.budget_tokens:
+                result.dropped.append({**decision, "reason": "budget"})
+            else:
+                selected.append((doc_index, chunk))
+                sources.add(doc_index)
+                result.used_tokens += tokens
+                result.included.append(decision)
+
+        # Present chunks grouped by document, most relevant documents first
+        selected.sort(key=lambda s: (-(s[1].relevance_score or 0), s[0], s[1].metadata.get("chunk", 0)))
+        result.documents = [chunk for _, chunk in selected]
+        return result
+
+    def split_document(self, doc: RetrievedDocument) -> List[RetrievedDocument]:
+        """Split a document into chunks of at most ``chunk_tokens`` tokens on line boundaries."""
+        if self.count_tokens(doc.content) <= self.chunk_tokens:
+            return [doc]
+
+        chunks: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+        for line in doc.content.splitlines(keepends=True):
+            line_tokens = self.count_tokens(line)
+
+            # A single oversized line is hard-split by characters
+            while line_tokens > self.chunk_tokens:
+                cut = max(1, len(line) * self.chunk_tokens // line_tokens)
+                if current:
+                    chunks.append("".join(current))
+                    current, current_tokens = [], 0
+                chunks.append(line[:cut])
+                line = line[cut:]
+                line_tokens = self.count_tokens(line)
+
+            if current and current_tokens + line_tokens > self.chunk_tokens:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += line_tokens
+
+        if current:
+            chunks.append("".join(current))
+
+        return [
+            RetrievedDocument(
+                content=chunk,
+                source=doc.source,
+                relevance_score=doc.relevance_score,
+                metadata={**(doc.metadata or {}), "chunk": index, "chunks": len(chunks)}
+            )
+            for index, chunk in enumerate(chunks)
+        ]
+
+    @staticmethod
+    def format_header(doc: RetrievedDocument) -> str:
+        """Header line preceding a document in the prompt."""
+        metadata = doc.metadata or {}
+        part = f"part {metadata['chunk'] + 1}/{metadata['chunks']}, " if "chunks" in metadata else ""
+        return f"\n**{doc.source}** ({part}Relevance: {doc.relevance_score or 'N/A'}):\n"
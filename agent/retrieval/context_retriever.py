@@ -1,40 +1,264 @@
-from typing import List, Dict, Any
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable, TYPE_CHECKING
 from app_logging.schemas.models import RetrievedDocument
-from ..providers.github_client import MockGitHubClient, PRInfo
+from ..providers.github_client import GitHubProvider, PRInfo, FileDiff
+from ..providers.diff_parser import excerpt_lines
 from ..criteria.criteria_processor import CriteriaProcessor
+from .context_packer import ContextPacker, PackingResult
+from .hybrid import EmbeddingReranker, load_reranker, rank_by_stage, reciprocal_rank_fusion, run_candidate_stages
 from config.settings import settings
 
+if TYPE_CHECKING:
+    from .bm25_index import KeywordIndexStore
+    from .incremental_indexer import IncrementalIndexer
+    from .symbol_graph import SymbolIndexStore
+    from .vector_index import VectorIndexStore
+
 
 class ContextRetriever:
     """Retrieves relevant context for PR reviews."""
     
-    def __init__(self, github_client: MockGitHubClient, criteria_processor: CriteriaProcessor):
+    def __init__(self, github_client: GitHubProvider, criteria_processor: CriteriaProcessor,
+                 context_packer: Optional[ContextPacker] = None,
+                 vector_index_store: Optional["VectorIndexStore"] = None,
+                 keyword_index_store: Optional["KeywordIndexStore"] = None,
+                 symbol_index_store: Optional["SymbolIndexStore"] = None):
         self.github_client = github_client
         self.criteria_processor = criteria_processor
+        self._context_packer = context_packer
+        self._vector_index_store = vector_index_store
+        self._keyword_index_store = keyword_index_store
+        self._symbol_index_store = symbol_index_store
+        self._indexer: Optional["IncrementalIndexer"] = None
+    
+    @property
+    def context_packer(self) -> ContextPacker:
+        """The packer, created on first use since loading the tokenizer is slow."""
+        if self._context_packer is None:
+            self._context_packer = ContextPacker()
+        return self._context_packer
+    
+    @property
+    def indexer(self) -> "IncrementalIndexer":
+        """The manifest of indexed blobs shared by the repository indexes."""
+        if self._indexer is None:
+            from .incremental_indexer import IncrementalIndexer
+            self._indexer = IncrementalIndexer(self.github_client)
+        return self._indexer
+    
+    @property
+    def vector_index_store(self) -> "VectorIndexStore":
+        """Per-repository semantic indexes, created on first use (imports NumPy)."""
+        if self._vector_index_store is None:
+            from .vector_index import VectorIndexStore
+            self._vector_index_store = VectorIndexStore(self.github_client, indexer=self.indexer)
+        return self._vector_index_store
+    
+    @property
+    def keyword_index_store(self) -> "KeywordIndexStore":
+        """Per-repository BM25 indexes, created on first use (imports NumPy)."""
+        if self._keyword_index_store is None:
+            from .bm25_index import KeywordIndexStore
+            self._keyword_index_store = KeywordIndexStore(self.github_client, indexer=self.indexer)
+        return self._keyword_index_store
+    
+    @property
+    def symbol_index_store(self) -> "SymbolIndexStore":
+        """Per-repository symbol and import graphs, created on first use."""
+        if self._symbol_index_store is None:
+            from .symbol_graph import SymbolIndexStore
+            self._symbol_index_store = SymbolIndexStore(self.github_client, indexer=self.indexer)
+        return self._symbol_index_store
     
     def retrieve_context(self, repo: str, pr_info: PRInfo, criteria_data: Dict[str, Any]) -> List[RetrievedDocument]:
-        """Retrieve all relevant context for the PR review."""
-        documents = []
+        """Retrieve all relevant context for the PR review, packed into the token budget."""
+        return self.retrieve_packed_context(repo, pr_info, criteria_data).documents
+    
+    def retrieve_packed_context(self, repo: str, pr_info: PRInfo, criteria_data: Dict[str, Any],
+                                pr_documents: Optional[List[RetrievedDocument]] = None) -> PackingResult:
+        """Retrieve context and pack it into the token budget, keeping the packing decisions.
+        
+        ``pr_documents`` (from ``collect_pr_documents``) skips fetching the
+        repository, file and commit documents again.
+        """
+        return self._retrieve(repo, pr_info, criteria_data, pr_documents)[0]
+    
+    def _retrieve(self, repo: str, pr_info: PRInfo, criteria_data: Dict[str, Any],
+                  pr_documents: Optional[List[RetrievedDocument]] = None,
+                  pr_stages: Optional[List[Dict[str, Any]]] = None
+                  ) -> Tuple[PackingResult, Dict[str, Any], List[RetrievedDocument]]:
+        """Fuse and pack the candidates; returns the packing, the retrieval report and the fused candidates."""
+        documents, stages = self._collect_documents(repo, pr_info, criteria_data, pr_documents, pr_stages)
+        packing = self.context_packer.pack(documents, max_sources=settings.max_retrieval_docs)
+        return packing, self._retrieval_report(pr_info, documents, packing.documents, stages), documents
+    
+    def _collect_documents(self, repo: str, pr_info: PRInfo, criteria_data: Dict[str, Any],
+                           pr_documents: Optional[List[RetrievedDocument]] = None,
+                           pr_stages: Optional[List[Dict[str, Any]]] = None
+                           ) -> Tuple[List[RetrievedDocument], List[Dict[str, Any]]]:
+        """Gather candidates from every stage and fuse them into one ranking.
         
-        # Get criteria-specific documents
-        criteria_docs = self.criteria_processor.get_relevant_documents(criteria_data)
-        documents.extend(criteria_docs)
+        Each stage (criteria, structural, commit history, dense, lexical and
+        graph) ranks its own candidates; reciprocal-rank fusion merges the
+        rankings and the optional reranker reorders the fused head. Returns the
+        fused documents, best first with their fused relevance, and a report
+        per stage.
+        """
+        documents, stages = run_candidate_stages(
+            {"criteria": lambda: self.criteria_processor.get_relevant_documents(criteria_data)}
+        )
         
-        # Get repository-specific context
-        repo_context = self._get_repository_context(repo, pr_info)
-        documents.extend(repo_context)
+        if pr_documents is None:
+            candidates = self.collect_pr_candidates(repo, pr_info)
+            pr_documents, pr_stages = candidates["documents"], candidates["retrieval_stages"]
+        documents.extend(pr_documents)
+        stages.extend(pr_stages or [])
         
-        # Get file-specific context
-        file_context = self._get_file_context(repo, pr_info)
-        documents.extend(file_context)
+        if settings.keyword_retrieval_enabled:
+            documents = self._score_keywords(documents, pr_info)
         
-        # Get commit history context
-        commit_context = self._get_commit_context(repo, pr_info)
-        documents.extend(commit_context)
+        start = time.perf_counter()
+        fused = reciprocal_rank_fusion(rank_by_stage(documents))[:settings.retrieval_fusion_limit]
+        top_score = fused[0][1] if fused else 1.0
+        documents = [
+            # Copied so documents shared between criteria sets are never mutated
+            doc.model_copy(update={
+                "relevance_score": round(score / top_score, 4),
+                "metadata": {**doc.metadata, "retrievers": retrievers, "fused_score": round(score, 6)}
+            })
+            for doc, score, retrievers in fused
+        ]
+        stages.append({"stage": "fusion", "candidates": sum(len(r) for _, _, r in fused),
+                       "returned": len(documents), "milliseconds": round((time.perf_counter() - start) * 1000, 2)})
         
-        # Sort by relevance and limit
-        documents.sort(key=lambda x: x.relevance_score or 0, reverse=True)
-        return documents[:settings.max_retrieval_docs]
+        reranker = load_reranker()
+        if reranker is not None:
+            documents, rerank_stage = self._rerank(reranker, documents, pr_info)
+            stages.append(rerank_stage)
+        return documents, stages
+    
+    def _rerank(self, reranker: EmbeddingReranker, documents: List[RetrievedDocument],
+                pr_info: PRInfo) -> Tuple[List[RetrievedDocument], Dict[str, Any]]:
+        """Blend the reranker's similarity to the diff into the fused relevance of each candidate."""
+        from .vector_index import diff_queries
+        
+        start = time.perf_counter()
+        budget_ms = settings.retrieval_stage_budgets_ms.get("rerank")
+        scores = reranker.score(diff_queries(pr_info), documents, budget_ms)
+        weight = settings.retrieval_rerank_weight
+        reranked = []
+        for doc, score in zip(documents, scores):
+            if score is not None:
+                relevance = (1 - weight) * doc.relevance_score + weight * max(score, 0.0)
+                doc = doc.model_copy(update={"relevance_score": round(relevance, 4),
+                                             "metadata": {**doc.metadata, "rerank_score": round(score, 4)}})
+            reranked.append(doc)
+        reranked.sort(key=lambda doc: doc.relevance_score, reverse=True)
+        scored = sum(score is not None for score in scores)
+        return reranked, {"stage": "rerank", "reranker": reranker.name, "budget_ms": budget_ms,
+                          "candidates": len(documents), "returned": scored,
+                          "timed_out": scored < len(documents),
+                          "milliseconds": round((time.perf_counter() - start) * 1000, 2)}
+    
+    def _retrieval_report(self, pr_info: PRInfo, fused: List[RetrievedDocument],
+                          packed: List[RetrievedDocument], stages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """The retrieval report logged with the context.
+        
+        Adds to each stage's timing how many of its candidates survived fusion
+        and packing, and measures recall as the share of changed files and of
+        changed symbols that the packed context covers.
+        """
+        from .bm25_index import diff_identifiers
+        
+        packed_sources = {doc.source for doc in packed}
+        stages = [dict(stage) for stage in stages]
+        for stage in stages:
+            if stage["stage"] in ("fusion", "rerank"):
+                continue
+            in_stage = [doc for doc in fused if stage["stage"] in doc.metadata.get("retrievers", [])]
+            stage["fused"] = len(in_stage)
+            stage["packed"] = sum(doc.source in packed_sources for doc in in_stage)
+        
+        changed_files = [f.file_path for f in pr_info.files_changed if f.status != "removed"]
+        symbols = diff_identifiers(pr_info)
+        packed_text = "\n".join(doc.content for doc in packed).lower()
+        return {
+            "stages": stages,
+            "recall": {
+                "changed_files": len(changed_files),
+                "changed_file_recall": round(sum(path in packed_sources for path in changed_files)
+                                             / len(changed_files), 4) if changed_files else None,
+                "symbols": len(symbols),
+                "symbol_recall": round(sum(symbol in packed_text for symbol in symbols)
+                                       / len(symbols), 4) if symbols else None
+            }
+        }
+    
+    def _score_keywords(self, documents: List[RetrievedDocument], pr_info: PRInfo) -> List[RetrievedDocument]:
+        """Annotate criteria documents and commit histories with their BM25 score against the diff's identifiers."""
+        from .bm25_index import BM25Index, diff_identifiers
+        
+        terms = diff_identifiers(pr_info)
+        candidates = [i for i, doc in enumerate(documents)
+                      if doc.metadata.get("type", "criteria") in ("criteria", "commit_history")]
+        if not terms or not candidates:
+            return documents
+        
+        index = BM25Index.build([{"source": str(i), "text": documents[i].content} for i in candidates])
+        documents = list(documents)
+        for doc_id, score in index.search(terms, top_k=len(candidates)):
+            position = candidates[doc_id]
+            doc = documents[position]
+            # Copied so documents shared between criteria sets are never mutated
+            documents[position] = doc.model_copy(update={"metadata": {**doc.metadata, "keyword_score": round(score, 4)}})
+        return documents
+    
+    def collect_pr_documents(self, repo: str, pr_info: PRInfo) -> List[RetrievedDocument]:
+        """Gather the repository, file, commit and related-code documents for a PR; they do not depend on the criteria."""
+        return self.collect_pr_candidates(repo, pr_info)["documents"]
+    
+    def collect_pr_candidates(self, repo: str, pr_info: PRInfo) -> Dict[str, Any]:
+        """Run the criteria-independent candidate stages concurrently.
+        
+        Returns the stages' ``documents`` (each tagged with its stage) and
+        ``retrieval_stages``, a report per stage with its timing, candidate
+        count and whether it ran out of its latency budget.
+        """
+        base_ref = self._base_ref(pr_info)
+        
+        added = {file_diff.file_path for file_diff in pr_info.files_changed if file_diff.status == "added"}
+        
+        def fetch_base_content(repo: str, file_path: str, ref: str) -> Optional[str]:
+            # Added files have no base version to read
+            return None if file_path in added else self.github_client.get_file_content(repo, file_path, ref)
+        
+        def structural() -> List[RetrievedDocument]:
+            # Repository documentation and the changed files themselves
+            file_contents = self._fetch_per_file(pr_info, fetch_base_content, repo, base_ref)
+            return self._get_repository_context(repo, pr_info) + self._get_file_context(repo, pr_info, file_contents)
+        
+        def commit_history() -> List[RetrievedDocument]:
+            commit_histories = self._fetch_per_file(pr_info, self.github_client.get_commit_history, repo, 3)
+            return self._get_commit_context(repo, pr_info, commit_histories)
+        
+        stages = {"structural": structural, "commit_history": commit_history}
+        
+        # Related code from elsewhere in the repository
+        if settings.semantic_retrieval_enabled:
+            stages["dense"] = lambda: self._get_semantic_context(repo, pr_info)
+        if settings.keyword_retrieval_enabled:
+            stages["lexical"] = lambda: self._get_keyword_context(repo, pr_info)
+        if settings.symbol_retrieval_enabled:
+            stages["graph"] = lambda: self._get_graph_context(repo, pr_info)
+        
+        documents, reports = run_candidate_stages(stages)
+        return {"documents": documents, "retrieval_stages": reports}
+    
+    async def acollect_pr_candidates(self, repo: str, pr_info: PRInfo) -> Dict[str, Any]:
+        """Async variant of collect_pr_candidates."""
+        return await asyncio.to_thread(self.collect_pr_candidates, repo, pr_info)
     
     def _get_repository_context(self, repo: str, pr_info: PRInfo) -> List[RetrievedDocument]:
         """Get repository-level context like README, style guides, etc."""
@@ -42,7 +266,7 @@ class ContextRetriever:
         
         # Get README content
         try:
-            readme_content = self.github_client.get_file_content(repo, "README.md")
+            readme_content = self.github_client.get_file_content(repo, "README.md", self._base_ref(pr_info))
             if readme_content and not readme_content.startswith("# Mock content"):
                 documents.append(RetrievedDocument(
                     content=readme_content,
@@ -55,7 +279,7 @@ class ContextRetriever:
         
         # Get requirements.txt for dependency context
         try:
-            requirements_content = self.github_client.get_file_content(repo, "requirements.txt")
+            requirements_content = self.github_client.get_file_content(repo, "requirements.txt", self._base_ref(pr_info))
             if requirements_content and not requirements_content.startswith("# Mock content"):
                 documents.append(RetrievedDocument(
                     content=requirements_content,
@@ -67,7 +291,7 @@ class ContextRetriever:
             pass
         
         # Get repository file structure
-        repo_files = self.github_client.get_repo_files(repo)
+        repo_files = self.github_client.get_repo_files(repo, self._base_ref(pr_info))
         if repo_files:
             file_structure = "\n".join(repo_files)
             documents.append(RetrievedDocument(
@@ -79,21 +303,72 @@ class ContextRetriever:
         
         return documents
     
-    def _get_file_context(self, repo: str, pr_info: PRInfo) -> List[RetrievedDocument]:
+    def _fetch_per_file(self, pr_info: PRInfo, fetch: Callable[..., Any], repo: str,
+                        *args: Any, **kwargs: Any) -> List[Any]:
+        """Call ``fetch(repo, file_path, ...)`` for every changed file concurrently.
+        
+        Results are returned in ``files_changed`` order (an ``Exception`` in
+        place of a failed fetch) so the documents built from them are
+        deterministic.
+        """
+        files = pr_info.files_changed
+        if not files:
+            return []
+        
+        max_workers = max(1, min(settings.retrieval_max_concurrency, len(files)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch, repo, file_diff.file_path, *args, **kwargs) for file_diff in files]
+            return [self._future_result(future) for future in futures]
+    
+    @staticmethod
+    def _format_file_content(file_diff: FileDiff, file_content: Optional[str]) -> str:
+        """The diff plus the base content around its hunks, or the whole file without hunks.
+        
+        Without base content (added files, failed fetches) only the diff is given.
+        """
+        if file_content is None:
+            return f"Diff:\n{file_diff.diff_content}"
+        hunk_index = file_diff.hunk_index()
+        if not hunk_index or settings.diff_context_lines < 0:
+            return f"Current content:\n{file_content}"
+        
+        ranges = hunk_index.hunk_ranges(side="old", context_lines=settings.diff_context_lines)
+        formatted = f"Diff:\n{file_diff.diff_content}\n\n"
+        formatted += f"Base content around changes (±{settings.diff_context_lines} lines):\n"
+        formatted += excerpt_lines(file_content, ranges)
+        return formatted
+    
+    @staticmethod
+    def _base_ref(pr_info: PRInfo) -> str:
+        """Pin base-branch reads to the base commit when the provider reports it."""
+        return pr_info.base_sha or pr_info.base_branch
+    
+    @staticmethod
+    def _future_result(future) -> Any:
+        """Return a future's result, or the exception it raised."""
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+    
+    def _get_file_context(self, repo: str, pr_info: PRInfo,
+                          file_contents: List[Any]) -> List[RetrievedDocument]:
         """Get context for files being changed in the PR."""
         documents = []
+        repo_files: Optional[List[str]] = None
         
-        for file_diff in pr_info.files_changed:
+        for file_diff, file_content in zip(pr_info.files_changed, file_contents):
             try:
-                # Get the current file content
-                file_content = self.github_client.get_file_content(repo, file_diff.file_path)
+                # A missing base version still leaves the diff to review
+                if isinstance(file_content, Exception) or (file_content or "").startswith("# Mock content"):
+                    file_content = None
                 
-                if file_content and not file_content.startswith("# Mock content"):
+                if file_content or file_diff.diff_content:
                     # Create a context document for this file
                     context_content = f"File: {file_diff.file_path}\n"
                     context_content += f"Status: {file_diff.status}\n"
                     context_content += f"Additions: {file_diff.additions}, Deletions: {file_diff.deletions}\n\n"
-                    context_content += f"Current content:\n{file_content}"
+                    context_content += self._format_file_content(file_diff, file_content)
                     
                     documents.append(RetrievedDocument(
                         content=context_content,
@@ -113,7 +388,9 @@ class ContextRetriever:
                     # Look for related module files
                     module_dir = file_diff.file_path.rsplit("/", 1)[0]
                     try:
-                        module_files = [f for f in self.github_client.get_repo_files(repo) 
+                        if repo_files is None:
+                            repo_files = self.github_client.get_repo_files(repo, self._base_ref(pr_info))
+                        module_files = [f for f in repo_files 
                                       if f.startswith(module_dir) and f != file_diff.file_path]
                         if module_files:
                             related_content = f"Related module files:\n" + "\n".join(module_files)
@@ -132,13 +409,15 @@ class ContextRetriever:
         
         return documents
     
-    def _get_commit_context(self, repo: str, pr_info: PRInfo) -> List[RetrievedDocument]:
+    def _get_commit_context(self, repo: str, pr_info: PRInfo,
+                            commit_histories: List[Any]) -> List[RetrievedDocument]:
         """Get context from recent commit history."""
         documents = []
         
-        for file_diff in pr_info.files_changed:
+        for file_diff, commit_history in zip(pr_info.files_changed, commit_histories):
             try:
-                commit_history = self.github_client.get_commit_history(repo, file_diff.file_path, limit=3)
+                if isinstance(commit_history, Exception):
+                    continue
                 
                 if commit_history:
                     history_content = f"Recent commit history for {file_diff.file_path}:\n"
@@ -156,9 +435,121 @@ class ContextRetriever:
         
         return documents
     
-    def get_enhanced_context(self, repo: str, pr_info: PRInfo, criteria_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Get enhanced context with metadata for the review process."""
-        documents = self.retrieve_context(repo, pr_info, criteria_data)
+    def _get_semantic_context(self, repo: str, pr_info: PRInfo) -> List[RetrievedDocument]:
+        """Chunks outside the changed files that are most similar to the PR's diff hunks.
+        
+        Runs as the ``dense`` stage; index errors are recorded in its stage report.
+        """
+        from .vector_index import diff_queries
+        
+        queries = diff_queries(pr_info)
+        if not queries:
+            return []
+        
+        index = self.vector_index_store.get_index(repo, self._base_ref(pr_info))
+        hits = index.search_texts(
+            queries, settings.semantic_top_k,
+            exclude_paths={file_diff.file_path for file_diff in pr_info.files_changed},
+            min_score=settings.semantic_min_score
+        )
+        
+        documents = []
+        for hit in hits:
+            chunk = hit.chunk
+            documents.append(RetrievedDocument(
+                content=f"Related code: {chunk.file_path} (lines {chunk.start_line}-{chunk.end_line})\n{chunk.text}",
+                source=f"{chunk.file_path}:{chunk.start_line}-{chunk.end_line}",
+                # Ranked below the changed files themselves, by similarity
+                relevance_score=round(0.5 + 0.35 * hit.score, 3),
+                metadata={
+                    "type": "semantic_match",
+                    "file_path": chunk.file_path,
+                    "start_line": chunk.start_line,
+                    "end_line": chunk.end_line,
+                    "similarity": hit.score
+                }
+            ))
+        return documents
+    
+    def _get_keyword_context(self, repo: str, pr_info: PRInfo) -> List[RetrievedDocument]:
+        """Chunks outside the changed files that mention the identifiers the diff touches, ranked by BM25.
+        
+        Runs as the ``lexical`` stage; index errors are recorded in its stage report.
+        """
+        from .bm25_index import diff_identifiers
+        
+        terms = diff_identifiers(pr_info)
+        if not terms:
+            return []
+        
+        index = self.keyword_index_store.get_index(repo, self._base_ref(pr_info))
+        hits = index.search(terms, settings.keyword_top_k,
+                            exclude_sources={file_diff.file_path for file_diff in pr_info.files_changed})
+        
+        documents = []
+        top_score = hits[0][1] if hits else 1.0
+        for doc_id, score in hits:
+            doc = index.docs[doc_id]
+            documents.append(RetrievedDocument(
+                content=f"Code mentioning changed symbols: {doc['source']} "
+                        f"(lines {doc['start_line']}-{doc['end_line']})\n{doc['text']}",
+                source=f"{doc['source']}:{doc['start_line']}-{doc['end_line']}",
+                # Ranked below the changed files themselves, relative to the best match
+                relevance_score=round(0.5 + 0.3 * score / top_score, 3),
+                metadata={
+                    "type": "keyword_match",
+                    "file_path": doc["source"],
+                    "start_line": doc["start_line"],
+                    "end_line": doc["end_line"],
+                    "bm25_score": round(score, 4),
+                    "matched_symbols": [term for term in terms if index.contains(doc_id, term)]
+                }
+            ))
+        return documents
+    
+    def _get_graph_context(self, repo: str, pr_info: PRInfo) -> List[RetrievedDocument]:
+        """Callers and callees of the changed definitions from the symbol graph, nearest first.
+        
+        Runs as the ``graph`` stage; index errors are recorded in its stage report.
+        """
+        related = self.symbol_index_store.related_to(repo, pr_info, self._base_ref(pr_info))
+        
+        documents = []
+        for symbol in related[:settings.symbol_top_k]:
+            definition = symbol.definition
+            documents.append(RetrievedDocument(
+                content=f"{symbol.relation.capitalize()} of {symbol.via} (distance {symbol.distance}): "
+                        f"{symbol.qualname} in {symbol.file_path} "
+                        f"(lines {definition['start']}-{definition['end']})\n{definition['text']}",
+                source=f"{symbol.file_path}:{definition['start']}-{definition['end']}",
+                # Ranked below the changed files themselves, by distance; name-only links rank lower
+                relevance_score=round(0.85 - 0.1 * (symbol.distance - 1) - (0 if symbol.imported else 0.05), 3),
+                metadata={
+                    "type": "symbol_graph",
+                    "file_path": symbol.file_path,
+                    "symbol": symbol.qualname,
+                    "relation": symbol.relation,
+                    "via": symbol.via,
+                    "distance": symbol.distance,
+                    "imported": symbol.imported,
+                    "start_line": definition["start"],
+                    "end_line": definition["end"]
+                }
+            ))
+        return documents
+    
+    def get_enhanced_context(self, repo: str, pr_info: PRInfo, criteria_data: Dict[str, Any],
+                             pr_documents: Optional[List[RetrievedDocument]] = None,
+                             pr_stages: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Get enhanced context with metadata for the review process.
+        
+        ``pr_stages`` are the stage reports returned with ``pr_documents`` by
+        ``collect_pr_candidates``; they are included in the ``retrieval`` report.
+        ``candidates`` keeps the fused ranking before packing so map-reduce
+        review can pack each file group into its own budget.
+        """
+        packing, retrieval, candidates = self._retrieve(repo, pr_info, criteria_data, pr_documents, pr_stages)
+        documents = packing.documents
         
         # Group documents by type
         context_by_type = {}
@@ -173,6 +564,9 @@ class ContextRetriever:
             "documents": documents,
             "context_by_type": context_by_type,
             "total_documents": len(documents),
+            "packing": packing.summary(),
+            "candidates": candidates,
+            "retrieval": retrieval,
             "criteria_focus": criteria_data.get("focus", "General review"),
             "repository": repo,
             "pr_summary": {
@@ -183,4 +577,11 @@ class ContextRetriever:
             }
         }
         
-        return enhanced_context 
\ No newline at end of file
+        return enhanced_context 
+    
+    async def aget_enhanced_context(self, repo: str, pr_info: PRInfo, criteria_data: Dict[str, Any],
+                                    pr_documents: Optional[List[RetrievedDocument]] = None,
+                                    pr_stages: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Async variant of get_enhanced_context that keeps the event loop free during retrieval."""
+        return await asyncio.to_thread(self.get_enhanced_context, repo, pr_info, criteria_data,
+                                       pr_documents, pr_stages)
@@ -0,0 +1,98 @@
+from typing import List, Optional, Tuple
+from functools import lru_cache
+import hashlib
+import math
+import re
+
+import numpy as np
+
+from config.settings import settings
+
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_PARTS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+[0-9]*|[A-Z]+[0-9]*|[0-9]+")
+
+# Words too common in source code to say anything about what it does
+STOP_WORDS = frozenset("""
+    and as assert async await break class const continue def del elif else except false finally for from
+    function if import in is let none not null or pass raise return self the this true try var while with yield
+""".split())
+
+
+def split_identifiers(text: str) -> List[str]:
+    """Lower-cased code tokens: each identifier plus its snake_case and camelCase parts.
+
+    ``parseHTTPResponse_v2`` yields ``parsehttpresponse_v2``, ``parse``,
+    ``http``, ``response`` and ``v2``.
+    """
+    tokens = []
+    for identifier in _IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        parts = [part.lower() for piece in identifier.split("_") for part in _CAMEL_PARTS.findall(piece)]
+        if len(parts) > 1 or (parts and parts[0] != lowered):
+            tokens.append(lowered)
+        tokens.extend(parts)
+    return [token for token in tokens if len(token) > 1 and token not in STOP_WORDS]
+
+
+@lru_cache(maxsize=65536)
+def _feature(token: str, dim: int) -> Tuple[int, float]:
+    """Bucket and sign of ``token``; the sign keeps hash collisions from piling up."""
+    digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+class HashingEmbedder:
+    """Offline embedding of code by feature hashing of identifier tokens.
+
+    Each text becomes a ``dim``-dimensional vector of sublinear token counts
+    hashed into signed buckets, L2-normalised so a dot product is the cosine
+    similarity. Deterministic and dependency-free beyond NumPy, so an index
+    built on one machine can be queried on another.
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.embedding_dim
+        self.name = f"hashing-{self.dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for token in split_identifiers(text):
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                bucket, sign = _feature(token, self.dim)
+                vectors[row, bucket] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model, used when it is installed and configured."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=64, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def load_embedder(model_name: Optional[str] = None):
+    """Return the configured embedder.
+
+    ``settings.embedding_model`` names a local sentence-transformers model;
+    "hashing" (the default), or a model that cannot be loaded offline, falls
+    back to the HashingEmbedder.
+    """
+    model_name = model_name or settings.embedding_model
+    if model_name and model_name != "hashing":
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception:
+            pass
+    return HashingEmbedder()
@@ -0,0 +1,194 @@
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, asdict
+import threading
+import time
+
+from app_logging.schemas.models import RetrievedDocument
+from config.settings import settings
+
+
+# Candidate stage that produced each document type, for documents not tagged by a stage
+# (e.g. recorded before retrieval ran in stages)
+STAGE_FOR_TYPE = {
+    "file_content": "structural",
+    "repository_documentation": "structural",
+    "dependencies": "structural",
+    "file_structure": "structural",
+    "related_files": "structural",
+    "commit_history": "commit_history",
+    "semantic_match": "dense",
+    "keyword_match": "lexical",
+    "symbol_graph": "graph",
+}
+
+
+_stage_state = threading.local()
+
+
+def stage_of(doc: RetrievedDocument) -> str:
+    metadata = doc.metadata or {}
+    return metadata.get("retriever") or STAGE_FOR_TYPE.get(metadata.get("type"), "criteria")
+
+
+@dataclass
+class StageReport:
+    """Timing and yield of one candidate stage, logged in the retrieval step."""
+    stage: str
+    limit: int
+    budget_ms: Optional[int]
+    candidates: int = 0
+    returned: int = 0
+    milliseconds: float = 0.0
+    timed_out: bool = False
+    error: Optional[str] = None
+
+
+def run_candidate_stages(stages: Dict[str, Callable[[], List[RetrievedDocument]]]
+                         ) -> Tuple[List[RetrievedDocument], List[Dict[str, Any]]]:
+    """Run candidate generators concurrently, each within its own limit and latency budget.
+
+    Each stage's candidates are ranked by their own relevance and cut to the
+    stage's limit. A stage still running when its budget runs out contributes
+    nothing to this retrieval and is cancelled: long-running work such as
+    index refreshes checks ``stage_cancel_event`` and stops early, keeping
+    what it has done for the next retrieval. Stages run on daemon threads so
+    an overrunning one never holds up process exit. Required stages (``retrieval_required_stages``,
+    the changed files themselves) are waited for regardless; one that
+    overruns is reported as timed out but keeps its documents. Returned
+    documents are tagged with their stage.
+    """
+    if not stages:
+        return [], []
+
+    start = time.perf_counter()
+    cancel_events = {name: threading.Event() for name in stages}
+    futures = {name: _start_stage(name, generate, cancel_events[name]) for name, generate in stages.items()}
+
+    documents, reports = [], []
+    for name, future in futures.items():
+        report = StageReport(name, settings.retrieval_stage_limits.get(name, settings.max_retrieval_docs),
+                             settings.retrieval_stage_budgets_ms.get(name))
+        # Budgets count from when all stages started, since they run side by side
+        remaining = None
+        if report.budget_ms is not None and name not in settings.retrieval_required_stages:
+            remaining = max(0.0, report.budget_ms / 1000 - (time.perf_counter() - start))
+        done, _ = wait([future], timeout=remaining)
+        if report.budget_ms is not None and time.perf_counter() - start > report.budget_ms / 1000:
+            report.timed_out = True
+        if not done:
+            cancel_events[name].set()
+            report.milliseconds = round((time.perf_counter() - start) * 1000, 2)
+        else:
+            try:
+                stage_documents, seconds = future.result()
+                report.milliseconds = round(seconds * 1000, 2)
+                report.candidates = len(stage_documents)
+                stage_documents = sorted(stage_documents, key=lambda d: d.relevance_score or 0, reverse=True)
+                # Copied so documents shared with other callers are never mutated
+                documents.extend(doc.model_copy(update={"metadata": {**(doc.metadata or {}), "retriever": name}})
+                                 for doc in stage_documents[:report.limit])
+                report.returned = min(report.candidates, report.limit)
+            except Exception as e:
+                report.error = str(e)
+        reports.append(asdict(report))
+
+    return documents, reports
+
+
+def stage_cancel_event() -> Optional[threading.Event]:
+    """The cancel event of the candidate stage running on this thread, or None outside a stage."""
+    return getattr(_stage_state, "cancel", None)
+
+
+def _start_stage(name: str, generate: Callable[[], List[RetrievedDocument]],
+                 cancel: threading.Event) -> Future:
+    future: Future = Future()
+
+    def run():
+        _stage_state.cancel = cancel
+        try:
+            future.set_result(_timed(generate))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"retrieval-{name}", daemon=True).start()
+    return future
+
+
+def _timed(generate: Callable[[], List[RetrievedDocument]]) -> Tuple[List[RetrievedDocument], float]:
+    start = time.perf_counter()
+    return generate(), time.perf_counter() - start
+
+
+def rank_by_stage(documents: List[RetrievedDocument]) -> Dict[str, List[RetrievedDocument]]:
+    """Each stage's candidates best first, by relevance and then by keyword score against the diff."""
+    rankings: Dict[str, List[RetrievedDocument]] = {}
+    for doc in documents:
+        rankings.setdefault(stage_of(doc), []).append(doc)
+    for docs in rankings.values():
+        docs.sort(key=lambda d: (d.relevance_score or 0, (d.metadata or {}).get("keyword_score", 0)), reverse=True)
+    return rankings
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[RetrievedDocument]],
+                           k: Optional[int] = None) -> List[Tuple[RetrievedDocument, float, List[str]]]:
+    """Fuse per-stage rankings: a document scores sum(weight / (k + rank)) over the stages that found it.
+
+    Documents are identified by source, so a chunk found by both the lexical
+    and the dense stage is counted once with both contributions. Returns
+    (document, fused score, stages) best first.
+    """
+    k = settings.retrieval_rrf_k if k is None else k
+    fused: Dict[str, List[Any]] = {}
+    for stage, docs in rankings.items():
+        weight = settings.retrieval_stage_weights.get(stage, 1.0)
+        for rank, doc in enumerate(docs, start=1):
+            entry = fused.setdefault(doc.source, [doc, 0.0, []])
+            entry[1] += weight / (k + rank)
+            entry[2].append(stage)
+    # Ties keep the higher static relevance first
+    return sorted((tuple(entry) for entry in fused.values()),
+                  key=lambda entry: (-entry[1], -(entry[0].relevance_score or 0)))
+
+
+class EmbeddingReranker:
+    """Lightweight local reranker: similarity of each candidate to the diff under the hashing embedder.
+
+    Candidates are scored in batches until the latency budget runs out; any
+    left unscored keep their fused order.
+    """
+
+    name = "embedding"
+
+    def __init__(self, embedder: Any = None):
+        self._embedder = embedder
+
+    @property
+    def embedder(self) -> Any:
+        if self._embedder is None:
+            from .embeddings import HashingEmbedder
+            self._embedder = HashingEmbedder()
+        return self._embedder
+
+    def score(self, queries: List[str], documents: List[RetrievedDocument],
+              budget_ms: Optional[int] = None, batch_size: int = 16) -> List[Optional[float]]:
+        if not queries or not documents:
+            return [None] * len(documents)
+        start = time.perf_counter()
+        query = self.embedder.embed(["\n".join(queries)])[0]
+        scores: List[Optional[float]] = []
+        for i in range(0, len(documents), batch_size):
+            if budget_ms is not None and (time.perf_counter() - start) * 1000 > budget_ms:
+                break
+            vectors = self.embedder.embed([doc.content for doc in documents[i:i + batch_size]])
+            scores.extend(float(score) for score in vectors @ query)
+        return scores + [None] * (len(documents) - len(scores))
+
+
+def load_reranker(name: Optional[str] = None) -> Optional[EmbeddingReranker]:
+    """The configured reranker, or None when ``retrieval_reranker`` is "none"."""
+    name = name or settings.retrieval_reranker
+    if name == EmbeddingReranker.name:
+        return EmbeddingReranker()
+    return None
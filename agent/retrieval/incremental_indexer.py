@@ -0,0 +1,269 @@
+from typing import List, Dict, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import re
+import sqlite3
+import threading
+import time
+
+from ..providers.github_client import GitHubProvider, git_blob_sha
+from .hybrid import stage_cancel_event
+from config.settings import settings
+
+
+_COMMIT_SHA = re.compile(r"^[0-9a-f]{40}$")
+
+
+class IncrementalIndex(ABC):
+    """Base class for per-repository indexes kept up to date by the IncrementalIndexer.
+
+    Subclasses name themselves, choose which paths they index, and apply a
+    batch of changed and deleted files. They never see unchanged files.
+    """
+
+    name = "index"
+
+    def accepts(self, file_path: str) -> bool:
+        return True
+
+    @abstractmethod
+    def has_state(self, repo: str) -> bool:
+        """Whether this index already holds ``repo``; without state the repo is re-indexed from scratch."""
+
+    @abstractmethod
+    def apply_changes(self, repo: str, ref: str, changed: Dict[str, str], deleted: List[str]):
+        """Replace the entries of ``changed`` files (path to content) and drop ``deleted`` ones."""
+
+
+@dataclass
+class IndexRefresh:
+    """What one refresh re-processed."""
+    repo: str
+    index: str
+    ref: str
+    previous_ref: Optional[str]
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    failed: List[str] = field(default_factory=list)
+    skipped: int = 0  # Files past ``index_max_files``, left out of the index
+    seconds: float = 0.0
+
+    @property
+    def changed(self) -> int:
+        return len(self.added) + len(self.modified) + len(self.deleted)
+
+
+class IncrementalIndexer:
+    """Keeps per-repository indexes in step with a moving base commit.
+
+    A SQLite manifest records, per (repo, index, path), the blob SHA last
+    indexed and, per (repo, index), the ref it was indexed at. Refreshing to a
+    new ref lists the tree with its blob SHAs (one request), compares it with
+    the manifest and fetches and re-indexes only added and modified files;
+    deleted files are dropped. Refreshing to the ref already indexed is free
+    when the ref is a commit SHA.
+
+    Indexes sharing one indexer share its fetches: file contents are cached by
+    blob SHA (bounded by ``index_blob_cache_bytes``) and a blob another index
+    is already fetching is waited for rather than requested again.
+    """
+
+    def __init__(self, github_client: GitHubProvider, manifest_path: Optional[str] = None):
+        self.github_client = github_client
+        manifest_path = manifest_path or settings.index_manifest_path
+        Path(manifest_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._refresh_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._blob_lock = threading.Lock()
+        self._blobs: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._blob_bytes = 0
+        self._pending_blobs: Dict[Tuple[str, str], Future] = {}
+        self._conn = sqlite3.connect(manifest_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS indexed_refs (
+                repo TEXT NOT NULL,
+                index_name TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                indexed_at REAL NOT NULL,
+                PRIMARY KEY (repo, index_name)
+            );
+            CREATE TABLE IF NOT EXISTS indexed_files (
+                repo TEXT NOT NULL,
+                index_name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                blob_sha TEXT NOT NULL,
+                PRIMARY KEY (repo, index_name, path)
+            );
+            """
+        )
+
+    def indexed_ref(self, repo: str, index_name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT ref FROM indexed_refs WHERE repo = ? AND index_name = ?",
+                                     (repo, index_name)).fetchone()
+        return row["ref"] if row else None
+
+    def indexed_files(self, repo: str, index_name: str) -> Dict[str, str]:
+        """Path to blob SHA of every file the index holds for ``repo``."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, blob_sha FROM indexed_files WHERE repo = ? AND index_name = ?",
+                                      (repo, index_name)).fetchall()
+        return {row["path"]: row["blob_sha"] for row in rows}
+
+    def forget(self, repo: str, index_name: str):
+        """Drop the manifest for an index so the next refresh rebuilds it."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM indexed_refs WHERE repo = ? AND index_name = ?", (repo, index_name))
+            self._conn.execute("DELETE FROM indexed_files WHERE repo = ? AND index_name = ?", (repo, index_name))
+
+    def refresh(self, repo: str, ref: str, index: IncrementalIndex) -> IndexRefresh:
+        """Bring ``index`` for ``repo`` to ``ref``, re-processing only files whose blob changed."""
+        with self._lock:
+            refresh_lock = self._refresh_locks.setdefault((repo, index.name), threading.Lock())
+
+        with refresh_lock:
+            start = time.perf_counter()
+            if not index.has_state(repo):
+                self.forget(repo, index.name)
+            previous_ref = self.indexed_ref(repo, index.name)
+            refresh = IndexRefresh(repo, index.name, ref, previous_ref)
+            if previous_ref == ref and _COMMIT_SHA.match(ref):
+                refresh.unchanged = len(self.indexed_files(repo, index.name))
+                return refresh
+
+            indexed = self.indexed_files(repo, index.name)
+            tree = {path: sha for path, sha in self.github_client.get_repo_tree(repo, ref).items()
+                    if index.accepts(path)}
+            if len(tree) > settings.index_max_files:
+                # Shallowest paths first, so the indexed subset is stable between refreshes
+                kept = sorted(tree, key=lambda path: (path.count("/"), path))[:settings.index_max_files]
+                refresh.skipped = len(tree) - len(kept)
+                tree = {path: tree[path] for path in kept}
+            contents = self._hash_unknown_blobs(repo, ref, tree, indexed, refresh)
+
+            for path, blob_sha in sorted(tree.items()):
+                if path not in indexed:
+                    refresh.added.append(path)
+                elif indexed[path] != blob_sha:
+                    refresh.modified.append(path)
+                else:
+                    refresh.unchanged += 1
+            refresh.deleted = sorted(set(indexed) - set(tree))
+
+            to_fetch = [path for path in refresh.added + refresh.modified if path not in contents]
+            contents.update(self._fetch_contents(repo, ref, to_fetch, refresh, tree))
+            changed = {path: contents[path] for path in refresh.added + refresh.modified if path in contents}
+
+            if changed or refresh.deleted or not indexed:
+                index.apply_changes(repo, ref, changed, refresh.deleted)
+            # After a failed fetch the ref is left unrecorded so the next refresh retries it
+            self._record(repo, index.name, "" if refresh.failed else ref,
+                         {path: tree[path] for path in changed}, refresh.deleted)
+
+            refresh.seconds = round(time.perf_counter() - start, 4)
+            return refresh
+
+    def _hash_unknown_blobs(self, repo: str, ref: str, tree: Dict[str, Optional[str]],
+                            indexed: Dict[str, str], refresh: IndexRefresh) -> Dict[str, str]:
+        """Fill in blob SHAs the provider did not report by hashing the content; returns that content.
+
+        A file that cannot be fetched keeps its indexed entry until a later refresh.
+        """
+        unknown = [path for path, sha in tree.items() if sha is None]
+        contents = self._fetch_contents(repo, ref, unknown, refresh, tree)
+        for path in unknown:
+            if path in contents:
+                tree[path] = git_blob_sha(contents[path])
+            elif path in indexed:
+                tree[path] = indexed[path]
+            else:
+                del tree[path]
+        return contents
+
+    def _fetch_contents(self, repo: str, ref: str, paths: List[str], refresh: IndexRefresh,
+                        blob_shas: Dict[str, Optional[str]]) -> Dict[str, str]:
+        """Fetch file contents concurrently; failed fetches are reported and retried on the next refresh.
+
+        When the retrieval stage running the refresh is cancelled, the files not
+        yet fetched are reported as failed, so the next refresh picks them up.
+        """
+        if not paths:
+            return {}
+        cancel = stage_cancel_event()
+
+        def get_content(path: str) -> Optional[str]:
+            if cancel is not None and cancel.is_set():
+                return None
+            try:
+                return self.github_client.get_file_content(repo, path, ref)
+            except Exception:
+                return None
+
+        def fetch(path: str) -> Optional[str]:
+            # Without a blob SHA the content cannot be told apart from other versions, so it is not shared
+            if not blob_shas.get(path):
+                return get_content(path)
+            key = (repo, blob_shas[path])
+            with self._blob_lock:
+                if key in self._blobs:
+                    self._blobs.move_to_end(key)
+                    return self._blobs[key]
+                pending = self._pending_blobs.get(key)
+                if pending is None:
+                    self._pending_blobs[key] = future = Future()
+            if pending is not None:
+                return pending.result()
+
+            content = get_content(path)
+            with self._blob_lock:
+                del self._pending_blobs[key]
+                if content is not None:
+                    self._cache_blob(key, content)
+            future.set_result(content)
+            return content
+
+        max_workers = max(1, min(settings.retrieval_max_concurrency, len(paths)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch, paths))
+
+        contents = {}
+        for path, content in zip(paths, results):
+            if content is None:
+                refresh.failed.append(path)
+            else:
+                contents[path] = content
+        return contents
+
+    def _cache_blob(self, key: Tuple[str, str], content: str):
+        """Keep ``content`` for the other indexes, evicting the least recently used blobs over budget."""
+        size = len(content.encode("utf-8", errors="replace"))
+        if size > settings.index_blob_cache_bytes:
+            return
+        self._blobs[key] = content
+        self._blob_bytes += size
+        while self._blob_bytes > settings.index_blob_cache_bytes:
+            _, evicted = self._blobs.popitem(last=False)
+            self._blob_bytes -= len(evicted.encode("utf-8", errors="replace"))
+
+    def _record(self, repo: str, index_name: str, ref: str, indexed: Dict[str, str], deleted: List[str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM indexed_files WHERE repo = ? AND index_name = ? AND path = ?",
+                [(repo, index_name, path) for path in deleted]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO indexed_files (repo, index_name, path, blob_sha) VALUES (?, ?, ?, ?)",
+                [(repo, index_name, path, blob_sha) for path, blob_sha in indexed.items()]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexed_refs (repo, index_name, ref, indexed_at) VALUES (?, ?, ?, ?)",
+                (repo, index_name, ref, time.time())
+            )
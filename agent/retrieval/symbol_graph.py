@@ -0,0 +1,477 @@
+from typing import List, Dict, Any, Optional, Set, Tuple
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+import ast
+import json
+import re
+import sqlite3
+import threading
+
+from ..providers.github_client import GitHubProvider, PRInfo
+from .incremental_indexer import IncrementalIndex, IncrementalIndexer, IndexRefresh
+from config.settings import settings
+
+
+PYTHON_EXTENSIONS = {".py"}
+SCRIPT_EXTENSIONS = {".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx"}
+
+_IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*")
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+# TS/JS declarations: functions, classes, functions bound to a name, and class methods
+_SCRIPT_DEFINITIONS = [
+    ("function", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)")),
+    ("class", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)")),
+    ("function", re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*"
+                            r"(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)")),
+    ("method", re.compile(r"^\s+(?:(?:public|private|protected|static|async|get|set|readonly)\s+)*"
+                          r"([A-Za-z_$][\w$]*)\s*(?:<[^>]*>)?\([^)]*\)\s*(?::[^{]+)?\{")),
+]
+_SCRIPT_IMPORTS = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*|\brequire\s*\(\s*)['"]([^'"]+)['"]""")
+_SCRIPT_KEYWORDS = {
+    "if", "for", "while", "switch", "catch", "function", "return", "constructor", "else", "do", "try",
+    "const", "let", "var", "new", "this", "import", "export", "from", "class", "extends", "async", "await",
+    "typeof", "instanceof", "true", "false", "null", "undefined", "default",
+}
+
+
+def parse_python(content: str) -> Dict[str, Any]:
+    """Definitions, references (with the definition they occur in) and imports of a Python module."""
+    tree = ast.parse(content)
+    lines = content.splitlines()
+    definitions, references, imports = [], {}, []
+
+    def visit(node: ast.AST, scope: Optional[str]):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = f"{scope}.{child.name}" if scope else child.name
+                kind = "class" if isinstance(child, ast.ClassDef) else ("method" if scope else "function")
+                start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                definitions.append(_definition(child.name, qualname, kind, start, child.end_lineno, lines))
+                visit(child, qualname)
+                continue
+            if isinstance(child, ast.Import):
+                imports.extend(alias.name for alias in child.names)
+            elif isinstance(child, ast.ImportFrom):
+                module = "." * child.level + (child.module or "")
+                imports.append(module)
+                # ``from package import module`` imports a module, not a symbol
+                imports.extend(f"{module}.{alias.name}" if child.module else f"{module}{alias.name}"
+                               for alias in child.names)
+            elif isinstance(child, ast.Name):
+                references.setdefault((child.id, scope), child.lineno)
+            elif isinstance(child, ast.Attribute):
+                references.setdefault((child.attr, scope), child.lineno)
+            visit(child, scope)
+
+    visit(tree, None)
+    return _record(definitions, references, imports)
+
+
+def parse_script(content: str) -> Dict[str, Any]:
+    """Definitions, references and relative imports of a TS/JS module, found line by line.
+
+    Not a full parser: declarations are matched by pattern and their extent
+    by brace balance, which covers the common declaration forms.
+    """
+    lines = content.splitlines()
+    definitions, references, imports = [], {}, []
+    for number, line in enumerate(lines, start=1):
+        imports.extend(_SCRIPT_IMPORTS.findall(line))
+        for kind, pattern in _SCRIPT_DEFINITIONS:
+            match = pattern.match(line)
+            if match and match.group(1) not in _SCRIPT_KEYWORDS:
+                definitions.append([match.group(1), match.group(1), kind, number, _block_end(lines, number)])
+                break
+
+    # Methods are qualified by the class whose extent contains them
+    classes = [d for d in definitions if d[2] == "class"]
+    for definition in definitions:
+        if definition[2] == "method":
+            owner = _innermost(classes, definition[3], exclude=definition)
+            if owner is None:
+                definition[2] = "function"
+            else:
+                definition[1] = f"{owner[1]}.{definition[0]}"
+    definitions = [_definition(name, qualname, kind, start, end, lines)
+                   for name, qualname, kind, start, end in definitions]
+
+    for number, line in enumerate(lines, start=1):
+        code = line.split("//", 1)[0]
+        if not code.strip() or code.lstrip().startswith(("*", "/*", "import ")):
+            continue
+        owner = _innermost(definitions, number)
+        scope = owner["qualname"] if owner else None
+        for identifier in _IDENTIFIER.findall(_strip_strings(code)):
+            if identifier in _SCRIPT_KEYWORDS or (owner and number == owner["start"] and identifier == owner["name"]):
+                continue
+            references.setdefault((identifier, scope), number)
+    return _record(definitions, references, imports)
+
+
+def _definition(name: str, qualname: str, kind: str, start: int, end: int, lines: List[str]) -> Dict[str, Any]:
+    return {"name": name, "qualname": qualname, "kind": kind, "start": start, "end": end,
+            "text": "\n".join(lines[start - 1:min(end, start - 1 + settings.symbol_snippet_lines)])}
+
+
+def _record(definitions: List[Dict[str, Any]], references: Dict[Tuple[str, Optional[str]], int],
+            imports: List[str]) -> Dict[str, Any]:
+    # Dunders and short names connect unrelated code, so they are not graph edges
+    return {
+        "definitions": definitions,
+        "references": [[name, scope, line] for (name, scope), line in references.items()
+                       if len(name) > 2 and not name.startswith("__")],
+        "imports": list(dict.fromkeys(imports)),
+    }
+
+
+def _block_end(lines: List[str], start: int) -> int:
+    """Last line of the brace-delimited block opening on or after ``start``."""
+    depth, opened = 0, False
+    for number in range(start, len(lines) + 1):
+        code = _strip_strings(lines[number - 1].split("//", 1)[0])
+        depth += code.count("{") - code.count("}")
+        opened = opened or "{" in code
+        if opened and depth <= 0:
+            return number
+        if not opened and number > start and code.rstrip().endswith(";"):
+            return number
+    return len(lines)
+
+
+def _strip_strings(code: str) -> str:
+    return re.sub(r"""(["'`])(?:\\.|(?!\1).)*\1""", '""', code)
+
+
+def _innermost(definitions: List[Any], line: int, exclude: Any = None) -> Any:
+    """The definition with the smallest extent containing ``line``."""
+    best = None
+    for definition in definitions:
+        start, end = (definition["start"], definition["end"]) if isinstance(definition, dict) else definition[3:5]
+        if definition is not exclude and start <= line <= end:
+            if best is None or end - start < best[1] - best[0]:
+                best = (start, end, definition)
+    return best[2] if best else None
+
+
+def changed_old_lines(diff_content: str) -> Set[int]:
+    """Base-side lines a diff removes or inserts next to."""
+    lines: Set[int] = set()
+    old_line = None
+    for line in (diff_content or "").splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            old_line = int(header.group(1))
+        elif old_line is None or line.startswith(("+++", "---", "\\")):
+            continue
+        elif line.startswith("-"):
+            lines.add(old_line)
+            old_line += 1
+        elif line.startswith("+"):
+            lines.add(max(1, old_line - 1))
+            lines.add(old_line)
+        else:
+            old_line += 1
+    return lines
+
+
+def changed_identifiers(diff_content: str) -> Set[str]:
+    """Identifiers on the added and removed lines of a diff, case preserved."""
+    identifiers = set()
+    for line in (diff_content or "").splitlines():
+        if line[:1] in ("+", "-") and not line.startswith(("+++", "---")):
+            identifiers.update(_IDENTIFIER.findall(line[1:]))
+    return identifiers
+
+
+@dataclass
+class RelatedSymbol:
+    """A definition reached from the changed code, with how it was reached."""
+    file_path: str
+    qualname: str
+    relation: str  # "caller" or "callee" of the changed code (for the first hop)
+    via: str  # The changed symbol the path starts from
+    distance: int
+    imported: bool  # Whether every hop is backed by an import (or stays within one file)
+    definition: Dict[str, Any]
+
+
+class SymbolGraph:
+    """Definitions, references and imports of one repository, inverted for constant-time lookups.
+
+    Nodes are definitions, keyed by (path, qualified name). ``callers`` maps a
+    bare name to the definitions that reference it and ``callees`` maps a
+    definition to the names it references, so one hop in either direction is
+    a dict lookup. Import specifiers are resolved against the module table
+    when a hop is scored.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.definitions: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self.nodes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.callers: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self.callees: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self.modules: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def copy(self) -> "SymbolGraph":
+        """An independent copy; file records and definitions are shared, as they are never mutated."""
+        graph = SymbolGraph()
+        graph.files = dict(self.files)
+        graph.nodes = dict(self.nodes)
+        for name in ("definitions", "callers", "callees", "modules"):
+            getattr(graph, name).update((key, set(values)) for key, values in getattr(self, name).items())
+        return graph
+
+    def add_file(self, path: str, record: Dict[str, Any]):
+        self.remove_file(path)
+        self.files[path] = record
+        for definition in record["definitions"]:
+            node = (path, definition["qualname"])
+            self.nodes[node] = definition
+            self.definitions[definition["name"]].add(node)
+        for name, scope, _ in record["references"]:
+            if scope is not None:
+                self.callers[name].add((path, scope))
+                self.callees[(path, scope)].add(name)
+        for module in _module_names(path):
+            self.modules[module].add(path)
+
+    def remove_file(self, path: str):
+        record = self.files.pop(path, None)
+        if record is None:
+            return
+        for definition in record["definitions"]:
+            node = (path, definition["qualname"])
+            self.nodes.pop(node, None)
+            self.callees.pop(node, None)
+            _discard(self.definitions, definition["name"], node)
+        for name, scope, _ in record["references"]:
+            if scope is not None:
+                _discard(self.callers, name, (path, scope))
+        for module in _module_names(path):
+            _discard(self.modules, module, path)
+
+    def imports_of(self, path: str) -> Set[str]:
+        """Repository paths that ``path`` imports."""
+        record = self.files.get(path)
+        if record is None:
+            return set()
+        resolved = set()
+        for specifier in record["imports"]:
+            resolved.update(self._resolve(path, specifier))
+        return resolved
+
+    def _resolve(self, path: str, specifier: str) -> Set[str]:
+        if PurePosixPath(path).suffix in SCRIPT_EXTENSIONS:
+            if not specifier.startswith("."):
+                return set()
+            target = _normalize(str(PurePosixPath(path).parent / specifier))
+            return {candidate for candidate in [target] + [target + ext for ext in sorted(SCRIPT_EXTENSIONS)]
+                    + [f"{target}/index{ext}" for ext in sorted(SCRIPT_EXTENSIONS)] if candidate in self.files}
+        if specifier.startswith("."):
+            level = len(specifier) - len(specifier.lstrip("."))
+            package = list(PurePosixPath(path).parent.parts)
+            package = package[:len(package) - (level - 1)] if level > 1 else package
+            specifier = ".".join(package + [specifier.lstrip(".")]).strip(".")
+        return set(self.modules.get(specifier, ()))
+
+    def related(self, seeds: List[Tuple[str, str]], referenced: Dict[str, str],
+                max_depth: Optional[int] = None) -> List[RelatedSymbol]:
+        """Definitions within ``max_depth`` hops of the changed code, nearest first.
+
+        ``seeds`` are the changed definitions; ``referenced`` maps names the
+        diff mentions to the changed file mentioning them, which makes their
+        definitions callees at distance one. Names defined in more than
+        ``symbol_max_fanout`` places are too generic to follow.
+        """
+        max_depth = max_depth or settings.symbol_graph_max_depth
+        imports: Dict[str, Set[str]] = {}
+
+        def linked(from_path: str, to_path: str) -> bool:
+            if from_path == to_path:
+                return True
+            if from_path not in imports:
+                imports[from_path] = self.imports_of(from_path)
+            return to_path in imports[from_path]
+
+        found: Dict[Tuple[str, str], RelatedSymbol] = {}
+        queue = deque()
+        seen = set(seeds)
+        for seed in seeds:
+            queue.append((seed, 0, None, self.nodes[seed]["qualname"], True))
+        for name, path in sorted(referenced.items()):
+            targets = self.definitions.get(name, ())
+            if len(targets) > settings.symbol_max_fanout:
+                continue
+            for target in sorted(targets):
+                if target not in seen:
+                    seen.add(target)
+                    found[target] = RelatedSymbol(target[0], target[1], "callee", name, 1,
+                                                  linked(path, target[0]), self.nodes[target])
+                    queue.append((target, 1, "callee", name, found[target].imported))
+
+        while queue:
+            node, distance, relation, via, imported = queue.popleft()
+            if distance >= max_depth:
+                continue
+            for neighbor, hop_relation, hop_linked in self._neighbors(node, linked):
+                if neighbor in seen:
+                    continue
+                seen.add(neighbor)
+                symbol = RelatedSymbol(neighbor[0], neighbor[1], relation or hop_relation, via, distance + 1,
+                                       imported and hop_linked, self.nodes[neighbor])
+                found[neighbor] = symbol
+                queue.append((neighbor, distance + 1, symbol.relation, via, symbol.imported))
+
+        return sorted(found.values(), key=lambda s: (s.distance, not s.imported,
+                                                      s.relation != "caller", s.file_path, s.qualname))
+
+    def _neighbors(self, node: Tuple[str, str], linked) -> List[Tuple[Tuple[str, str], str, bool]]:
+        neighbors = []
+        callers = self.callers.get(self.nodes[node]["name"], ())
+        if len(callers) <= settings.symbol_max_fanout:
+            for caller in sorted(callers):
+                if caller in self.nodes and caller != node:
+                    neighbors.append((caller, "caller", linked(caller[0], node[0])))
+        for name in sorted(self.callees.get(node, ())):
+            targets = self.definitions.get(name, ())
+            if len(targets) > settings.symbol_max_fanout:
+                continue
+            for target in sorted(targets):
+                if target != node:
+                    neighbors.append((target, "callee", linked(node[0], target[0])))
+        return neighbors
+
+
+def _discard(mapping: Dict[str, Set[Any]], key: Any, value: Any):
+    values = mapping.get(key)
+    if values is not None:
+        values.discard(value)
+        if not values:
+            del mapping[key]
+
+
+def _module_names(path: str) -> List[str]:
+    """Dotted module names a Python file can be imported as, allowing for source roots like ``src/``."""
+    pure = PurePosixPath(path)
+    if pure.suffix not in PYTHON_EXTENSIONS:
+        return []
+    parts = list(pure.with_suffix("").parts)
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts))]
+
+
+def _normalize(path: str) -> str:
+    parts: List[str] = []
+    for part in PurePosixPath(path).parts:
+        if part == "..":
+            if parts:
+                parts.pop()
+        elif part != ".":
+            parts.append(part)
+    return "/".join(parts)
+
+
+class SymbolIndexStore(IncrementalIndex):
+    """One SymbolGraph per repository, persisted per file and refreshed incrementally.
+
+    Each file's parsed record is a row in SQLite, so a refresh rewrites only
+    the rows of changed files; the inverted graph is rebuilt in memory once
+    per process when a repository is first used.
+    """
+
+    name = "symbols"
+
+    def __init__(self, github_client: GitHubProvider, index_path: Optional[str] = None,
+                 indexer: Optional[IncrementalIndexer] = None):
+        self.github_client = github_client
+        self.indexer = indexer or IncrementalIndexer(github_client)
+        self.last_refresh: Optional[IndexRefresh] = None
+        self._graphs: Dict[str, SymbolGraph] = {}
+
+        index_path = index_path or settings.symbol_index_path
+        Path(index_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS symbol_files (
+                repo TEXT NOT NULL,
+                path TEXT NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (repo, path)
+            );
+            """
+        )
+
+    def get_graph(self, repo: str, ref: str) -> SymbolGraph:
+        """The graph for ``repo``, first brought up to date with ``ref``."""
+        self.last_refresh = self.indexer.refresh(repo, ref, self)
+        return self._graphs[repo]
+
+    def accepts(self, file_path: str) -> bool:
+        return PurePosixPath(file_path).suffix in PYTHON_EXTENSIONS | SCRIPT_EXTENSIONS
+
+    def has_state(self, repo: str) -> bool:
+        if repo not in self._graphs:
+            with self._lock:
+                rows = self._conn.execute("SELECT path, record FROM symbol_files WHERE repo = ?", (repo,)).fetchall()
+            if not rows:
+                return False
+            graph = SymbolGraph()
+            for row in rows:
+                graph.add_file(row["path"], json.loads(row["record"]))
+            self._graphs[repo] = graph
+        return True
+
+    def apply_changes(self, repo: str, ref: str, changed: Dict[str, str], deleted: List[str]):
+        # Readers may be walking the current graph, so the update goes into a copy that is swapped in
+        current = self._graphs.get(repo)
+        graph = current.copy() if current is not None else SymbolGraph()
+        records = {}
+        for path, content in changed.items():
+            if content.startswith("# Mock content") or len(content) > settings.vector_index_max_file_bytes:
+                continue
+            try:
+                records[path] = parse_python(content) if path.endswith(".py") else parse_script(content)
+            except (SyntaxError, ValueError):
+                # Unparseable files drop out of the graph until they parse again
+                records[path] = _record([], {}, [])
+        removed = set(deleted) | (set(changed) - set(records))
+
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM symbol_files WHERE repo = ? AND path = ?",
+                                   [(repo, path) for path in removed])
+            self._conn.executemany("INSERT OR REPLACE INTO symbol_files (repo, path, record) VALUES (?, ?, ?)",
+                                   [(repo, path, json.dumps(record)) for path, record in records.items()])
+        for path in removed:
+            graph.remove_file(path)
+        for path, record in records.items():
+            graph.add_file(path, record)
+        self._graphs[repo] = graph
+
+    def related_to(self, repo: str, pr_info: PRInfo, ref: str) -> List[RelatedSymbol]:
+        """Callers and callees of the code a PR changes, nearest first; the changed files are left out."""
+        graph = self.get_graph(repo, ref)
+        changed_paths = {file_diff.file_path for file_diff in pr_info.files_changed}
+
+        seeds, referenced = [], {}
+        for file_diff in pr_info.files_changed:
+            lines = changed_old_lines(file_diff.diff_content)
+            record = graph.files.get(file_diff.file_path)
+            if record and file_diff.status != "added":
+                for definition in record["definitions"]:
+                    if any(definition["start"] <= line <= definition["end"] for line in lines):
+                        seeds.append((file_diff.file_path, definition["qualname"]))
+            for name in changed_identifiers(file_diff.diff_content):
+                referenced.setdefault(name, file_diff.file_path)
+
+        return [symbol for symbol in graph.related(seeds, referenced)
+                if symbol.file_path not in changed_paths]
@@ -0,0 +1,265 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import json
+import os
+import re
+
+import numpy as np
+
+from ..providers.github_client import GitHubProvider, PRInfo
+from .embeddings import load_embedder
+from .incremental_indexer import IncrementalIndex, IncrementalIndexer, IndexRefresh
+from config.settings import settings
+
+
+# Source files worth embedding; everything else (images, lock files, data) is skipped
+INDEXED_EXTENSIONS = frozenset({
+    ".py", ".pyi", ".js", ".jsx", ".ts", ".tsx", ".go", ".rs", ".java", ".kt", ".rb", ".php",
+    ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".swift", ".scala", ".sh", ".sql", ".md", ".rst"
+})
+SKIPPED_DIRECTORIES = frozenset({"node_modules", "vendor", "dist", "build", ".git", "__pycache__", "third_party"})
+
+_HUNK_HEADER = re.compile(r"^@@ .* @@(.*)$")
+
+
+@dataclass
+class Chunk:
+    """A window of lines from one file."""
+    file_path: str
+    start_line: int
+    end_line: int
+    text: str
+
+
+@dataclass
+class SearchHit:
+    chunk: Chunk
+    score: float
+
+
+def is_indexable(file_path: str) -> bool:
+    path = Path(file_path)
+    if any(part in SKIPPED_DIRECTORIES for part in path.parts[:-1]):
+        return False
+    return path.suffix.lower() in INDEXED_EXTENSIONS
+
+
+def chunk_file(file_path: str, content: str, chunk_lines: Optional[int] = None,
+               overlap_lines: Optional[int] = None) -> List[Chunk]:
+    """Split a file into overlapping windows of ``chunk_lines`` lines."""
+    chunk_lines = chunk_lines or settings.vector_chunk_lines
+    overlap_lines = settings.vector_chunk_overlap_lines if overlap_lines is None else overlap_lines
+    lines = content.splitlines()
+    step = max(1, chunk_lines - overlap_lines)
+
+    chunks = []
+    for start in range(0, max(len(lines), 1), step):
+        window = lines[start:start + chunk_lines]
+        if not "".join(window).strip():
+            continue
+        chunks.append(Chunk(file_path, start + 1, start + len(window), "\n".join(window)))
+        if start + chunk_lines >= len(lines):
+            break
+    return chunks
+
+
+def diff_queries(pr_info: PRInfo) -> List[str]:
+    """One retrieval query per diff hunk: the file path, the hunk's enclosing scope and its changed lines."""
+    queries = []
+    for file_diff in pr_info.files_changed:
+        hunks: List[List[str]] = []
+        for line in (file_diff.diff_content or "").splitlines():
+            header = _HUNK_HEADER.match(line)
+            if header:
+                hunks.append([header.group(1).strip()])
+            elif hunks and line[:1] in ("+", "-") and not line.startswith(("+++", "---")):
+                hunks[-1].append(line[1:])
+        if not hunks and file_diff.diff_content:
+            hunks.append([file_diff.diff_content])
+        for hunk in hunks:
+            body = "\n".join(part for part in hunk if part.strip())
+            if body:
+                queries.append(f"{file_diff.file_path}\n{body}")
+    return queries
+
+
+class VectorIndex:
+    """Embedded chunks of one repository snapshot.
+
+    Vectors are kept in an ``(n_chunks, dim)`` float32 matrix of unit rows; a
+    saved index is loaded memory-mapped, so only the rows a search touches are
+    paged in. Searches embed all queries at once and score them against the
+    matrix in blocks, keeping a running top-k per query.
+    """
+
+    def __init__(self, chunks: List[Chunk], vectors: np.ndarray, embedder: Any):
+        self.chunks = chunks
+        self.vectors = vectors
+        self.embedder = embedder
+        self._paths = sorted({chunk.file_path for chunk in chunks})
+        path_ids = {path: i for i, path in enumerate(self._paths)}
+        self._chunk_paths = np.array([path_ids[chunk.file_path] for chunk in chunks], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @classmethod
+    def build(cls, files: Dict[str, str], embedder: Any = None) -> "VectorIndex":
+        """Chunk and embed ``files`` (path to content)."""
+        embedder = embedder or load_embedder()
+        chunks = [chunk for path in sorted(files) for chunk in chunk_file(path, files[path])]
+        vectors = np.zeros((0, embedder.dim), dtype=np.float32)
+        if chunks:
+            batch = settings.embedding_batch_size
+            vectors = np.vstack([
+                embedder.embed([f"{chunk.file_path}\n{chunk.text}" for chunk in chunks[i:i + batch]])
+                for i in range(0, len(chunks), batch)
+            ])
+        return cls(chunks, vectors, embedder)
+
+    def updated(self, files: Dict[str, str], removed: Iterable[str]) -> "VectorIndex":
+        """A new index without the chunks of ``removed`` paths and with ``files`` embedded.
+
+        Rows of untouched files are copied, not re-embedded, so the cost is
+        the embedding of ``files`` alone.
+        """
+        removed = set(removed) | set(files)
+        keep = [i for i, chunk in enumerate(self.chunks) if chunk.file_path not in removed]
+        added = VectorIndex.build(files, self.embedder)
+        chunks = [self.chunks[i] for i in keep] + added.chunks
+        vectors = np.vstack([np.asarray(self.vectors[keep], dtype=np.float32), added.vectors])
+        return VectorIndex(chunks, vectors, self.embedder)
+
+    def save(self, directory: str):
+        """Write the index to ``directory``, replacing any saved copy.
+
+        Files are written under temporary names and renamed over the old ones,
+        so an index still memory-mapping the previous vectors keeps its file
+        instead of seeing it truncated (SIGBUS). The chunk list goes last,
+        once the vectors it describes are in place.
+        """
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        tmp = path / "vectors.npy.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        os.replace(tmp, path / "vectors.npy")
+        meta = {"embedder": self.embedder.name, "dim": int(self.embedder.dim),
+                "chunks": [asdict(chunk) for chunk in self.chunks]}
+        tmp = path / "chunks.json.tmp"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, path / "chunks.json")
+
+    @classmethod
+    def load(cls, directory: str, embedder: Any = None) -> Optional["VectorIndex"]:
+        """Load a saved index memory-mapped, or None if it is missing or from another embedder."""
+        path = Path(directory)
+        try:
+            meta = json.loads((path / "chunks.json").read_text(encoding="utf-8"))
+            vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        embedder = embedder or load_embedder()
+        if meta.get("embedder") != embedder.name or vectors.shape[0] != len(meta["chunks"]):
+            return None
+        return cls([Chunk(**chunk) for chunk in meta["chunks"]], vectors, embedder)
+
+    def search(self, query_vectors: np.ndarray, top_k: int,
+               exclude_paths: Iterable[str] = ()) -> List[List[Tuple[int, float]]]:
+        """Cosine top-k chunk indices and scores for each query vector, best first."""
+        m, n = len(query_vectors), len(self.chunks)
+        if m == 0 or n == 0 or top_k <= 0:
+            return [[] for _ in range(m)]
+
+        excluded_ids = [i for i, path in enumerate(self._paths) if path in set(exclude_paths)]
+        excluded = np.isin(self._chunk_paths, excluded_ids)
+        best_scores = np.full((m, 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((m, 0), dtype=np.int64)
+        block = settings.vector_search_block_rows
+        for start in range(0, n, block):
+            scores = query_vectors @ np.asarray(self.vectors[start:start + block]).T
+            scores[:, excluded[start:start + block]] = -np.inf
+            ids = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            best_scores = np.hstack([best_scores, scores])
+            best_ids = np.hstack([best_ids, ids])
+            if best_scores.shape[1] > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        results = []
+        for row in range(m):
+            results.append([(int(best_ids[row, i]), float(best_scores[row, i]))
+                            for i in order[row] if np.isfinite(best_scores[row, i])])
+        return results
+
+    def search_texts(self, queries: List[str], top_k: int, exclude_paths: Iterable[str] = (),
+                     min_score: float = 0.0) -> List[SearchHit]:
+        """Embed ``queries`` in one batch and merge their hits, scoring each chunk by its best query."""
+        if not queries:
+            return []
+        per_query = self.search(self.embedder.embed(queries), top_k, exclude_paths)
+        best: Dict[int, float] = {}
+        for hits in per_query:
+            for chunk_id, score in hits:
+                if score >= min_score and score > best.get(chunk_id, -1.0):
+                    best[chunk_id] = score
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [SearchHit(self.chunks[chunk_id], round(score, 4)) for chunk_id, score in ranked]
+
+
+class VectorIndexStore(IncrementalIndex):
+    """One VectorIndex per repository, refreshed incrementally as the base commit moves.
+
+    The IncrementalIndexer decides which files changed since the last indexed
+    ref; only those are fetched and re-embedded. Indexes live under
+    ``<vector_index_dir>/<owner>__<name>/`` and stay in memory once loaded.
+    """
+
+    name = "vectors"
+
+    def __init__(self, github_client: GitHubProvider, index_dir: Optional[str] = None, embedder: Any = None,
+                 indexer: Optional[IncrementalIndexer] = None):
+        self.github_client = github_client
+        self.index_dir = Path(index_dir or settings.vector_index_dir)
+        self.indexer = indexer or IncrementalIndexer(github_client)
+        self.last_refresh: Optional[IndexRefresh] = None
+        self._embedder = embedder
+        self._indexes: Dict[str, VectorIndex] = {}
+
+    @property
+    def embedder(self) -> Any:
+        if self._embedder is None:
+            self._embedder = load_embedder()
+        return self._embedder
+
+    def get_index(self, repo: str, ref: str) -> VectorIndex:
+        """The index for ``repo``, first brought up to date with ``ref``."""
+        self.last_refresh = self.indexer.refresh(repo, ref, self)
+        return self._indexes[repo]
+
+    def accepts(self, file_path: str) -> bool:
+        return is_indexable(file_path)
+
+    def has_state(self, repo: str) -> bool:
+        if repo not in self._indexes:
+            index = VectorIndex.load(str(self._directory(repo)), self.embedder)
+            if index is None:
+                return False
+            self._indexes[repo] = index
+        return True
+
+    def apply_changes(self, repo: str, ref: str, changed: Dict[str, str], deleted: List[str]):
+        files = {
+            path: content for path, content in changed.items()
+            if not content.startswith("# Mock content") and len(content) <= settings.vector_index_max_file_bytes
+        }
+        current = self._indexes.get(repo) or VectorIndex.build({}, self.embedder)
+        index = current.updated(files, set(changed) | set(deleted))
+        index.save(str(self._directory(repo)))
+        self._indexes[repo] = index
+
+    def _directory(self, repo: str) -> Path:
+        return self.index_dir / re.sub(r"[^A-Za-z0-9._-]", "_", repo.replace("/", "__"))
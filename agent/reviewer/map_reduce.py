@@ -0,0 +1,82 @@
+from typing import List, Dict, Any, Callable, Optional
+from dataclasses import replace
+import math
+
+from app_logging.schemas.models import RetrievedDocument
+from ..providers.github_client import FileDiff, PRInfo
+from ..retrieval.context_packer import ContextPacker
+from config.settings import settings
+
+
+def estimate_file_tokens(file_diff: FileDiff, documents: List[RetrievedDocument],
+                         count_tokens: Callable[[str], int]) -> int:
+    """Tokens a file contributes to a prompt: its diff plus its own context documents."""
+    tokens = count_tokens(f"{file_diff.file_path}\n{file_diff.diff_content}")
+    for doc in documents:
+        if (doc.metadata or {}).get("file_path") == file_diff.file_path:
+            tokens += count_tokens(doc.content)
+    return tokens
+
+
+def partition_files(files: List[FileDiff], documents: List[RetrievedDocument],
+                    count_tokens: Callable[[str], int], max_group_tokens: int) -> List[List[FileDiff]]:
+    """Split changed files into token-balanced groups.
+
+    The number of groups is the smallest that keeps the average group under
+    ``max_group_tokens``; files are assigned largest-first to the lightest
+    group. Each group keeps the PR's original file order.
+    """
+    if not files:
+        return []
+
+    sizes = [estimate_file_tokens(file_diff, documents, count_tokens) for file_diff in files]
+    group_count = min(len(files), max(1, math.ceil(sum(sizes) / max_group_tokens)))
+
+    group_tokens = [0] * group_count
+    group_members: List[List[int]] = [[] for _ in range(group_count)]
+    for index in sorted(range(len(files)), key=lambda i: (-sizes[i], i)):
+        lightest = min(range(group_count), key=lambda g: (group_tokens[g], g))
+        group_tokens[lightest] += sizes[index]
+        group_members[lightest].append(index)
+
+    groups = [[files[i] for i in sorted(members)] for members in group_members if members]
+    groups.sort(key=lambda group: files.index(group[0]))
+    return groups
+
+
+def slice_pr_info(pr_info: PRInfo, files: List[FileDiff]) -> PRInfo:
+    """A copy of the PR restricted to ``files``."""
+    return replace(
+        pr_info,
+        files_changed=files,
+        total_additions=sum(f.additions for f in files),
+        total_deletions=sum(f.deletions for f in files)
+    )
+
+
+def group_documents(documents: List[RetrievedDocument], files: List[FileDiff]) -> List[RetrievedDocument]:
+    """The documents for one group: its files' documents plus documents not tied to any file."""
+    paths = {f.file_path for f in files}
+    return [
+        doc for doc in documents
+        if (doc.metadata or {}).get("file_path") in paths or "file_path" not in (doc.metadata or {})
+    ]
+
+
+def slice_context(context: Dict[str, Any], files: List[FileDiff],
+                  packer: Optional[ContextPacker] = None) -> Dict[str, Any]:
+    """Context for one group of files.
+
+    With a ``packer`` the group's share of the unpacked candidates is packed
+    into a full budget of its own; otherwise the already packed documents
+    are filtered. Contexts recorded without candidates fall back to the
+    packed documents.
+    """
+    candidates = context.get("candidates") or context["documents"]
+    if packer is None:
+        documents = group_documents(context["documents"], files)
+        return {**context, "documents": documents, "total_documents": len(documents)}
+
+    packing = packer.pack(group_documents(candidates, files), max_sources=settings.max_retrieval_docs)
+    return {**context, "documents": packing.documents, "total_documents": len(packing.documents),
+            "packing": packing.summary()}
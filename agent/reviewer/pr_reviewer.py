@@ -1,8 +1,9 @@
+import asyncio
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
 from langchain.output_parsers import PydanticOutputParser
 
 from app_logging.schemas.models import (
@@ -11,86 +12,392 @@ from app_logging.schemas.models import (
 )
 from app_logging.logger.session_logger import SessionLogger
 from ..retrieval.context_retriever import ContextRetriever
-from ..criteria.criteria_processor import CriteriaProcessor
+from ..retrieval.context_packer import ContextPacker
+from ..storage.blob_store import BlobStore
+from .response_cache import ResponseCache
+from .stream_parser import IncrementalCommentParser, parse_comments
+from .map_reduce import partition_files, slice_pr_info, slice_context
+from .stages import STAGE_DEPENDENCIES, run_blocking
 from config.settings import settings
 
 
+# Called with each comment as soon as it is parsed from the streamed response
+CommentCallback = Callable[[Comment], None]
+
+
 class PRReviewer:
     """Core PR reviewer using LangChain for intelligent code review."""
     
-    def __init__(self, session_logger: SessionLogger, context_retriever: ContextRetriever):
+    def __init__(self, session_logger: SessionLogger, context_retriever: ContextRetriever,
+                 llm: Optional[ChatOpenAI] = None, response_cache: Optional[ResponseCache] = None,
+                 blob_store: Optional[BlobStore] = None, step_prefix: str = ""):
         self.session_logger = session_logger
         self.context_retriever = context_retriever
-        self.llm = ChatOpenAI(
+        # Prepended to step ids so several reviewers can log into one session
+        self.step_prefix = step_prefix
+        # Large step payloads are logged as references to per-session content-addressed blobs
+        self.blob_store = blob_store or BlobStore()
+        # Share an existing client when given one so concurrent reviews reuse its connection pool
+        self.llm = llm or ChatOpenAI(
             model=settings.openai_model,
             temperature=settings.openai_temperature,
             top_p=settings.openai_top_p,
             api_key=settings.openai_api_key
         )
         
+        # Opt-in cache of model responses keyed on the full model input
+        if response_cache is None and settings.llm_cache_enabled:
+            response_cache = ResponseCache()
+        self.response_cache = response_cache
+        self._streamed_comment_count = 0
+        
         # Initialize output parser
         self.output_parser = PydanticOutputParser(pydantic_object=PRReview)
     
-    def review_pr(self, repo: str, pr_info: Any, criteria_text: str) -> PRReview:
-        """Perform a complete PR review."""
-        # Process criteria
-        criteria_step = self._log_step(
-            StepType.REASONING,
-            "criteria_processing",
-            {"criteria_text": criteria_text},
-            {"criteria_data": "Processing user criteria..."}
-        )
+    def review_pr(self, repo: str, pr_info: Any, criteria_text: str,
+                  on_comment: Optional[CommentCallback] = None) -> PRReview:
+        """Perform a complete PR review (blocking wrapper around areview_pr).
         
-        criteria_processor = CriteriaProcessor()
-        criteria_data = criteria_processor.process_criteria(criteria_text)
+        Raises RuntimeError when called from a running event loop; await areview_pr there.
+        """
+        return run_blocking(self.areview_pr(repo, pr_info, criteria_text, on_comment))
+    
+    async def areview_pr(self, repo: str, pr_info: Any, criteria_text: str,
+                         on_comment: Optional[CommentCallback] = None,
+                         recorded_stages: Optional[Dict[str, Dict[str, Any]]] = None) -> PRReview:
+        """Perform a complete PR review without blocking the event loop.
+        
+        When ``on_comment`` is given the model response is streamed, and each
+        comment is logged and passed to the callback as soon as it is parsed.
+        ``recorded_stages`` maps stage names (see ``STAGE_DEPENDENCIES``) to
+        outputs recorded by an earlier run; those stages are logged with the
+        recorded output instead of being executed again.
+        """
+        recorded_stages = recorded_stages or {}
         
-        self._update_step(criteria_step, {"criteria_data": criteria_data})
+        # Process criteria
+        async def process_criteria() -> Dict[str, Any]:
+            criteria_data = self.context_retriever.criteria_processor.process_criteria(criteria_text)
+            return {"criteria_data": criteria_data}
         
-        # Retrieve context
-        retrieval_step = self._log_step(
-            StepType.RETRIEVAL,
-            "context_retrieval",
-            {"repo": repo, "pr_info": pr_info.__dict__, "criteria": criteria_data},
-            {"retrieved_docs": "Retrieving context..."}
+        criteria_data = (await self._arun_stage(
+            "criteria_processing", StepType.REASONING,
+            {"criteria_text": criteria_text},
+            {"criteria_data": "Processing user criteria..."},
+            process_criteria, recorded_stages
+        ))["criteria_data"]
+        
+        # Run the candidate stages that do not depend on the criteria
+        async def retrieve_pr_documents() -> Dict[str, Any]:
+            return await self.context_retriever.acollect_pr_candidates(repo, pr_info)
+        
+        pr_candidates = await self._arun_stage(
+            "pr_retrieval", StepType.RETRIEVAL,
+            {"repo": repo, "pr_info": pr_info.__dict__},
+            {"documents": "Retrieving PR context..."},
+            retrieve_pr_documents, recorded_stages
         )
         
-        context = self.context_retriever.get_enhanced_context(repo, pr_info, criteria_data)
+        # Add criteria documents, fuse the candidate rankings and pack the context
+        async def retrieve_context() -> Dict[str, Any]:
+            context = await self.context_retriever.aget_enhanced_context(
+                repo, pr_info, criteria_data, pr_candidates["documents"],
+                # Sessions recorded before retrieval ran in stages have no stage reports
+                pr_stages=pr_candidates.get("retrieval_stages")
+            )
+            return {"retrieved_docs": context["documents"], "context_summary": context}
         
-        self._update_step(retrieval_step, {
-            "retrieved_docs": context["documents"],
-            "context_summary": context
-        })
+        context = (await self._arun_stage(
+            "context_retrieval", StepType.RETRIEVAL,
+            {"repo": repo, "pr_info": pr_info.__dict__, "criteria": criteria_data},
+            {"retrieved_docs": "Retrieving context..."},
+            retrieve_context, recorded_stages
+        ))["context_summary"]
         
         # Generate review
-        generation_step = self._log_step(
-            StepType.GENERATION,
-            "review_generation",
+        async def generate_review() -> Dict[str, Any]:
+            review, generation_info = await self._agenerate_review(pr_info, context, criteria_data, on_comment)
+            return {"review": review, **generation_info}
+        
+        review = (await self._arun_stage(
+            "review_generation", StepType.GENERATION,
             {"context": context, "criteria": criteria_data},
-            {"review": "Generating review..."}
+            {"review": "Generating review..."},
+            generate_review, recorded_stages
+        ))["review"]
+        
+        # Generate summary
+        async def summarize_review() -> Dict[str, Any]:
+            return {"summary": self._generate_summary(review, context, criteria_data)}
+        
+        final_review = (await self._arun_stage(
+            "review_summary", StepType.SUMMARY,
+            {"review": review},
+            {"summary": "Generating summary..."},
+            summarize_review, recorded_stages
+        ))["summary"]
+        
+        return final_review
+    
+    async def areview_pr_multi(self, repo: str, pr_info: Any, criteria_texts: List[str],
+                               on_comment: Optional[Callable[[str, Comment], None]] = None) -> Dict[str, PRReview]:
+        """Review one PR under several criteria sets, running the criteria-independent stages once.
+        
+        PR retrieval is logged once; each criteria set then runs the remaining
+        stages concurrently in its own reviewer, logging into the same session
+        with steps prefixed ``criteria_<n>/``. ``on_comment`` receives the
+        criteria text along with each streamed comment. Returns reviews keyed
+        by criteria text, in the given order.
+        """
+        criteria_texts = list(dict.fromkeys(criteria_texts))
+        
+        async def retrieve_pr_documents() -> Dict[str, Any]:
+            return await self.context_retriever.acollect_pr_candidates(repo, pr_info)
+        
+        pr_candidates = await self._arun_stage(
+            "pr_retrieval", StepType.RETRIEVAL,
+            {"repo": repo, "pr_info": pr_info.__dict__},
+            {"documents": "Retrieving PR context..."},
+            retrieve_pr_documents, {}
         )
+        shared_stages = {"pr_retrieval": pr_candidates}
+        
+        async def review_criteria(index: int, criteria_text: str) -> PRReview:
+            reviewer = PRReviewer(self.session_logger, self.context_retriever, llm=self.llm,
+                                  response_cache=self.response_cache, blob_store=self.blob_store,
+                                  step_prefix=f"{self.step_prefix}criteria_{index}/")
+            callback = None
+            if on_comment is not None:
+                callback = lambda comment: on_comment(criteria_text, comment)
+            return await reviewer.areview_pr(repo, pr_info, criteria_text, callback,
+                                             recorded_stages=shared_stages)
+        
+        reviews = await asyncio.gather(*(review_criteria(index, criteria_text)
+                                         for index, criteria_text in enumerate(criteria_texts)))
+        return dict(zip(criteria_texts, reviews))
+    
+    @staticmethod
+    def combine_criteria_reviews(reviews: Dict[str, PRReview]) -> PRReview:
+        """Merge per-criteria reviews into one review for the combined session."""
+        comments = [comment for review in reviews.values() for comment in review.comments]
+        package_suggestions = []
+        seen_packages = set()
+        for review in reviews.values():
+            for suggestion in review.package_suggestions:
+                if suggestion.name not in seen_packages:
+                    seen_packages.add(suggestion.name)
+                    package_suggestions.append(suggestion)
         
-        review = self._generate_review(pr_info, context, criteria_data)
+        return PRReview(
+            comments=comments,
+            package_suggestions=package_suggestions,
+            comment_summary=" ".join(f"[{criteria}] {review.comment_summary}" for criteria, review in reviews.items()),
+            high_level_summary_md="\n\n".join(f"### {criteria}\n{review.high_level_summary_md}"
+                                               for criteria, review in reviews.items())
+        )
+    
+    async def _arun_stage(self, stage: str, step_type: StepType, input_data: Dict[str, Any],
+                          pending_output: Dict[str, Any], run: Callable[[], Awaitable[Dict[str, Any]]],
+                          recorded_stages: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Log a pipeline stage and run it, or reuse its recorded output.
+        
+        The step input records the stage's dependencies so later replays can
+        tell which stages a change invalidates.
+        """
+        step = self._log_step(step_type, stage, {**input_data, "depends_on": list(STAGE_DEPENDENCIES[stage])},
+                              pending_output)
+        
+        if stage in recorded_stages:
+            output = {**recorded_stages[stage], "reused": True}
+        else:
+            output = await run()
         
-        self._update_step(generation_step, {"review": review})
+        self._update_step(step, output)
+        return output
+    
+    async def _agenerate_review(self, pr_info: Any, context: Dict[str, Any], 
+                                criteria_data: Dict[str, Any],
+                                on_comment: Optional[CommentCallback] = None) -> Tuple[PRReview, Dict[str, Any]]:
+        """Generate the initial PR review using LangChain.
         
-        # Generate summary
-        summary_step = self._log_step(
-            StepType.SUMMARY,
-            "review_summary",
-            {"review": review},
-            {"summary": "Generating summary..."}
+        Returns the review and generation metadata (cache hit/key) for the step log.
+        """
+        groups = self._plan_review_groups(pr_info, context)
+        if len(groups) > 1 or (groups and settings.review_strategy == "map_reduce"):
+            return await self._agenerate_map_reduce_review(pr_info, groups, context, criteria_data, on_comment)
+        
+        messages = self._build_review_messages(pr_info, context, criteria_data)
+        generation_info: Dict[str, Any] = {"cache_hit": False}
+        
+        try:
+            review_text, generation_info = await self._ainvoke_model(messages, on_comment, pr_info)
+            
+            # Parse the response into structured format
+            review = self._parse_review_response(review_text, pr_info)
+            
+        except Exception as e:
+            # Fallback to basic review if parsing fails
+            review = self._create_fallback_review(pr_info, criteria_data)
+        
+        return review, {"strategy": "single", **generation_info}
+    
+    def _plan_review_groups(self, pr_info: Any, context: Dict[str, Any]) -> List[List[Any]]:
+        """Split the changed files into token-balanced groups for map-reduce review."""
+        if settings.review_strategy == "single":
+            return [pr_info.files_changed]
+        
+        return partition_files(
+            pr_info.files_changed,
+            context.get("candidates") or context["documents"],
+            self.context_retriever.context_packer.count_tokens,
+            settings.map_reduce_group_tokens
+        )
+    
+    async def _agenerate_map_reduce_review(self, pr_info: Any, groups: List[List[Any]],
+                                           context: Dict[str, Any], criteria_data: Dict[str, Any],
+                                           on_comment: Optional[CommentCallback] = None
+                                           ) -> Tuple[PRReview, Dict[str, Any]]:
+        """Review each file group in parallel, then merge the partial reviews in a reduce call."""
+        semaphore = asyncio.Semaphore(settings.max_concurrent_llm_calls)
+        
+        async def review_group(files: List[Any]) -> Tuple[PRReview, Dict[str, Any]]:
+            group_pr_info = slice_pr_info(pr_info, files)
+            group_context = slice_context(context, files, self.context_retriever.context_packer)
+            messages = self._build_review_messages(group_pr_info, group_context, criteria_data)
+            async with semaphore:
+                try:
+                    review_text, call_info = await self._ainvoke_model(messages, on_comment, group_pr_info)
+                    return self._parse_review_response(review_text, group_pr_info), call_info
+                except Exception:
+                    return self._create_fallback_review(group_pr_info, criteria_data), {"cache_hit": False}
+        
+        results = await asyncio.gather(*(review_group(files) for files in groups))
+        partial_reviews = [review for review, _ in results]
+        
+        comments = [comment for review in partial_reviews for comment in review.comments]
+        package_suggestions = []
+        seen_packages = set()
+        for review in partial_reviews:
+            for suggestion in review.package_suggestions:
+                if suggestion.name not in seen_packages:
+                    seen_packages.add(suggestion.name)
+                    package_suggestions.append(suggestion)
+        
+        comment_summary, high_level_summary, reduce_info = await self._areduce_reviews(
+            pr_info, groups, partial_reviews, criteria_data
         )
         
-        final_review = self._generate_summary(review, context, criteria_data)
+        review = PRReview(
+            comments=comments,
+            package_suggestions=package_suggestions,
+            comment_summary=comment_summary,
+            high_level_summary_md=high_level_summary
+        )
         
-        self._update_step(summary_step, {"summary": final_review})
+        generation_info = {
+            "strategy": "map_reduce",
+            "cache_hit": all(info.get("cache_hit") for _, info in results) and reduce_info.get("cache_hit", False),
+            "groups": [[f.file_path for f in files] for files in groups],
+            "map_calls": [info for _, info in results],
+            "reduce_call": reduce_info
+        }
+        return review, generation_info
+    
+    async def _areduce_reviews(self, pr_info: Any, groups: List[List[Any]], partial_reviews: List[PRReview],
+                               criteria_data: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+        """Merge partial review summaries into one comment summary and high-level summary."""
+        focus = criteria_data.get("focus", "Code quality")
+        system_prompt = (
+            f"You are an expert code reviewer specializing in {focus.lower()}. "
+            "You are merging partial reviews of one pull request, each covering a subset of its files."
+        )
         
-        return final_review
+        human_prompt = f"**PR Title:** {pr_info.title}\n**Description:** {pr_info.description}\n\n"
+        for files, review in zip(groups, partial_reviews):
+            human_prompt += f"### Files: {', '.join(f.file_path for f in files)}\n"
+            human_prompt += f"Summary: {review.comment_summary}\n"
+            human_prompt += f"Highlights: {review.high_level_summary_md}\n"
+            human_prompt += f"Comments: {len(review.comments)}\n\n"
+        human_prompt += ("Write a concise comment summary for the whole pull request, "
+                         "then a high-level summary with bold headlines.")
+        
+        messages = [SystemMessage(content=system_prompt), HumanMessage(content=human_prompt)]
+        
+        try:
+            summary_text, reduce_info = await self._ainvoke_model(messages)
+            return (self._extract_comment_summary(summary_text),
+                    self._extract_high_level_summary(summary_text),
+                    reduce_info)
+        except Exception:
+            comment_summary = " ".join(review.comment_summary for review in partial_reviews)
+            return comment_summary, partial_reviews[0].high_level_summary_md, {"cache_hit": False}
     
-    def _generate_review(self, pr_info: Any, context: Dict[str, Any], 
-                        criteria_data: Dict[str, Any]) -> PRReview:
-        """Generate the initial PR review using LangChain."""
+    async def _ainvoke_model(self, messages: List[BaseMessage],
+                             on_comment: Optional[CommentCallback] = None,
+                             pr_info: Any = None) -> Tuple[str, Dict[str, Any]]:
+        """Call the model, serving byte-identical requests from the response cache.
+        
+        The returned info records the prompt key and raw response text so the
+        call can be served again by an offline replay. Streamed comments are
+        anchored to ``pr_info``'s diff like the comments of the final review.
+        """
+        prompt_key = ResponseCache.make_key(messages, self._model_params())
+        generation_info: Dict[str, Any] = {"cache_hit": False, "streamed": on_comment is not None,
+                                           "prompt_key": prompt_key}
+        cache_key = None
+        
+        if self.response_cache is not None:
+            cache_key = prompt_key
+            generation_info["cache_key"] = cache_key
+            cached_text = await asyncio.to_thread(self.response_cache.get, cache_key)
+            if cached_text is not None:
+                if on_comment is not None:
+                    for comment in parse_comments(cached_text):
+                        self._emit_comment(comment, on_comment, pr_info)
+                return cached_text, {**generation_info, "cache_hit": True, "response": cached_text}
+        
+        if on_comment is None:
+            response = await self.llm.ainvoke(messages)
+            review_text = response.content
+        else:
+            review_text = await self._astream_model(messages, on_comment, pr_info)
+        
+        if cache_key is not None:
+            await asyncio.to_thread(self.response_cache.put, cache_key, review_text)
+        return review_text, {**generation_info, "response": review_text}
+    
+    async def _astream_model(self, messages: List[BaseMessage], on_comment: CommentCallback, pr_info: Any) -> str:
+        """Stream the model response, emitting each comment as soon as its line completes."""
+        parser = IncrementalCommentParser()
+        chunks = []
+        
+        async for chunk in self.llm.astream(messages):
+            chunks.append(chunk.content)
+            for comment in parser.feed(chunk.content):
+                self._emit_comment(comment, on_comment, pr_info)
         
+        for comment in parser.close():
+            self._emit_comment(comment, on_comment, pr_info)
+        
+        return "".join(chunks)
+    
+    def _emit_comment(self, comment: Comment, on_comment: CommentCallback, pr_info: Any):
+        """Anchor a streamed comment, log it to the session and hand it to the caller."""
+        if pr_info is not None:
+            self._anchor_comments([comment], pr_info)
+        index = self._streamed_comment_count
+        self._streamed_comment_count += 1
+        self._log_step(
+            StepType.GENERATION,
+            f"review_comment_{index}",
+            {"source": "review_generation"},
+            {"comment": comment}
+        )
+        on_comment(comment)
+    
+    def _build_review_messages(self, pr_info: Any, context: Dict[str, Any], 
+                               criteria_data: Dict[str, Any]) -> List[BaseMessage]:
+        """Build the chat messages sent to the model for a review."""
         # Create the review prompt
         system_prompt = self._create_system_prompt(criteria_data)
         human_prompt = self._create_human_prompt(pr_info, context)
@@ -98,24 +405,10 @@ class PRReviewer:
         # Combine context documents
         context_text = self._format_context_for_prompt(context)
         
-        # Generate review
-        messages = [
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(content=f"{human_prompt}\n\nContext:\n{context_text}")
         ]
-        
-        try:
-            response = self.llm.invoke(messages)
-            review_text = response.content
-            
-            # Parse the response into structured format
-            review = self._parse_review_response(review_text, pr_info)
-            
-        except Exception as e:
-            # Fallback to basic review if parsing fails
-            review = self._create_fallback_review(pr_info, criteria_data)
-        
-        return review
     
     def _create_system_prompt(self, criteria_data: Dict[str, Any]) -> str:
         """Create the system prompt based on criteria."""
@@ -132,6 +425,9 @@ Your task is to review a pull request and provide:
 3. A concise comment summary
 4. A high-level summary with bold headlines
 
+Write each code comment on its own line in exactly this format:
+COMMENT: <file_path>:<line_number> [<info|suggestion|warning|error>] <comment text>
+
 Focus on the criteria provided and ensure all feedback is constructive and actionable."""
         
         return prompt
@@ -159,9 +455,10 @@ Focus on the criteria provided and ensure all feedback is constructive and actio
         """Format context documents for the prompt."""
         context_text = "**Repository Context:**\n"
         
+        # Documents were already packed into the token budget by the context packer
         for doc in context["documents"]:
-            context_text += f"\n**{doc.source}** (Relevance: {doc.relevance_score or 'N/A'}):\n"
-            context_text += f"{doc.content[:500]}...\n" if len(doc.content) > 500 else doc.content
+            context_text += ContextPacker.format_header(doc)
+            context_text += doc.content if doc.content.endswith("\n") else f"{doc.content}\n"
         
         return context_text
     
@@ -187,7 +484,9 @@ Focus on the criteria provided and ensure all feedback is constructive and actio
     
     def _extract_comments(self, review_text: str, pr_info: Any) -> List[Comment]:
         """Extract comments from the review text."""
-        comments = []
+        comments = parse_comments(review_text)
+        if comments:
+            return self._anchor_comments(comments, pr_info)
         
         # Simple extraction - look for file paths and line numbers
         for file_diff in pr_info.files_changed:
@@ -200,13 +499,24 @@ Focus on the criteria provided and ensure all feedback is constructive and actio
             
             comments.append(Comment(
                 file_path=file_diff.file_path,
-                line_number=1,  # Default to first line
+                line_number=file_diff.hunk_index().first_changed_line(),
                 comment_text=comment_text,
                 severity="info"
             ))
         
         return comments
     
+    def _anchor_comments(self, comments: List[Comment], pr_info: Any) -> List[Comment]:
+        """Snap comment line numbers onto the changed lines of their file's diff."""
+        diffs = {file_diff.file_path: file_diff for file_diff in pr_info.files_changed}
+        
+        for comment in comments:
+            file_diff = diffs.get(comment.file_path)
+            if file_diff is not None:
+                comment.line_number = file_diff.hunk_index().anchor_line(comment.line_number)
+        
+        return comments
+    
     def _extract_package_suggestions(self, review_text: str) -> List[PackageSuggestion]:
         """Extract package suggestions from the review text."""
         # Simple extraction - look for common package patterns
@@ -262,7 +572,7 @@ Focus on the criteria provided and ensure all feedback is constructive and actio
         for file_diff in pr_info.files_changed:
             comments.append(Comment(
                 file_path=file_diff.file_path,
-                line_number=1,
+                line_number=file_diff.hunk_index().first_changed_line(),
                 comment_text=f"Review changes in {file_diff.file_path}",
                 severity="info"
             ))
@@ -334,21 +644,40 @@ Focus on the criteria provided and ensure all feedback is constructive and actio
         """Log a reasoning step."""
         step = ReasoningStep(
             step_type=step_type,
-            step_id=step_id,
-            input=input_data,
-            output=output_data,
-            model_params={
-                "model": settings.openai_model,
-                "temperature": settings.openai_temperature,
-                "top_p": settings.openai_top_p
-            }
+            step_id=f"{self.step_prefix}{step_id}",
+            input=self._externalize(input_data),
+            output=self._externalize(output_data),
+            model_params=self._model_params()
         )
         
         self.session_logger.log_step(step)
         return step
     
+    def _externalize(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Swap large payloads in step data for blob references in the current session."""
+        session = getattr(self.session_logger, "current_session", None)
+        if session is None:
+            return data
+        return self.blob_store.externalize(session.session_id, data)
+    
+    def _model_params(self) -> Dict[str, Any]:
+        """Model parameters recorded with each step and folded into response cache keys.
+        
+        Read from the reviewer's own client so reviewers built with another
+        model or sampling settings never share cached responses; clients that
+        do not expose a parameter fall back to the configured value.
+        """
+        recorded = getattr(self.llm, "model_params", None)
+        if isinstance(recorded, dict):
+            return dict(recorded)
+        return {
+            "model": getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None) or settings.openai_model,
+            "temperature": getattr(self.llm, "temperature", settings.openai_temperature),
+            "top_p": getattr(self.llm, "top_p", settings.openai_top_p)
+        }
+    
     def _update_step(self, step: ReasoningStep, new_output: Dict[str, Any]):
         """Update an existing step with new output."""
-        step.output.update(new_output)
+        step.output.update(self._externalize(new_output))
         # Re-log the updated step
         self.session_logger.log_step(step) 
\ No newline at end of file
@@ -0,0 +1,96 @@
+from typing import List, Dict, Any, Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from langchain.schema import BaseMessage
+
+from config.settings import settings
+
+
+class ResponseCache:
+    """SQLite-backed cache of LLM responses keyed on the full model input.
+
+    The key is a hash of the serialized messages plus the model parameters, so
+    any change to the prompt, context, model, temperature or top_p misses.
+    Entries expire after ``ttl_seconds`` and the least recently used entries are
+    dropped once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: Optional[int] = None,
+                 max_entries: Optional[int] = None):
+        db_path = db_path or settings.llm_cache_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = settings.llm_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_entries = settings.llm_cache_max_entries if max_entries is None else max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(messages: List[BaseMessage], model_params: Dict[str, Any]) -> str:
+        """Hash the serialized messages and model parameters."""
+        payload = {
+            "messages": [{"type": message.type, "content": message.content} for message in messages],
+            "model_params": model_params
+        }
+        serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and now - row[1] <= self.ttl_seconds:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+
+            if row:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str):
+        """Store a response, evicting the least recently used entries past max_entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current entry count."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
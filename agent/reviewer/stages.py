@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, Coroutine, Dict, Iterable, List, Tuple, TypeVar
+
+
+# Review pipeline inputs, set by the caller of ``PRReviewer.areview_pr``
+PIPELINE_INPUTS = ("repo", "pr_info", "criteria_text")
+
+# Each stage, in execution order, and the inputs or earlier stages its output depends on
+STAGE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "criteria_processing": ("criteria_text",),
+    "pr_retrieval": ("repo", "pr_info"),
+    "context_retrieval": ("pr_info", "criteria_processing", "pr_retrieval"),
+    "review_generation": ("pr_info", "criteria_processing", "context_retrieval"),
+    "review_summary": ("criteria_processing", "context_retrieval", "review_generation"),
+}
+
+STAGE_ORDER = tuple(STAGE_DEPENDENCIES)
+
+T = TypeVar("T")
+
+
+def run_blocking(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a pipeline coroutine to completion from synchronous code.
+    
+    The blocking entry points use this; from inside a running event loop
+    (a notebook, the review server) await their async variants instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError("Blocking review call made from a running event loop; await the async variant instead")
+
+
+def invalidated_stages(changed: Iterable[str]) -> List[str]:
+    """Stages whose output may change when the given inputs or stages change, in execution order."""
+    dirty = set(changed)
+    stages = []
+    for stage in STAGE_ORDER:
+        if stage in dirty or dirty.intersection(STAGE_DEPENDENCIES[stage]):
+            dirty.add(stage)
+            stages.append(stage)
+    return stages
+
+
+def reusable_stages(changed: Iterable[str]) -> List[str]:
+    """Stages whose recorded output stays valid when the given inputs or stages change."""
+    invalid = set(invalidated_stages(changed))
+    return [stage for stage in STAGE_ORDER if stage not in invalid]
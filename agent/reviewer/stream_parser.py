@@ -0,0 +1,62 @@
+from typing import List, Optional
+import re
+
+from app_logging.schemas.models import Comment
+
+
+# One review comment per line, e.g. "COMMENT: src/app.py:42 [warning] Avoid the N+1 query"
+COMMENT_LINE_PATTERN = re.compile(
+    r"^\s*(?:[-*]\s*)?COMMENT:\s*`?(?P<file_path>[^\s:`]+)`?:(?P<line_number>\d+)\s*"
+    r"(?:\[(?P<severity>\w+)\])?\s*[-:]?\s*(?P<comment_text>\S.*?)\s*$"
+)
+
+VALID_SEVERITIES = {"info", "warning", "error", "suggestion"}
+
+
+def parse_comment_line(line: str) -> Optional[Comment]:
+    """Parse a single ``COMMENT:`` line, returning None for any other line."""
+    match = COMMENT_LINE_PATTERN.match(line)
+    if not match:
+        return None
+
+    severity = (match.group("severity") or "info").lower()
+    return Comment(
+        file_path=match.group("file_path"),
+        line_number=max(1, int(match.group("line_number"))),
+        comment_text=match.group("comment_text"),
+        severity=severity if severity in VALID_SEVERITIES else "info"
+    )
+
+
+def parse_comments(review_text: str) -> List[Comment]:
+    """Parse every ``COMMENT:`` line in a complete review."""
+    parser = IncrementalCommentParser()
+    return parser.feed(review_text) + parser.close()
+
+
+class IncrementalCommentParser:
+    """Turns a streamed review into Comment objects as soon as each line completes."""
+
+    def __init__(self):
+        self._buffer = ""
+        self.comments: List[Comment] = []
+
+    def feed(self, chunk: str) -> List[Comment]:
+        """Consume a chunk of streamed text and return comments completed by it."""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        return self._parse_lines(lines)
+
+    def close(self) -> List[Comment]:
+        """Flush the trailing partial line at the end of the stream."""
+        lines, self._buffer = [self._buffer], ""
+        return self._parse_lines(lines)
+
+    def _parse_lines(self, lines: List[str]) -> List[Comment]:
+        new_comments = []
+        for line in lines:
+            comment = parse_comment_line(line)
+            if comment:
+                new_comments.append(comment)
+        self.comments.extend(new_comments)
+        return new_comments
@@ -0,0 +1,3 @@
+"""
+Long-lived local review service.
+""" 
\ No newline at end of file
@@ -0,0 +1,369 @@
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import asdict
+from urllib.parse import urlsplit, parse_qs, unquote
+import asyncio
+import hmac
+import json
+import os
+import stat
+
+from config.settings import settings
+
+
+class HTTPError(Exception):
+    """An error answered with ``status`` and a JSON ``{"error": message}`` body."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+STATUS_TEXT = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+
+class ReviewServer:
+    """Long-lived HTTP service over one warm ReviewOrchestrator.
+
+    The orchestrator, with its pooled GitHub client, model client, caches and
+    session index, is built once and shared by every request. Listens on TCP
+    or a Unix socket; connections are kept alive between requests.
+
+    Routes:
+        GET  /health
+        POST /review          {"repo", "pr", "criteria": str | [str], "stream": bool}
+        POST /replay          {"session_id", "criteria", "live"}
+        GET  /sessions
+        GET  /sessions/<id>
+        GET  /stats           ?repo=&since=
+        POST /jobs            {"repo", "pr", "criteria", "head_sha", "priority"}
+        GET  /jobs/<id>
+        GET  /jobs/metrics
+
+    The /jobs routes need a ``job_queue``; a full queue answers 503. With a
+    ``worker_pool`` the server also runs queued jobs on the same orchestrator.
+
+    A streamed review answers with chunked NDJSON: one ``{"type": "comment"}``
+    line per comment as it is parsed, then a ``{"type": "result"}`` line.
+
+    POST bodies must be sent as ``application/json``, which browsers cannot
+    do cross-origin without a CORS preflight. With ``server_auth_token`` set,
+    every route except /health also needs ``Authorization: Bearer <token>``.
+    Without a token a TCP server only answers requests addressed to
+    localhost (or its own bind address), so a DNS-rebound page cannot reach it.
+    """
+
+    def __init__(self, orchestrator: Any, host: Optional[str] = None, port: Optional[int] = None,
+                 unix_socket: Optional[str] = None, job_queue: Any = None, worker_pool: Any = None):
+        self.orchestrator = orchestrator
+        self.job_queue = job_queue
+        self.worker_pool = worker_pool
+        self.host = host or settings.server_host
+        self.port = settings.server_port if port is None else port
+        self.unix_socket = unix_socket
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._review_slots: Optional[asyncio.Semaphore] = None
+        self._workers: Optional[asyncio.Task] = None
+
+    @property
+    def address(self) -> str:
+        if self.unix_socket:
+            return f"unix:{self.unix_socket}"
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> asyncio.AbstractServer:
+        """Bind the listening socket and warm up the clients."""
+        self._review_slots = asyncio.Semaphore(settings.batch_max_concurrency)
+        if self.unix_socket:
+            # Only a stale socket is replaced; any other file at the path is a mistake to report
+            if os.path.exists(self.unix_socket):
+                if not stat.S_ISSOCK(os.stat(self.unix_socket).st_mode):
+                    raise FileExistsError(f"{self.unix_socket} exists and is not a socket")
+                os.unlink(self.unix_socket)
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=self.unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+            # Report the real port when bound to port 0
+            self.port = self._server.sockets[0].getsockname()[1]
+        await asyncio.to_thread(self._warm_up)
+        if self.worker_pool is not None:
+            self._workers = asyncio.create_task(self.worker_pool.run())
+        return self._server
+
+    async def serve_forever(self):
+        """Start the server and run until cancelled."""
+        server = self._server or await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._workers is not None:
+            self.worker_pool.stop()
+            await self._workers
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            if self.unix_socket and os.path.exists(self.unix_socket):
+                os.unlink(self.unix_socket)
+
+    def _warm_up(self):
+        # Build the model client and tokenizer up front so the first review does not pay for them
+        if settings.openai_api_key:
+            self.orchestrator.pr_reviewer
+            self.orchestrator.context_retriever.context_packer
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, path, query, headers, body, keep_alive = request
+                await self._respond(writer, method, path, query, headers, body, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError:
+            # StreamReader.readline raises ValueError for a line longer than its buffer limit
+            self._write_json(writer, 431, {"error": "Request line or header too long"}, keep_alive=False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+                            ) -> Optional[Tuple[str, str, Dict[str, str], Dict[str, str], bytes, bool]]:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            self._write_json(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+            return None
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= settings.server_max_headers:
+                self._write_json(writer, 431, {"error": "Too many headers"}, keep_alive=False)
+                return None
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            self._write_json(writer, 400, {"error": "Invalid Content-Length"}, keep_alive=False)
+            return None
+        if length > settings.server_max_body_bytes:
+            self._write_json(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+            return None
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return method.upper(), unquote(url.path).rstrip("/") or "/", query, headers, body, keep_alive
+
+    async def _respond(self, writer: asyncio.StreamWriter, method: str, path: str, query: Dict[str, str],
+                       headers: Dict[str, str], body: bytes, keep_alive: bool):
+        if method == "OPTIONS":
+            self._write_head(writer, 204, {"Content-Length": "0"}, keep_alive)
+            return
+
+        try:
+            self._check_host(headers)
+            self._authorize(path, headers)
+            if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+                raise HTTPError(415, "POST bodies must be sent as application/json")
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Request body must be a JSON object")
+
+            if method == "POST" and path == "/review" and payload.get("stream"):
+                await self._stream_review(writer, payload, keep_alive)
+                return
+
+            status, result = 200, await self._dispatch(method, path, query, payload)
+        except json.JSONDecodeError:
+            status, result = 400, {"error": "Request body is not valid JSON"}
+        except HTTPError as e:
+            status, result = e.status, {"error": e.message}
+        except Exception as e:
+            status, result = 500, {"error": str(e)}
+
+        self._write_json(writer, status, result, keep_alive)
+
+    async def _dispatch(self, method: str, path: str, query: Dict[str, str],
+                        payload: Dict[str, Any]) -> Dict[str, Any]:
+        if path == "/health":
+            self._require(method, "GET")
+            return {"status": "ok"}
+
+        if path == "/review":
+            self._require(method, "POST")
+            repo, pr_number, criteria = self._review_job(payload)
+            async with self._review_slots:
+                if len(criteria) > 1:
+                    return await self.orchestrator.areview_pull_request_multi(repo, pr_number, criteria)
+                return await self.orchestrator.areview_pull_request(repo, pr_number, criteria[0])
+
+        if path == "/replay":
+            self._require(method, "POST")
+            if not payload.get("session_id"):
+                raise HTTPError(400, "session_id is required")
+            result = await self.orchestrator.areplay_session(
+                payload["session_id"], payload.get("criteria"), live=bool(payload.get("live"))
+            )
+            if result.get("error") == "Session not found":
+                raise HTTPError(404, result["error"])
+            return result
+
+        if path == "/sessions":
+            self._require(method, "GET")
+            return await asyncio.to_thread(self.orchestrator.list_sessions)
+
+        if path.startswith("/sessions/"):
+            self._require(method, "GET")
+            session_id = path[len("/sessions/"):]
+            details = await asyncio.to_thread(self.orchestrator.get_session_details, session_id)
+            if details is None:
+                raise HTTPError(404, "Session not found")
+            return details
+
+        if path == "/stats":
+            self._require(method, "GET")
+            return await asyncio.to_thread(self.orchestrator.get_review_statistics,
+                                           query.get("repo"), query.get("since"))
+
+        if path == "/jobs" or path.startswith("/jobs/"):
+            return await self._dispatch_jobs(method, path, payload)
+
+        raise HTTPError(404, f"No route for {path}")
+
+    async def _dispatch_jobs(self, method: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        from ..jobs.job_queue import QueueFull
+
+        if self.job_queue is None:
+            raise HTTPError(404, "Job queue is not enabled")
+
+        if path == "/jobs":
+            self._require(method, "POST")
+            repo, pr_number, criteria = self._review_job(payload)
+            if len(criteria) > 1:
+                raise HTTPError(400, "Queue one job per criteria set")
+            try:
+                job = await asyncio.to_thread(self.job_queue.enqueue, repo, pr_number, criteria[0],
+                                              payload.get("head_sha"), payload.get("priority") or "normal")
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+            except QueueFull as e:
+                raise HTTPError(503, str(e))
+            return asdict(job)
+
+        self._require(method, "GET")
+        if path == "/jobs/metrics":
+            return await asyncio.to_thread(self.job_queue.metrics)
+
+        try:
+            job_id = int(path[len("/jobs/"):])
+        except ValueError:
+            raise HTTPError(404, f"No route for {path}")
+        job = await asyncio.to_thread(self.job_queue.get, job_id)
+        if job is None:
+            raise HTTPError(404, "Job not found")
+        return asdict(job)
+
+    async def _stream_review(self, writer: asyncio.StreamWriter, payload: Dict[str, Any], keep_alive: bool):
+        """Answer a review with chunked NDJSON, one line per comment and a final result line."""
+        repo, pr_number, criteria = self._review_job(payload)
+        self._write_head(writer, 200, {"Content-Type": "application/x-ndjson",
+                                       "Transfer-Encoding": "chunked"}, keep_alive)
+
+        def send_comment(comment: Any, criteria_text: Optional[str] = None):
+            line = {"type": "comment", "comment": comment.model_dump()}
+            if criteria_text is not None:
+                line["criteria"] = criteria_text
+            self._write_chunk(writer, line)
+
+        try:
+            async with self._review_slots:
+                if len(criteria) > 1:
+                    result = await self.orchestrator.areview_pull_request_multi(
+                        repo, pr_number, criteria,
+                        lambda criteria_text, comment: send_comment(comment, criteria_text)
+                    )
+                else:
+                    result = await self.orchestrator.areview_pull_request(repo, pr_number, criteria[0], send_comment)
+            self._write_chunk(writer, {"type": "result", "result": result})
+        except Exception as e:
+            self._write_chunk(writer, {"type": "error", "error": str(e)})
+        writer.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _review_job(payload: Dict[str, Any]) -> Tuple[str, int, List[str]]:
+        if not payload.get("repo") or payload.get("pr") is None:
+            raise HTTPError(400, "repo and pr are required")
+        try:
+            pr_number = int(payload["pr"])
+        except (TypeError, ValueError):
+            raise HTTPError(400, "pr must be an integer")
+
+        criteria = payload.get("criteria") or "strict style"
+        criteria = [criteria] if isinstance(criteria, str) else list(dict.fromkeys(criteria))
+        return payload["repo"], pr_number, criteria
+
+    def _check_host(self, headers: Dict[str, str]):
+        if settings.server_auth_token or self.unix_socket or "host" not in headers:
+            return
+        host = headers["host"].lower()
+        # Drop the port: "[::1]:8765" -> "::1", "localhost:8765" -> "localhost"
+        host = host[1:].partition("]")[0] if host.startswith("[") else host.rsplit(":", 1)[0]
+        if host not in ("localhost", "127.0.0.1", "::1", self.host.lower()):
+            raise HTTPError(403, f"Host {headers['host']} is not served without an auth token")
+
+    @staticmethod
+    def _authorize(path: str, headers: Dict[str, str]):
+        token = settings.server_auth_token
+        if not token or path == "/health":
+            return
+        scheme, _, credentials = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.strip().encode(), token.encode()):
+            raise HTTPError(401, "Missing or invalid bearer token")
+
+    @staticmethod
+    def _require(method: str, expected: str):
+        if method != expected:
+            raise HTTPError(405, f"Use {expected}")
+
+    def _write_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self._write_head(writer, status, {"Content-Type": "application/json",
+                                          "Content-Length": str(len(body))}, keep_alive)
+        writer.write(body)
+
+    def _write_chunk(self, writer: asyncio.StreamWriter, payload: Dict[str, Any]):
+        data = json.dumps(payload, default=str).encode("utf-8") + b"\n"
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    def _write_head(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], keep_alive: bool):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        headers = {**headers, "Connection": "keep-alive" if keep_alive else "close"}
+        if settings.server_cors_origin:
+            headers.update({
+                "Access-Control-Allow-Origin": settings.server_cors_origin,
+                "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type, Authorization"
+            })
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
@@ -0,0 +1,3 @@
+"""
+Persistent indexes and stores for review sessions.
+"""
\ No newline at end of file
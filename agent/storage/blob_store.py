@@ -0,0 +1,105 @@
+from typing import Any, Dict, Optional
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+import hashlib
+import json
+import shutil
+
+from pydantic import BaseModel
+
+from config.settings import settings
+
+
+BLOB_REF_KEY = "$blob"
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert models, dataclasses and other step payloads into plain JSON types."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if is_dataclass(value) and not isinstance(value, type):
+        return to_jsonable(asdict(value))
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and BLOB_REF_KEY in value
+
+
+class BlobStore:
+    """Content-addressed payload store for reasoning steps, one directory per session.
+
+    Large step payloads are replaced by ``{"$blob": <sha256>}`` references.
+    Externalization is bottom-up, so a document embedded in several payloads
+    (retrieved docs, context summary, generation input) is written once and
+    each payload just references it.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None, inline_threshold: Optional[int] = None):
+        self.root_dir = Path(root_dir or Path(settings.logs_dir) / "blobs")
+        self.inline_threshold = (settings.step_blob_threshold_bytes
+                                 if inline_threshold is None else inline_threshold)
+
+    def externalize(self, session_id: str, value: Any) -> Any:
+        """Return ``value`` as JSON with every payload over the threshold replaced by a blob ref."""
+        return self._externalize(session_id, to_jsonable(value), top_level=True)
+
+    def resolve(self, session_id: str, value: Any) -> Any:
+        """Replace every blob ref in ``value`` with the stored content, recursively."""
+        if is_blob_ref(value):
+            return self.resolve(session_id, self.get(session_id, value[BLOB_REF_KEY]))
+        if isinstance(value, dict):
+            return {key: self.resolve(session_id, item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(session_id, item) for item in value]
+        return value
+
+    def get(self, session_id: str, digest: str) -> Any:
+        """Load one blob."""
+        return json.loads(self._blob_path(session_id, digest).read_text(encoding="utf-8"))
+
+    def delete_session(self, session_id: str):
+        """Remove all blobs for a session."""
+        shutil.rmtree(self.root_dir / session_id, ignore_errors=True)
+
+    def _externalize(self, session_id: str, value: Any, top_level: bool = False) -> Any:
+        if isinstance(value, dict):
+            value = {key: self._externalize(session_id, item) for key, item in value.items()}
+        elif isinstance(value, list):
+            value = [self._externalize(session_id, item) for item in value]
+        elif not isinstance(value, str):
+            return value
+
+        # The step's own input/output dict stays inline so its keys remain readable
+        if top_level:
+            return value
+
+        serialized = json.dumps(value, sort_keys=True, ensure_ascii=False)
+        if len(serialized) <= self.inline_threshold:
+            return value
+        return {BLOB_REF_KEY: self._put(session_id, serialized)}
+
+    def _put(self, session_id: str, serialized: str) -> str:
+        digest = hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+        path = self._blob_path(session_id, digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(serialized, encoding="utf-8")
+            tmp_path.replace(path)
+        return digest
+
+    def _blob_path(self, session_id: str, digest: str) -> Path:
+        return self.root_dir / session_id / f"{digest}.json"
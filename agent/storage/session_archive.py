@@ -0,0 +1,84 @@
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import gzip
+import json
+import threading
+
+from app_logging.schemas.models import SessionLog, ReasoningStep
+from config.settings import settings
+
+
+def compact_steps(steps: List[ReasoningStep]) -> List[ReasoningStep]:
+    """Keep only the last logged version of each step, in first-logged order.
+
+    ``PRReviewer._update_step`` re-logs a step every time its output changes,
+    so raw logs hold several versions of the same ``step_id``.
+    """
+    latest: Dict[str, ReasoningStep] = {}
+    for step in steps:
+        # Re-assigning an existing key keeps its original insertion position
+        latest[step.step_id] = step
+    return list(latest.values())
+
+
+class SessionArchive:
+    """Cold storage for old sessions as gzip-compressed JSONL bundles, one per day.
+
+    Each line holds one compacted session: ``{"session": ..., "steps": [...]}``.
+    Bundles are append-only (each archive run adds a gzip member) and are
+    deleted whole once their day falls out of retention.
+    """
+
+    def __init__(self, archive_dir: Optional[str] = None):
+        self.archive_dir = Path(archive_dir or Path(settings.logs_dir) / "archive")
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def archive_sessions(self, day: str, sessions: List[Tuple[SessionLog, List[ReasoningStep]]]):
+        """Append compacted sessions to the bundle for ``day`` (``YYYY-MM-DD``)."""
+        if not sessions:
+            return
+        lines = [
+            json.dumps({
+                "session": session.model_dump(mode="json"),
+                "steps": [step.model_dump(mode="json") for step in compact_steps(steps)]
+            }) + "\n"
+            for session, steps in sessions
+        ]
+        with self._lock, gzip.open(self._bundle_path(day), "at", encoding="utf-8") as bundle:
+            bundle.writelines(lines)
+
+    def load(self, day: str, session_id: str) -> Optional[Tuple[SessionLog, List[ReasoningStep]]]:
+        """Read one session and its steps back from the bundle for ``day``."""
+        path = self._bundle_path(day)
+        if not path.exists():
+            return None
+
+        with gzip.open(path, "rt", encoding="utf-8") as bundle:
+            for line in bundle:
+                # Cheap substring check before parsing the whole record
+                if session_id not in line:
+                    continue
+                record = json.loads(line)
+                if record["session"]["session_id"] == session_id:
+                    return (SessionLog.model_validate(record["session"]),
+                            [ReasoningStep.model_validate(step) for step in record["steps"]])
+        return None
+
+    def delete_before(self, day: str) -> List[str]:
+        """Delete bundles for days before ``day``; returns the deleted days."""
+        deleted = []
+        with self._lock:
+            for path in sorted(self.archive_dir.glob("*.jsonl.gz")):
+                bundle_day = path.name[:-len(".jsonl.gz")]
+                if bundle_day < day:
+                    path.unlink()
+                    deleted.append(bundle_day)
+        return deleted
+
+    def size_bytes(self) -> int:
+        """Total size of all bundles on disk."""
+        return sum(path.stat().st_size for path in self.archive_dir.glob("*.jsonl.gz"))
+
+    def _bundle_path(self, day: str) -> Path:
+        return self.archive_dir / f"{day}.jsonl.gz"
@@ -0,0 +1,387 @@
+from typing import List, Dict, Any, Optional, Iterable
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+import threading
+
+from app_logging.logger.session_logger import SessionLogger
+from app_logging.schemas.models import SessionLog, PRReview, ReasoningStep
+from ..criteria.criteria_processor import CriteriaProcessor
+from .session_archive import SessionArchive, compact_steps
+from config.settings import settings
+
+
+# File name suffixes SessionLogger writes per session: the session log and its step log
+SESSION_LOG_SUFFIXES = (".json", "_steps.jsonl")
+
+# Bumped whenever what the statistics counters cover changes, so existing indexes rebuild them
+ROLLUP_VERSION = "2"
+
+
+def _iso(value: Any) -> Optional[str]:
+    """Normalize a datetime (or already-serialized timestamp) to an ISO string."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class SessionIndex:
+    """SQLite index of session summaries.
+
+    Holds one row per session (repo, PR, criteria, success, timestamps and
+    comment counts) so listing never loads full session logs. Statistics are
+    kept as running counters per (day, repo, criteria, preset) bucket that are
+    adjusted whenever a session starts or completes, so they cost the same
+    however many sessions exist. Like the session logs they summarize, every
+    session is counted: one that has not completed counts as failed.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        db_path = db_path or settings.session_index_path or str(Path(settings.logs_dir) / "session_index.db")
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._criteria_processor = CriteriaProcessor()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                repo TEXT,
+                pr_number INTEGER,
+                criteria_text TEXT,
+                success INTEGER,
+                start_time TEXT,
+                end_time TEXT,
+                comment_count INTEGER NOT NULL DEFAULT 0,
+                package_suggestion_count INTEGER NOT NULL DEFAULT 0,
+                error_message TEXT,
+                archive_day TEXT
+            );
+            CREATE INDEX IF NOT EXISTS sessions_start_time ON sessions (start_time);
+            CREATE INDEX IF NOT EXISTS sessions_repo ON sessions (repo);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS stats_rollup (
+                day TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                criteria TEXT NOT NULL,
+                preset TEXT NOT NULL,
+                sessions INTEGER NOT NULL DEFAULT 0,
+                successful INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                comments INTEGER NOT NULL DEFAULT 0,
+                package_suggestions INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, repo, criteria, preset)
+            );
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "archive_day" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN archive_day TEXT")
+        self._conn.commit()
+        self._build_rollup()
+
+    def record_start(self, session: SessionLog):
+        """Index a newly started session; it counts as failed until it completes."""
+        pr_info = session.pr_info or {}
+        row = {
+            "session_id": session.session_id,
+            "repo": pr_info.get("repo"),
+            "pr_number": pr_info.get("pr_number"),
+            "criteria_text": session.criteria_text,
+            "success": None,
+            "start_time": _iso(session.start_time),
+            "comment_count": 0,
+            "package_suggestion_count": 0
+        }
+        with self._lock:
+            self._remove_from_rollup(row["session_id"])
+            self._conn.execute(
+                """INSERT OR REPLACE INTO sessions
+                   (session_id, repo, pr_number, criteria_text, success, start_time)
+                   VALUES (:session_id, :repo, :pr_number, :criteria_text, NULL, :start_time)""",
+                row
+            )
+            self._apply_to_rollup(row, sign=1)
+            self._conn.commit()
+
+    def record_completion(self, session: SessionLog):
+        """Index the outcome of a completed session."""
+        self.record_sessions([session])
+
+    def record_sessions(self, sessions: Iterable[SessionLog]):
+        """Upsert full summaries for sessions (used on completion and when backfilling).
+
+        The statistics counters are adjusted in the same transaction: any
+        previously counted outcome for the session is subtracted first, so
+        re-recording a session never double-counts it.
+        """
+        rows = []
+        for session in sessions:
+            pr_info = session.pr_info or {}
+            review: Optional[PRReview] = session.final_review
+            rows.append({
+                "session_id": session.session_id,
+                "repo": pr_info.get("repo"),
+                "pr_number": pr_info.get("pr_number"),
+                "criteria_text": session.criteria_text,
+                "success": int(bool(session.success)),
+                "start_time": _iso(session.start_time),
+                "end_time": _iso(session.end_time),
+                "comment_count": len(review.comments) if review else 0,
+                "package_suggestion_count": len(review.package_suggestions) if review else 0,
+                "error_message": getattr(session, "error_message", None)
+            })
+
+        with self._lock:
+            for row in rows:
+                self._remove_from_rollup(row["session_id"])
+                self._conn.execute(
+                    """INSERT OR REPLACE INTO sessions
+                       (session_id, repo, pr_number, criteria_text, success, start_time, end_time,
+                        comment_count, package_suggestion_count, error_message)
+                       VALUES (:session_id, :repo, :pr_number, :criteria_text, :success, :start_time,
+                               :end_time, :comment_count, :package_suggestion_count, :error_message)""",
+                    row
+                )
+                self._apply_to_rollup(row, sign=1)
+            self._conn.commit()
+
+    def _remove_from_rollup(self, session_id: str):
+        """Subtract a session's current contribution, if it is indexed, before it is re-recorded."""
+        previous = self._conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if previous is not None:
+            self._apply_to_rollup(dict(previous), sign=-1)
+
+    def _apply_to_rollup(self, row: Dict[str, Any], sign: int):
+        """Add (or with sign=-1, remove) one session's contribution to its bucket."""
+        successful = 1 if row["success"] else 0
+        bucket = (
+            (row["start_time"] or "")[:10],
+            row["repo"] or "Unknown",
+            (row["criteria_text"] or "")[:50],
+            self._criteria_processor.match_preset(row["criteria_text"]) or "custom"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO stats_rollup (day, repo, criteria, preset) VALUES (?, ?, ?, ?)", bucket
+        )
+        self._conn.execute(
+            """UPDATE stats_rollup
+               SET sessions = sessions + ?, successful = successful + ?, failed = failed + ?,
+                   comments = comments + ?, package_suggestions = package_suggestions + ?
+               WHERE day = ? AND repo = ? AND criteria = ? AND preset = ?""",
+            (sign, sign * successful, sign * (1 - successful),
+             sign * successful * row["comment_count"], sign * successful * row["package_suggestion_count"],
+             *bucket)
+        )
+
+    def _build_rollup(self):
+        """Populate the counters from the indexed sessions when they are missing or out of date."""
+        with self._lock:
+            built = self._conn.execute("SELECT value FROM meta WHERE key = 'rollup_built'").fetchone()
+            if built and built["value"] == ROLLUP_VERSION:
+                return
+            self._conn.execute("DELETE FROM stats_rollup")
+            for row in self._conn.execute("SELECT * FROM sessions").fetchall():
+                self._apply_to_rollup(dict(row), sign=1)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollup_built', ?)",
+                               (ROLLUP_VERSION,))
+            self._conn.commit()
+
+    def list_sessions(self, repo: Optional[str] = None, since: Optional[str] = None,
+                      limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Session summaries, newest first."""
+        query = "SELECT * FROM sessions"
+        clauses, params = self._filters(repo, since)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY start_time DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params).fetchall()]
+
+    def statistics(self, repo: Optional[str] = None, since: Optional[str] = None) -> Dict[str, Any]:
+        """Aggregate counters, optionally filtered by repo and start day (``YYYY-MM-DD``).
+
+        Reads only the rollup buckets, never the per-session rows.
+        """
+        clauses, params = [], []
+        if repo:
+            clauses.append("repo = ?")
+            params.append(repo)
+        if since:
+            clauses.append("day >= ?")
+            params.append(since[:10])
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+        def grouped(column: str) -> Dict[str, int]:
+            return {
+                row[0]: row[1] for row in self._conn.execute(
+                    f"SELECT {column}, SUM(sessions) FROM stats_rollup{where} "
+                    f"GROUP BY {column} HAVING SUM(sessions) > 0 ORDER BY {column}",
+                    params
+                )
+            }
+
+        with self._lock:
+            totals = self._conn.execute(
+                f"""SELECT COALESCE(SUM(sessions), 0) AS total,
+                           COALESCE(SUM(successful), 0) AS successful,
+                           COALESCE(SUM(failed), 0) AS failed,
+                           COALESCE(SUM(comments), 0) AS comments,
+                           COALESCE(SUM(package_suggestions), 0) AS packages
+                    FROM stats_rollup{where}""",
+                params
+            ).fetchone()
+            criteria_counts = grouped("criteria")
+            repo_counts = grouped("repo")
+            preset_counts = grouped("preset")
+            daily_counts = grouped("day")
+
+        return {
+            "total_sessions": totals["total"],
+            "successful_sessions": totals["successful"],
+            "failed_sessions": totals["failed"],
+            "total_comments": totals["comments"],
+            "total_package_suggestions": totals["packages"],
+            "criteria_distribution": criteria_counts,
+            "repository_distribution": repo_counts,
+            "preset_distribution": preset_counts,
+            "daily_distribution": daily_counts
+        }
+
+    def sessions_started_before(self, before: str, archived: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Completed sessions that started before ``before`` (ISO timestamp), oldest first."""
+        query = "SELECT * FROM sessions WHERE success IS NOT NULL AND start_time < ?"
+        if archived is True:
+            query += " AND archive_day IS NOT NULL"
+        elif archived is False:
+            query += " AND archive_day IS NULL"
+        query += " ORDER BY start_time"
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, (before,)).fetchall()]
+
+    def mark_archived(self, session_ids: List[str], day: str):
+        """Record that sessions now live in the archive bundle for ``day``."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE sessions SET archive_day = ? WHERE session_id = ?",
+                [(day, session_id) for session_id in session_ids]
+            )
+            self._conn.commit()
+
+    def archive_day(self, session_id: str) -> Optional[str]:
+        """The archive bundle day holding a session, or None if it is still live."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT archive_day FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row["archive_day"] if row else None
+
+    def delete_sessions(self, session_ids: List[str]):
+        """Drop sessions from the index. Statistics counters keep their history."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(i,) for i in session_ids])
+            self._conn.commit()
+
+    def session_ids(self) -> List[str]:
+        """All indexed session IDs."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT session_id FROM sessions").fetchall()]
+
+    def backfill(self, session_logger: SessionLogger, force: bool = False) -> int:
+        """Index sessions logged before the index existed; returns how many were added.
+
+        Runs once per index unless ``force`` is set, and only loads sessions that
+        are not indexed yet.
+        """
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'backfilled'").fetchone()
+        if done and not force:
+            return 0
+
+        indexed = set(self.session_ids())
+        missing = [session_id for session_id in session_logger.list_sessions() if session_id not in indexed]
+        sessions = [session for session in map(session_logger.get_session, missing) if session]
+        self.record_sessions(sessions)
+
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', '1')")
+            self._conn.commit()
+        return len(sessions)
+
+    @staticmethod
+    def _filters(repo: Optional[str], since: Optional[str]):
+        clauses, params = [], []
+        if repo:
+            clauses.append("repo = ?")
+            params.append(repo)
+        if since:
+            clauses.append("start_time >= ?")
+            params.append(since)
+        return clauses, params
+
+
+class IndexedSessionLogger(SessionLogger):
+    """SessionLogger that keeps a SessionIndex up to date as sessions start and complete.
+
+    Reads fall back to the session archive for sessions that were moved to cold
+    storage, and steps are returned compacted to the last version of each step.
+    """
+
+    def __init__(self, session_index: SessionIndex, *args,
+                 session_archive: Optional[SessionArchive] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session_index = session_index
+        self.session_archive = session_archive
+
+    def start_session(self, *args, **kwargs) -> SessionLog:
+        session = super().start_session(*args, **kwargs)
+        self.session_index.record_start(session)
+        return session
+
+    def complete_session(self, *args, **kwargs) -> SessionLog:
+        session = super().complete_session(*args, **kwargs)
+        self.session_index.record_completion(session)
+        return session
+
+    def get_session(self, session_id: str) -> Optional[SessionLog]:
+        session = super().get_session(session_id)
+        if session is None:
+            archived = self._load_archived(session_id)
+            session = archived[0] if archived else None
+        return session
+
+    def get_session_steps(self, session_id: str) -> List[ReasoningStep]:
+        steps = super().get_session_steps(session_id)
+        if not steps:
+            archived = self._load_archived(session_id)
+            steps = archived[1] if archived else []
+        return compact_steps(steps)
+
+    def delete_session(self, session_id: str):
+        """Remove a session's live log files from the logs directory.
+        
+        Only the exact files SessionLogger writes for this id are removed, so
+        ids sharing a prefix (``s1`` and ``s10``) never touch each other's logs.
+        """
+        if not session_id or Path(session_id).name != session_id:
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        logs_dir = Path(getattr(self, "logs_dir", settings.logs_dir))
+        for suffix in SESSION_LOG_SUFFIXES:
+            path = logs_dir / f"{session_id}{suffix}"
+            if path.is_file():
+                path.unlink()
+
+    def _load_archived(self, session_id: str):
+        if self.session_archive is None:
+            return None
+        day = self.session_index.archive_day(session_id)
+        return self.session_archive.load(day, session_id) if day else None
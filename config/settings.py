@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 
 
@@ -12,17 +12,121 @@ class Settings(BaseSettings):
     openai_temperature: float = 0.2
     openai_top_p: float = 0.95
     
+    # LLM Response Cache Configuration (opt-in)
+    llm_cache_enabled: bool = False
+    llm_cache_path: str = ".cache/llm_responses.db"
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_max_entries: int = 10000
+    
     # Logging Configuration
     log_level: str = "INFO"
     logs_dir: str = "app_logging/sessions"
+    session_index_path: Optional[str] = None  # Defaults to <logs_dir>/session_index.db
+    session_archive_after_days: int = 7
+    session_retention_days: int = 30
+    step_blob_threshold_bytes: int = 1024  # Larger step payloads are stored once per session as blobs
     
-    # GitHub Configuration (for future use)
+    # GitHub Configuration (the mock client is used when no token is set)
     github_token: Optional[str] = None
     github_api_url: str = "https://api.github.com"
+    github_pool_size: int = 20
+    github_timeout_seconds: float = 30.0
+    github_max_retries: int = 3
+    github_backoff_seconds: float = 0.5
+    github_rate_limit_floor: int = 100
+    github_etag_cache_entries: int = 1000  # Responses kept for conditional requests, least recently used evicted
+    
+    # Provider Cache Configuration
+    provider_cache_enabled: bool = True
+    provider_cache_dir: str = ".cache/provider"
+    provider_cache_max_bytes: int = 512 * 1024 * 1024
+    provider_cache_ref_ttl_seconds: int = 300
     
     # Agent Configuration
     max_retrieval_docs: int = 10
-    max_context_length: int = 8000
+    max_context_length: int = 8000  # Default context token budget
+    context_token_budgets: Dict[str, int] = {}  # Per-model overrides of max_context_length
+    context_chunk_tokens: int = 512
+    
+    # Semantic Retrieval Configuration (opt-in: the first review of a repo fetches every file it indexes)
+    semantic_retrieval_enabled: bool = False
+    semantic_top_k: int = 5  # Related chunks from outside the changed files
+    semantic_min_score: float = 0.2  # Minimum cosine similarity for a related chunk
+    embedding_model: str = "hashing"  # Or a local sentence-transformers model name
+    embedding_dim: int = 1024  # Dimension of the hashing embedder
+    embedding_batch_size: int = 256
+    vector_index_dir: str = ".cache/vector_index"
+    vector_chunk_lines: int = 60
+    vector_chunk_overlap_lines: int = 10
+    vector_index_max_file_bytes: int = 200 * 1024
+    vector_search_block_rows: int = 8192
+    index_manifest_path: str = ".cache/index_manifest.db"  # Blob SHAs indexed per repo, for incremental refresh
+    index_max_files: int = 1000  # Files per repository index; the rest of the tree is left out
+    index_blob_cache_bytes: int = 64 * 1024 * 1024  # File contents shared between the repository indexes
+    
+    # Keyword (BM25) Retrieval Configuration
+    keyword_retrieval_enabled: bool = False
+    keyword_top_k: int = 5  # Chunks matching the diff's identifiers, from outside the changed files
+    keyword_index_dir: str = ".cache/keyword_index"
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    
+    # Symbol Graph Retrieval Configuration: callers and callees of the changed code
+    symbol_retrieval_enabled: bool = False
+    symbol_top_k: int = 8
+    symbol_graph_max_depth: int = 2  # Hops from the changed definitions
+    symbol_max_fanout: int = 20  # Names defined or referenced in more places are too generic to follow
+    symbol_snippet_lines: int = 40  # Lines of each definition kept in the index
+    symbol_index_path: str = ".cache/symbol_index.db"
+    
+    # Hybrid Retrieval Configuration: candidate stages, reciprocal-rank fusion, optional reranking
+    retrieval_stage_limits: Dict[str, int] = {
+        "criteria": 10, "structural": 20, "commit_history": 10, "dense": 10, "lexical": 10, "graph": 10
+    }
+    retrieval_stage_budgets_ms: Dict[str, int] = {  # Stages still running past their budget are dropped
+        "criteria": 1000, "structural": 30000, "commit_history": 10000, "dense": 20000, "lexical": 20000,
+        "graph": 20000, "rerank": 200
+    }
+    retrieval_required_stages: List[str] = ["structural"]  # Waited for past their budget, never dropped
+    retrieval_stage_weights: Dict[str, float] = {
+        "criteria": 1.5, "structural": 2.0, "commit_history": 0.5, "dense": 1.0, "lexical": 1.0, "graph": 1.5
+    }
+    retrieval_rrf_k: int = 60
+    retrieval_fusion_limit: int = 40  # Fused candidates passed on to reranking and packing
+    retrieval_reranker: str = "none"  # "none" or "embedding" (local similarity to the diff)
+    retrieval_rerank_weight: float = 0.5  # Share of the reranker score in the final relevance
+    
+    # Review Strategy Configuration
+    review_strategy: str = "auto"  # "single", "map_reduce", or "auto" (map-reduce when the PR overflows one group)
+    map_reduce_group_tokens: int = 6000
+    max_concurrent_llm_calls: int = 4
+    
+    # Retrieval Configuration
+    retrieval_max_concurrency: int = 8
+    diff_context_lines: int = 20  # Lines around changed hunks to include; -1 includes whole files
+    
+    # Batch Review Configuration
+    batch_max_concurrency: int = 4
+    
+    # Review Server Configuration (``serve`` command)
+    server_host: str = "127.0.0.1"
+    server_port: int = 8765
+    server_cors_origin: Optional[str] = "http://localhost:3000"  # Next.js UI dev server
+    server_max_body_bytes: int = 1024 * 1024
+    server_max_headers: int = 100
+    server_auth_token: Optional[str] = None  # When set, every route but /health needs "Authorization: Bearer <token>"
+    
+    # Job Queue Configuration (``queue`` commands)
+    job_queue_path: Optional[str] = None  # Defaults to <logs_dir>/job_queue.db
+    job_workers: int = 4
+    job_per_repo_limit: int = 2  # Running jobs per repository; 0 disables the cap
+    job_max_depth: int = 1000  # Enqueueing beyond this many queued jobs is refused; 0 disables the limit
+    job_max_attempts: int = 3
+    job_backoff_seconds: float = 30.0  # Doubles after each failed attempt
+    job_backoff_max_seconds: float = 900.0
+    job_lease_seconds: int = 1800  # Running jobs past their lease are requeued
+    job_heartbeat_seconds: float = 60.0  # How often a worker renews its lease; keep well below job_lease_seconds
+    job_poll_interval_seconds: float = 1.0
     
     class Config:
         env_file = ".env"
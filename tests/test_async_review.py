@@ -0,0 +1,107 @@
+"""Tests for the async review path and its blocking wrappers."""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain.schema import AIMessage
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import GitHubProvider, MockGitHubClient
+from agent.reviewer.pr_reviewer import PRReviewer
+from agent.storage.blob_store import BlobStore
+from app_logging.schemas.models import RetrievedDocument
+from config.settings import settings
+
+
+class ThreadRecordingProvider(GitHubProvider):
+    """Records which thread each blocking call runs on."""
+
+    def __init__(self):
+        self.threads = []
+
+    def get_pr(self, repo, pr_number):
+        raise NotImplementedError
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        self.threads.append(threading.get_ident())
+        return f"content of {file_path}"
+
+    def get_repo_files(self, repo, ref="main"):
+        return []
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return []
+
+
+class FakeLLM:
+    async def ainvoke(self, messages):
+        return AIMessage(content="COMMENT: src/auth/__init__.py:1 [info] Looks fine\n**Reviewed**")
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.criteria_processor = CriteriaProcessor()
+
+    async def acollect_pr_candidates(self, repo, pr_info):
+        doc = RetrievedDocument(content="import jwt", source="src/auth/__init__.py",
+                                metadata={"type": "file_content", "file_path": "src/auth/__init__.py"})
+        return {"documents": [doc], "retrieval_stages": []}
+
+    async def aget_enhanced_context(self, repo, pr_info, criteria_data, pr_documents=None, pr_stages=None):
+        return {"documents": list(pr_documents)}
+
+
+class StepLog:
+    current_session = None
+
+    def log_step(self, step):
+        pass
+
+
+def make_reviewer(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "review_strategy", "single")
+    return PRReviewer(StepLog(), FakeRetriever(), llm=FakeLLM(), blob_store=BlobStore(str(tmp_path)))
+
+def test_provider_is_abstract():
+    class Incomplete(GitHubProvider):
+        def get_pr(self, repo, pr_number):
+            return None
+
+    with pytest.raises(TypeError):
+        GitHubProvider()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_async_provider_methods_run_off_the_event_loop():
+    provider = ThreadRecordingProvider()
+
+    async def fetch():
+        return threading.get_ident(), await provider.aget_file_content("org/repo", "a.py")
+
+    loop_thread, content = asyncio.run(fetch())
+
+    assert content == "content of a.py"
+    assert provider.threads and provider.threads[0] != loop_thread
+
+def test_blocking_review_runs_the_async_pipeline(monkeypatch, tmp_path):
+    reviewer = make_reviewer(monkeypatch, tmp_path)
+
+    review = reviewer.review_pr("org/repo", MockGitHubClient().get_pr("org/repo", 1), "security")
+
+    assert review.comments[0].file_path == "src/auth/__init__.py"
+
+def test_blocking_review_inside_a_running_loop_raises(monkeypatch, tmp_path):
+    reviewer = make_reviewer(monkeypatch, tmp_path)
+    pr_info = MockGitHubClient().get_pr("org/repo", 1)
+
+    async def review_inside_loop():
+        with pytest.raises(RuntimeError, match="await the async variant"):
+            reviewer.review_pr("org/repo", pr_info, "security")
+        return await reviewer.areview_pr("org/repo", pr_info, "security")
+
+    assert asyncio.run(review_inside_loop()).comments
@@ -42,6 +42,15 @@ def test_criteria_processor():
     assert "focus" in result
     assert "Custom criteria" in result["focus"]
 
+def test_criteria_preset_matching():
+    """Test that preset matching is shared with criteria processing."""
+    processor = CriteriaProcessor()
+    
+    assert processor.match_preset("Strict Style, please") == "strict style"
+    assert processor.match_preset("check for SQL injection") is None
+    assert processor.match_preset(None) is None
+    assert processor.process_criteria("security review")["preset_used"] == processor.match_preset("security review")
+
 def test_session_logger():
     """Test the session logger."""
     logger = SessionLogger()
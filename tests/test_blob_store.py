@@ -0,0 +1,29 @@
+"""Tests for content-addressed step payload blobs."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.storage.blob_store import BlobStore, is_blob_ref
+
+def test_shared_payloads_stored_once(tmp_path):
+    """A document repeated across step payloads is written as a single blob."""
+    store = BlobStore(str(tmp_path), inline_threshold=64)
+    document = {"source": "README.md", "content": "x" * 500}
+
+    retrieval = store.externalize("s1", {"retrieved_docs": [document], "context_summary": {"documents": [document]}})
+    blob_count = len(list((tmp_path / "s1").glob("*.json")))
+    generation = store.externalize("s1", {"context": {"documents": [document]}, "criteria": "security"})
+
+    assert generation["criteria"] == "security"
+    assert len(list((tmp_path / "s1").glob("*.json"))) == blob_count
+    assert store.resolve("s1", retrieval)["retrieved_docs"] == [document]
+    assert store.resolve("s1", generation)["context"]["documents"] == [document]
+
+def test_small_payloads_stay_inline(tmp_path):
+    """Payloads under the threshold are logged as-is."""
+    store = BlobStore(str(tmp_path), inline_threshold=1024)
+    output = store.externalize("s1", {"review": {"comments": []}, "cache_hit": False})
+    assert output == {"review": {"comments": []}, "cache_hit": False}
+    assert not is_blob_ref(output["review"])
+    assert not (tmp_path / "s1").exists()
@@ -0,0 +1,130 @@
+"""Tests for the BM25 keyword index."""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import FileDiff, GitHubProvider, PRInfo
+from agent.retrieval.bm25_index import BM25Index, KeywordIndexStore, diff_identifiers
+from agent.retrieval.context_retriever import ContextRetriever
+from agent.retrieval.incremental_indexer import IncrementalIndexer
+from config.settings import settings
+
+SHA = "c" * 40
+
+DOCS = [
+    {"source": "billing/invoice.py", "text": "def computeInvoiceTotal(items):\n    return sum(items)"},
+    {"source": "billing/api.py", "text": "total = computeInvoiceTotal(order.items)\ncomputeInvoiceTotal(refund)"},
+    {"source": "auth/session.py", "text": "class SessionStore:\n    def refresh_token(self): pass"},
+]
+
+FILES = {
+    "billing/invoice.py": "def compute_invoice_total(items):\n    return sum(items)\n",
+    "billing/api.py": "from .invoice import compute_invoice_total\n\ndef invoice_endpoint(order):\n"
+                      "    return compute_invoice_total(order.items)\n",
+    "auth/session.py": "class SessionStore:\n    def refresh_token(self):\n        pass\n",
+}
+
+DIFF = ("@@ -1,2 +1,2 @@\n"
+        "-def compute_invoice_total(items):\n"
+        "+def compute_invoice_total(items, discount):\n")
+
+
+class RepoClient(GitHubProvider):
+    def get_pr(self, repo, pr_number):
+        raise NotImplementedError
+
+    def get_repo_files(self, repo, ref="main"):
+        return list(FILES)
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        return FILES[file_path]
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return [{"sha": "d" * 40, "message": "Round compute_invoice_total to cents", "date": "2024-01-01"},
+                {"sha": "e" * 40, "message": "Initial import", "date": "2023-01-01"}]
+
+
+def make_pr():
+    return PRInfo(pr_number=2, title="Discounts", description="", base_branch="main", head_branch="discounts",
+                  total_additions=1, total_deletions=1, base_sha=SHA,
+                  files_changed=[FileDiff(file_path="billing/invoice.py", status="modified",
+                                          additions=1, deletions=1, diff_content=DIFF)])
+
+def test_identifier_parts_and_whole_symbols_are_searchable():
+    index = BM25Index.build(DOCS)
+
+    assert index.lookup("computeinvoicetotal").tolist() == [0, 1]
+    assert index.lookup("invoice").tolist() == [0, 1]
+    assert index.lookup("missing").tolist() == []
+    # The document mentioning the symbol twice ranks first
+    assert [doc_id for doc_id, _ in index.search(["computeinvoicetotal"], top_k=5)] == [1, 0]
+    assert [doc_id for doc_id, _ in index.search(["token"], top_k=5, exclude_sources={"auth/session.py"})] == []
+
+def test_update_matches_a_full_rebuild():
+    changed = {"source": "auth/session.py", "text": "class SessionStore:\n    def revoke(self, invoice): pass"}
+    rebuilt = BM25Index.build([DOCS[0], DOCS[1], changed])
+
+    updated = BM25Index.build(DOCS).updated([changed], removed_sources=[])
+
+    for terms in (["invoice"], ["revoke", "computeinvoicetotal"], ["refresh"]):
+        assert updated.search(terms, 3) == rebuilt.search(terms, 3)
+    assert updated.lookup("refresh").tolist() == []
+
+def test_saved_index_loads_memory_mapped(tmp_path):
+    BM25Index.build(DOCS).save(str(tmp_path))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert isinstance(loaded.postings, np.memmap)
+    assert loaded.search(["invoice", "total"], 2) == BM25Index.build(DOCS).search(["invoice", "total"], 2)
+
+def test_saves_are_versioned_and_keep_mapped_arrays(tmp_path):
+    BM25Index.build(DOCS).save(str(tmp_path))
+    mapped = BM25Index.load(str(tmp_path))
+    before = mapped.search(["invoice", "total"], 2)
+
+    for _ in range(2):
+        BM25Index.build(DOCS[:1]).save(str(tmp_path))
+
+    assert mapped.search(["invoice", "total"], 2) == before
+    assert json.loads((tmp_path / "meta.json").read_text())["version"] == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["meta.json", "v2", "v3"]
+    assert len(BM25Index.load(str(tmp_path))) == len(BM25Index.build(DOCS[:1]))
+
+def test_diff_identifiers_come_from_changed_lines():
+    assert diff_identifiers(make_pr()) == ["compute_invoice_total", "items", "discount"]
+
+def test_retriever_finds_symbol_mentions_and_ranks_commits(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "keyword_retrieval_enabled", True)
+    client = RepoClient()
+    store = KeywordIndexStore(client, str(tmp_path / "bm25"), IncrementalIndexer(client, str(tmp_path / "manifest.db")))
+    retriever = ContextRetriever(client, CriteriaProcessor(), keyword_index_store=store)
+
+    documents, _ = retriever._collect_documents("org/repo", make_pr(), {"focus": "style"})
+
+    matches = [doc for doc in documents if doc.metadata.get("type") == "keyword_match"]
+    assert [doc.metadata["file_path"] for doc in matches] == ["billing/api.py"]
+    assert matches[0].metadata["matched_symbols"] == ["compute_invoice_total", "items"]
+    commits = [doc for doc in documents if doc.metadata.get("type") == "commit_history"]
+    assert commits[0].metadata["keyword_score"] > 0
+
+def test_index_errors_land_in_the_stage_report(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(settings, "keyword_retrieval_enabled", True)
+    client = RepoClient()
+    store = KeywordIndexStore(client, str(tmp_path / "bm25"), IncrementalIndexer(client, str(tmp_path / "manifest.db")))
+    retriever = ContextRetriever(client, CriteriaProcessor(), keyword_index_store=store)
+
+    def unavailable(repo, ref):
+        raise IOError("index unavailable")
+
+    monkeypatch.setattr(store, "get_index", unavailable)
+
+    stages = retriever.collect_pr_candidates("org/repo", make_pr())["retrieval_stages"]
+
+    assert {stage["stage"]: stage for stage in stages}["lexical"]["error"] == "index unavailable"
+    assert capsys.readouterr().out == ""
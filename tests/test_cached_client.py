@@ -0,0 +1,67 @@
+"""Tests for the on-disk provider cache."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.providers.github_client import GitHubProvider
+from agent.providers.cached_client import CachedGitHubClient, ProviderCache
+
+BASE_SHA = "a" * 40
+
+
+class CountingProvider(GitHubProvider):
+    """Provider that records how often each method reaches the 'network'."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        self.calls += 1
+        return f"content of {file_path}"
+
+    def get_repo_files(self, repo, ref="main"):
+        self.calls += 1
+        return ["README.md", "src/main.py"]
+
+    def get_pr(self, repo, pr_number):
+        raise NotImplementedError
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return []
+
+def test_repeat_reads_hit_cache(tmp_path):
+    """Reads at an unchanged base SHA are served from disk, even by a new client."""
+    provider = CountingProvider()
+    client = CachedGitHubClient(provider, ProviderCache(str(tmp_path), max_bytes=1024 * 1024))
+
+    assert client.get_file_content("demo", "README.md", BASE_SHA) == "content of README.md"
+    assert client.get_repo_files("demo", BASE_SHA) == ["README.md", "src/main.py"]
+    assert provider.calls == 2
+
+    reopened = CachedGitHubClient(provider, ProviderCache(str(tmp_path), max_bytes=1024 * 1024))
+    assert reopened.get_file_content("demo", "README.md", BASE_SHA) == "content of README.md"
+    assert reopened.get_repo_files("demo", BASE_SHA) == ["README.md", "src/main.py"]
+    assert provider.calls == 2
+    assert reopened.cache_stats()["hits"] == 2
+
+def test_identical_content_shares_blob(tmp_path):
+    """The same payload under two keys is stored once."""
+    cache = ProviderCache(str(tmp_path), max_bytes=1024 * 1024)
+    cache.put("one", "same payload")
+    cache.put("two", "same payload")
+    assert cache.stats()["entries"] == 2
+    assert cache.total_bytes() == len('"same payload"')
+
+def test_lru_eviction_respects_budget(tmp_path):
+    """Least-recently-used entries are evicted once the size budget is exceeded."""
+    cache = ProviderCache(str(tmp_path), max_bytes=30)
+    cache.put("first", "x" * 10)
+    cache.put("second", "y" * 10)
+    assert cache.get("first") is not None
+    cache.put("third", "z" * 10)
+
+    assert cache.total_bytes() <= 30
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,51 @@
+"""Tests for token-budgeted context packing."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.retrieval.context_packer import ContextPacker
+from app_logging.schemas.models import RetrievedDocument
+
+
+def count_words(text):
+    """Deterministic stand-in tokenizer: one token per word."""
+    return max(1, len(text.split()))
+
+def test_large_documents_are_chunked_not_truncated():
+    """Every line of a large document survives in some chunk."""
+    packer = ContextPacker(budget_tokens=10_000, chunk_tokens=20, count_tokens=count_words)
+    content = "".join(f"line {i} of the file\n" for i in range(50))
+    chunks = packer.split_document(RetrievedDocument(content=content, source="big.py", relevance_score=0.9))
+
+    assert len(chunks) > 1
+    assert "".join(chunk.content for chunk in chunks) == content
+    assert all(chunk.metadata["chunks"] == len(chunks) for chunk in chunks)
+
+def test_pack_respects_budget_and_records_decisions():
+    """Packing never exceeds the budget and logs what was dropped."""
+    packer = ContextPacker(budget_tokens=40, chunk_tokens=20, count_tokens=count_words)
+    documents = [
+        RetrievedDocument(content="relevant " * 15, source="a.py", relevance_score=0.9),
+        RetrievedDocument(content="filler " * 15, source="b.py", relevance_score=0.6),
+        RetrievedDocument(content="more filler " * 10, source="c.py", relevance_score=0.5),
+    ]
+
+    result = packer.pack(documents)
+
+    assert result.used_tokens <= 40
+    assert result.documents[0].source == "a.py"
+    assert {d["source"] for d in result.dropped} == {"c.py"}
+    assert result.summary()["budget_tokens"] == 40
+
+def test_pack_prefers_relevance_per_token():
+    """A short relevant document beats a long one with similar relevance."""
+    packer = ContextPacker(budget_tokens=15, chunk_tokens=100, count_tokens=count_words)
+    documents = [
+        RetrievedDocument(content="long " * 40, source="long.py", relevance_score=0.9),
+        RetrievedDocument(content="short doc", source="short.py", relevance_score=0.8),
+    ]
+
+    result = packer.pack(documents)
+
+    assert [d.source for d in result.documents] == ["short.py"]
@@ -0,0 +1,93 @@
+"""Tests for concurrent per-file fetching in the context retriever."""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import FileDiff, GitHubProvider, PRInfo
+from agent.retrieval.context_retriever import ContextRetriever
+from config.settings import settings
+
+
+class SlowClient(GitHubProvider):
+    """Answers later files first and tracks how many fetches overlap."""
+
+    def __init__(self, paths):
+        self.delays = {path: 0.01 * (len(paths) - i) for i, path in enumerate(paths)}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_pr(self, repo, pr_number):
+        raise NotImplementedError
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delays[file_path])
+            if file_path.endswith("missing.py"):
+                raise FileNotFoundError(file_path)
+            return f"content of {file_path}@{ref}"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def get_repo_files(self, repo, ref="main"):
+        return []
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return []
+
+
+class MissingBaseClient(SlowClient):
+    """Has no base version of any file."""
+
+    def __init__(self, paths):
+        super().__init__(paths)
+        self.requested = []
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        self.requested.append(file_path)
+        raise FileNotFoundError(file_path)
+
+
+def make_pr(paths):
+    return PRInfo(pr_number=1, title="t", description="", base_branch="main", head_branch="b",
+                  total_additions=0, total_deletions=0, base_sha="a" * 40,
+                  files_changed=[FileDiff(file_path=path, additions=0, deletions=0, diff_content="", status="modified")
+                                 for path in paths])
+
+def test_fetches_keep_file_order_and_bounded_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "retrieval_max_concurrency", 3)
+    paths = [f"src/m{i}.py" for i in range(8)] + ["src/missing.py"]
+    client = SlowClient(paths)
+    retriever = ContextRetriever(client, CriteriaProcessor())
+
+    results = retriever._fetch_per_file(make_pr(paths), client.get_file_content, "org/repo", "a" * 40)
+
+    assert results[:-1] == [f"content of {path}@{'a' * 40}" for path in paths[:-1]]
+    assert isinstance(results[-1], FileNotFoundError)
+    assert 1 < client.max_active <= 3
+
+def test_files_without_base_content_still_carry_their_diff():
+    """Added files are not fetched from the base ref, and a failed fetch still leaves the diff."""
+    client = MissingBaseClient([])
+    pr_info = make_pr([])
+    pr_info.files_changed = [
+        FileDiff(file_path="src/new.py", additions=1, deletions=0, diff_content="@@ -0,0 +1 @@\n+x = 1\n",
+                 status="added"),
+        FileDiff(file_path="src/old.py", additions=1, deletions=1, diff_content="@@ -1 +1 @@\n-y = 1\n+y = 2\n",
+                 status="modified"),
+    ]
+
+    documents = ContextRetriever(client, CriteriaProcessor()).collect_pr_candidates("org/repo", pr_info)["documents"]
+
+    contents = {doc.source: doc.content for doc in documents if doc.metadata["type"] == "file_content"}
+    assert contents["src/new.py"].endswith("Diff:\n@@ -0,0 +1 @@\n+x = 1\n")
+    assert contents["src/old.py"].endswith("Diff:\n@@ -1 +1 @@\n-y = 1\n+y = 2\n")
+    assert "src/new.py" not in client.requested
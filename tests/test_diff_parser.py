@@ -0,0 +1,63 @@
+"""Tests for the unified-diff parser and hunk index."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.providers.diff_parser import parse_unified_diff, excerpt_lines
+from agent.providers.github_client import FileDiff
+
+SAMPLE_DIFF = """diff --git a/app.py b/app.py
+--- a/app.py
++++ b/app.py
+@@ -1,4 +1,5 @@
+ import os
+-import sys
++import sys
++import json
+ 
+ def main():
+@@ -10,3 +11,2 @@ def main():
+     setup()
+-    legacy()
+     run()
+"""
+
+def test_changed_lines_and_ranges():
+    """Added lines and deletion points are indexed on the new side."""
+    index = parse_unified_diff(SAMPLE_DIFF)
+    assert len(index.hunks) == 2
+    assert list(index.added_lines) == [2, 3]
+    assert list(index.deleted_lines) == [2, 11]
+    assert index.changed_line_ranges() == [(2, 3), (12, 12)]
+
+def test_line_mapping_between_sides():
+    """Lines outside hunks shift by the preceding hunks' size change."""
+    index = parse_unified_diff(SAMPLE_DIFF)
+    assert index.old_to_new(2) is None
+    assert index.old_to_new(7) == 8
+    assert index.new_to_old(3) is None
+    assert index.new_to_old(12) == 12
+
+def test_anchor_line_snaps_to_nearest_change():
+    """Lines inside a hunk are kept; others move to the closest changed line."""
+    index = parse_unified_diff(SAMPLE_DIFF)
+    assert index.anchor_line(4) == 4
+    assert index.anchor_line(8) == 12
+    assert FileDiff("app.py", 2, 2, SAMPLE_DIFF, "modified").hunk_index().first_changed_line() == 2
+
+def test_bare_patch_and_excerpt():
+    """GitHub patches without file headers parse, and excerpts cover the widened hunks."""
+    index = parse_unified_diff("@@ -3 +3 @@\n-old\n+new")
+    assert index.hunk_ranges(side="old", context_lines=1) == [(2, 4)]
+    content = "\n".join(f"line {n}" for n in range(1, 10))
+    assert excerpt_lines(content, index.hunk_ranges(side="old", context_lines=1)).splitlines() == [
+        "    2 | line 2", "    3 | line 3", "    4 | line 4"
+    ]
+
+def test_empty_diff():
+    """Opaque or empty diff text yields an empty index."""
+    index = parse_unified_diff("Sample diff content")
+    assert not index
+    assert index.first_changed_line() == 1
+    assert index.anchor_line(7) == 7
@@ -0,0 +1,153 @@
+"""Tests for the HTTP GitHub client against a local stand-in server."""
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.providers.github_client import GitHubClient, GitHubAPIError
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Serves a tiny subset of the GitHub REST API."""
+
+    requests_seen = []
+    fail_next = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+
+        if cls.fail_next > 0:
+            cls.fail_next -= 1
+            self._send(503, {"message": "unavailable"})
+            return
+
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        path = self.path
+
+        if path == "/repos/octo/demo/pulls/7":
+            self._send(200, {
+                "number": 7, "title": "Add cache", "body": "Adds a cache",
+                "base": {"ref": "main", "sha": "b" * 40},
+                "head": {"ref": "feature", "sha": "h" * 40},
+                "additions": 3, "deletions": 1
+            })
+        elif path.startswith("/repos/octo/demo/pulls/7/files") and "page=2" not in path:
+            self._send(200, [{"filename": "a.py", "additions": 2, "deletions": 1,
+                              "patch": "@@ -1 +1,2 @@", "status": "modified"}],
+                       extra={"Link": f'<{base}/repos/octo/demo/pulls/7/files?per_page=100&page=2>; rel="next"'})
+        elif path.startswith("/repos/octo/demo/pulls/7/files"):
+            self._send(200, [{"filename": "b.py", "additions": 1, "deletions": 0, "status": "added"}])
+        elif path.startswith("/repos/octo/demo/contents/README.md"):
+            if self.headers.get("If-None-Match") == '"readme-v1"':
+                self._send(304, None)
+            else:
+                self._send(200, "# Demo", etag='"readme-v1"', raw=True)
+        elif path.startswith("/repos/octo/demo/contents/docs/release%20notes%231.md?"):
+            self._send(200, "Notes", etag='"notes-v1"', raw=True)
+        elif path == "/repos/octo/big/git/trees/main?recursive=1":
+            self._send(200, {"tree": [{"path": "a.py", "type": "blob", "sha": "a" * 40}], "truncated": True})
+        elif path == "/repos/octo/big/git/trees/main":
+            self._send(200, {"tree": [{"path": "a.py", "type": "blob", "sha": "a" * 40},
+                                     {"path": "pkg", "type": "tree", "sha": "d" * 40}]})
+        elif path == "/repos/octo/big/git/trees/" + "d" * 40:
+            self._send(200, {"tree": [{"path": "mod.py", "type": "blob", "sha": "m" * 40},
+                                     {"path": "sub", "type": "tree", "sha": "e" * 40}]})
+        elif path == "/repos/octo/big/git/trees/" + "e" * 40:
+            self._send(200, {"tree": [{"path": "deep.py", "type": "blob", "sha": "f" * 40}]})
+        elif path.startswith("/repos/octo/demo/git/trees/main"):
+            self._send(200, {"tree": [{"path": "a.py", "type": "blob", "sha": "a" * 40},
+                                     {"path": "pkg", "type": "tree", "sha": "b" * 40}]})
+        elif path.startswith("/repos/octo/demo/commits"):
+            self._send(200, [{"sha": "c" * 40, "commit": {"message": "Init", "author": {
+                "email": "dev@example.com", "date": "2024-01-01T00:00:00Z"}}}])
+        else:
+            self._send(404, {"message": "Not Found"})
+
+    def _send(self, status, payload, etag=None, raw=False, extra=None):
+        body = b"" if payload is None else (payload.encode() if raw else json.dumps(payload).encode())
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Remaining", "4999")
+        self.send_header("X-RateLimit-Reset", "0")
+        if etag:
+            self.send_header("ETag", etag)
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def github_client():
+    FakeGitHubHandler.requests_seen = []
+    FakeGitHubHandler.fail_next = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = GitHubClient(token="test-token", api_url=f"http://127.0.0.1:{server.server_port}",
+                          max_retries=2, backoff_seconds=0)
+    yield client
+
+    client.close()
+    server.shutdown()
+
+def test_get_pr_follows_pagination(github_client):
+    """PR files are collected across every page."""
+    pr_info = github_client.get_pr("octo/demo", 7)
+    assert pr_info.title == "Add cache"
+    assert pr_info.base_sha == "b" * 40
+    assert [f.file_path for f in pr_info.files_changed] == ["a.py", "b.py"]
+    assert pr_info.files_changed[1].diff_content == ""
+
+def test_conditional_requests_reuse_cached_payload(github_client):
+    """A second fetch sends If-None-Match and serves the 304 from the ETag cache."""
+    assert github_client.get_file_content("octo/demo", "README.md") == "# Demo"
+    assert github_client.get_file_content("octo/demo", "README.md") == "# Demo"
+    assert FakeGitHubHandler.requests_seen[-1][1] == '"readme-v1"'
+
+def test_etag_cache_evicts_least_recently_used(github_client):
+    github_client.etag_cache_entries = 1
+    github_client.get_file_content("octo/demo", "README.md")
+    github_client.get_file_content("octo/demo", "docs/release notes#1.md")
+
+    assert github_client.get_file_content("octo/demo", "README.md") == "# Demo"
+    assert FakeGitHubHandler.requests_seen[-1][1] is None
+    assert len(github_client._etag_cache) == 1
+
+def test_content_paths_are_quoted(github_client):
+    """Spaces, # and ? in a path stay part of the path instead of starting a fragment or query."""
+    assert github_client.get_file_content("octo/demo", "docs/release notes#1.md") == "Notes"
+
+def test_retries_transient_errors(github_client):
+    """5xx responses are retried up to max_retries."""
+    FakeGitHubHandler.fail_next = 2
+    assert github_client.get_repo_files("octo/demo") == ["a.py"]
+    assert len(FakeGitHubHandler.requests_seen) == 3
+
+def test_repo_tree_lists_blob_shas(github_client):
+    assert github_client.get_repo_tree("octo/demo") == {"a.py": "a" * 40}
+
+def test_truncated_repo_tree_is_walked_per_directory(github_client):
+    assert github_client.get_repo_tree("octo/big") == {
+        "a.py": "a" * 40, "pkg/mod.py": "m" * 40, "pkg/sub/deep.py": "f" * 40}
+
+def test_raises_on_client_errors(github_client):
+    """Non-retryable errors surface as GitHubAPIError."""
+    with pytest.raises(GitHubAPIError) as exc_info:
+        github_client.get_file_content("octo/demo", "missing.py")
+    assert exc_info.value.status_code == 404
+
+def test_commit_history_shape(github_client):
+    """Commit history matches the mock client's dict shape."""
+    history = github_client.get_commit_history("octo/demo", "a.py", limit=1)
+    assert history == [{"sha": "c" * 40, "message": "Init",
+                        "author": "dev@example.com", "date": "2024-01-01T00:00:00Z"}]
@@ -0,0 +1,170 @@
+"""Tests for staged candidate retrieval, reciprocal-rank fusion and reranking."""
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app_logging.schemas.models import RetrievedDocument
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import FileDiff, GitHubProvider, PRInfo
+from agent.retrieval.bm25_index import KeywordIndexStore
+from agent.retrieval.context_retriever import ContextRetriever
+from agent.retrieval.embeddings import HashingEmbedder
+from agent.retrieval.hybrid import EmbeddingReranker, reciprocal_rank_fusion, run_candidate_stages, stage_cancel_event
+from agent.retrieval.incremental_indexer import IncrementalIndexer
+from agent.retrieval.symbol_graph import SymbolIndexStore
+from agent.retrieval.vector_index import VectorIndexStore
+from config.settings import settings
+
+SHA = "f" * 40
+
+FILES = {
+    "billing/invoice.py": "def compute_invoice_total(items):\n    return sum(items)\n",
+    "billing/api.py": "from .invoice import compute_invoice_total\n\ndef invoice_endpoint(order):\n"
+                      "    return compute_invoice_total(order.items)\n",
+    "auth/session.py": "class SessionStore:\n    def refresh_token(self):\n        pass\n",
+}
+
+DIFF = ("@@ -1,2 +1,2 @@\n"
+        "-def compute_invoice_total(items):\n"
+        "+def compute_invoice_total(items, discount):\n")
+
+
+class RepoClient(GitHubProvider):
+    def get_pr(self, repo, pr_number):
+        raise NotImplementedError
+
+    def get_repo_files(self, repo, ref="main"):
+        return list(FILES)
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        return FILES.get(file_path, "# Mock content")
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return [{"sha": "d" * 40, "message": "Round compute_invoice_total to cents", "date": "2024-01-01"}]
+
+
+def doc(source, relevance=0.5):
+    return RetrievedDocument(content=source, source=source, relevance_score=relevance, metadata={})
+
+def make_retriever(tmp_path):
+    client = RepoClient()
+    indexer = IncrementalIndexer(client, str(tmp_path / "manifest.db"))
+    return ContextRetriever(
+        client, CriteriaProcessor(),
+        vector_index_store=VectorIndexStore(client, str(tmp_path / "vectors"), HashingEmbedder(128), indexer),
+        keyword_index_store=KeywordIndexStore(client, str(tmp_path / "bm25"), indexer),
+        symbol_index_store=SymbolIndexStore(client, str(tmp_path / "symbols.db"), indexer)
+    )
+
+def make_pr():
+    return PRInfo(pr_number=3, title="Discounts", description="", base_branch="main", head_branch="discounts",
+                  total_additions=1, total_deletions=1, base_sha=SHA,
+                  files_changed=[FileDiff(file_path="billing/invoice.py", status="modified",
+                                          additions=1, deletions=1, diff_content=DIFF)])
+
+def test_fusion_rewards_documents_found_by_several_stages(monkeypatch):
+    monkeypatch.setattr(settings, "retrieval_stage_weights", {"lexical": 1.0, "dense": 1.0})
+    rankings = {
+        "lexical": [doc("a.py:1-60"), doc("b.py:1-60")],
+        "dense": [doc("c.py:1-60"), doc("b.py:1-60")],
+    }
+
+    fused = reciprocal_rank_fusion(rankings, k=60)
+
+    assert [d.source for d, _, _ in fused] == ["b.py:1-60", "a.py:1-60", "c.py:1-60"]
+    assert fused[0][2] == ["lexical", "dense"]
+    assert abs(fused[0][1] - 2 / 62) < 1e-9
+
+def test_stages_keep_their_limit_and_budget(monkeypatch):
+    monkeypatch.setattr(settings, "retrieval_stage_limits", {"fast": 2, "slow": 5, "broken": 5})
+    monkeypatch.setattr(settings, "retrieval_stage_budgets_ms", {"fast": 1000, "slow": 50, "broken": 1000})
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return [doc("late")]
+
+    def broken():
+        raise RuntimeError("index unavailable")
+
+    documents, reports = run_candidate_stages({
+        "fast": lambda: [doc("low", 0.1), doc("high", 0.9), doc("mid", 0.5)],
+        "slow": slow,
+        "broken": broken,
+    })
+    release.set()
+
+    assert [d.source for d in documents] == ["high", "mid"]
+    assert all(d.metadata["retriever"] == "fast" for d in documents)
+    by_stage = {report["stage"]: report for report in reports}
+    assert (by_stage["fast"]["candidates"], by_stage["fast"]["returned"]) == (3, 2)
+    assert by_stage["slow"]["timed_out"] and by_stage["slow"]["returned"] == 0
+    assert by_stage["broken"]["error"] == "index unavailable"
+
+def test_overrunning_stage_is_cancelled_on_a_daemon_thread(monkeypatch):
+    monkeypatch.setattr(settings, "retrieval_stage_budgets_ms", {"slow": 20})
+    seen, finished = {}, threading.Event()
+
+    def slow():
+        seen["daemon"] = threading.current_thread().daemon
+        seen["cancelled"] = stage_cancel_event().wait(5)
+        finished.set()
+        return [doc("late")]
+
+    documents, reports = run_candidate_stages({"slow": slow})
+
+    assert finished.wait(5)
+    assert documents == [] and reports[0]["timed_out"]
+    assert seen == {"daemon": True, "cancelled": True}
+    assert stage_cancel_event() is None
+
+def test_required_stage_keeps_its_documents_past_its_budget(monkeypatch):
+    """The changed files are never dropped, even when their stage overruns."""
+    monkeypatch.setattr(settings, "retrieval_stage_limits", {"structural": 5})
+    monkeypatch.setattr(settings, "retrieval_stage_budgets_ms", {"structural": 50})
+    monkeypatch.setattr(settings, "retrieval_required_stages", ["structural"])
+
+    def structural():
+        threading.Event().wait(0.15)
+        return [doc("billing/invoice.py")]
+
+    documents, reports = run_candidate_stages({"structural": structural})
+
+    assert [d.source for d in documents] == ["billing/invoice.py"]
+    assert reports[0]["timed_out"] and reports[0]["returned"] == 1
+
+def test_context_reports_stage_timings_and_recall(tmp_path, monkeypatch):
+    for flag in ("semantic_retrieval_enabled", "keyword_retrieval_enabled", "symbol_retrieval_enabled"):
+        monkeypatch.setattr(settings, flag, True)
+    retriever = make_retriever(tmp_path)
+
+    context = retriever.get_enhanced_context("org/repo", make_pr(), {"focus": "style"})
+
+    report = context["retrieval"]
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert {"criteria", "structural", "commit_history", "dense", "lexical", "graph", "fusion"} <= set(stages)
+    assert all(stage["milliseconds"] >= 0 for stage in stages.values())
+    assert stages["structural"]["packed"] >= 1
+    assert report["recall"]["changed_file_recall"] == 1.0
+    assert report["recall"]["symbol_recall"] > 0
+    changed = next(d for d in context["documents"] if d.source == "billing/invoice.py")
+    assert "structural" in changed.metadata["retrievers"]
+
+def test_reranker_blends_similarity_into_relevance(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "retrieval_reranker", "embedding")
+    retriever = make_retriever(tmp_path)
+
+    documents, stages = retriever._collect_documents("org/repo", make_pr(), {"focus": "style"})
+
+    assert stages[-1]["stage"] == "rerank" and stages[-1]["returned"] == len(documents)
+    assert all("rerank_score" in d.metadata for d in documents)
+    assert [d.relevance_score for d in documents] == sorted((d.relevance_score for d in documents), reverse=True)
+
+def test_reranker_stops_at_its_budget():
+    documents = [doc(f"doc_{i}") for i in range(40)]
+
+    scores = EmbeddingReranker(HashingEmbedder(64)).score(["compute_invoice_total"], documents, budget_ms=0)
+
+    assert scores == [None] * 40
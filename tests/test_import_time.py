@@ -0,0 +1,60 @@
+"""Import-time checks: read-only commands must not load the LLM stack."""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Modules only a review or replay should load
+LLM_MODULES = ("langchain", "langchain_core", "langchain_openai", "openai", "tiktoken")
+HEAVY_MODULES = LLM_MODULES + ("rich.progress",)
+# Top-level packages whose import dominates CLI startup; loaded only by commands that need them
+STARTUP_HEAVY = LLM_MODULES + ("numpy",)
+
+
+def fresh_env():
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")]))}
+
+
+def run_fresh(statement, cwd):
+    """Run ``statement`` in a new interpreter; return the heavy modules it loaded."""
+    code = (
+        "import json, sys\n"
+        f"{statement}\n"
+        f"heavy = sorted({{m.split('.')[0] if m.split('.')[0] != 'rich' else m for m in sys.modules}} & set({HEAVY_MODULES!r}))\n"
+        "print(json.dumps({'heavy': heavy}))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=fresh_env(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_cli_import_skips_heavy_dependencies(tmp_path):
+    result = run_fresh("import agent.cli.main", tmp_path)
+
+    assert result["heavy"] == []
+
+def test_cli_help_import_profile_has_no_heavy_modules(tmp_path):
+    """``-X importtime`` lists every module ``--help`` imports; none of the heavy stacks may appear."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "agent.cli.main", "--help"],
+                            cwd=tmp_path, env=fresh_env(), capture_output=True, text=True, check=True)
+
+    # Lines look like "import time:  self [us] | cumulative | module.name"
+    imported = {line.rsplit("|", 1)[-1].strip().split(".")[0]
+                for line in result.stderr.splitlines() if line.startswith("import time:")}
+    assert "click" in imported
+    assert not imported & set(STARTUP_HEAVY)
+
+def test_read_only_orchestrator_does_not_build_the_reviewer(tmp_path):
+    """Listing sessions and statistics never import LangChain or create the model client."""
+    result = run_fresh(
+        "from agent.orchestrator.review_orchestrator import ReviewOrchestrator\n"
+        "orchestrator = ReviewOrchestrator()\n"
+        "orchestrator.list_sessions()\n"
+        "orchestrator.get_review_statistics()",
+        tmp_path
+    )
+
+    # httpx (used by the GitHub client) loads rich.progress itself, so only the LLM stack is checked
+    assert not set(result["heavy"]) & set(LLM_MODULES)
@@ -0,0 +1,165 @@
+"""Tests for incremental re-indexing keyed on blob SHAs."""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.providers.github_client import GitHubProvider, git_blob_sha
+import agent.retrieval.incremental_indexer as incremental_indexer
+from agent.retrieval.incremental_indexer import IncrementalIndex, IncrementalIndexer
+from config.settings import settings
+
+BASE, NEXT = "1" * 40, "2" * 40
+
+
+class TreeClient(GitHubProvider):
+    """Serves ``snapshots[ref]`` (path to content) and counts content fetches."""
+
+    def __init__(self, snapshots, report_blob_shas=True):
+        self.snapshots = snapshots
+        self.report_blob_shas = report_blob_shas
+        self.fetched = []
+        self.failing = set()
+
+    def get_repo_files(self, repo, ref="main"):
+        return list(self.snapshots[ref])
+
+    def get_repo_tree(self, repo, ref="main"):
+        if not self.report_blob_shas:
+            return super().get_repo_tree(repo, ref)
+        return {path: git_blob_sha(content) for path, content in self.snapshots[ref].items()}
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        self.fetched.append(file_path)
+        if file_path in self.failing:
+            raise IOError("unavailable")
+        return self.snapshots[ref][file_path]
+
+    def get_pr(self, repo, pr_number):
+        raise NotImplementedError
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return []
+
+
+class RecordingIndex(IncrementalIndex):
+    name = "recording"
+
+    def __init__(self):
+        self.files = {}
+        self.batches = []
+
+    def accepts(self, file_path):
+        return file_path.endswith(".py")
+
+    def has_state(self, repo):
+        return bool(self.batches)
+
+    def apply_changes(self, repo, ref, changed, deleted):
+        self.batches.append((sorted(changed), sorted(deleted)))
+        for path in deleted:
+            self.files.pop(path, None)
+        self.files.update(changed)
+
+
+SNAPSHOTS = {
+    BASE: {"a.py": "a = 1", "b.py": "b = 1", "c.py": "c = 1", "README.md": "docs"},
+    NEXT: {"a.py": "a = 1", "b.py": "b = 2", "d.py": "d = 1", "README.md": "new docs"},
+}
+
+def test_new_base_reprocesses_only_changed_files(tmp_path):
+    client = TreeClient(SNAPSHOTS)
+    indexer, index = IncrementalIndexer(client, str(tmp_path / "manifest.db")), RecordingIndex()
+    indexer.refresh("org/repo", BASE, index)
+    client.fetched.clear()
+
+    refresh = indexer.refresh("org/repo", NEXT, index)
+
+    assert (refresh.added, refresh.modified, refresh.deleted, refresh.unchanged) == (["d.py"], ["b.py"], ["c.py"], 1)
+    assert sorted(client.fetched) == ["b.py", "d.py"]
+    assert index.batches[-1] == (["b.py", "d.py"], ["c.py"])
+    assert index.files == {"a.py": "a = 1", "b.py": "b = 2", "d.py": "d = 1"}
+    assert indexer.indexed_ref("org/repo", "recording") == NEXT
+
+def test_indexes_sharing_an_indexer_fetch_each_blob_once(tmp_path):
+    client = TreeClient(SNAPSHOTS)
+    indexer = IncrementalIndexer(client, str(tmp_path / "manifest.db"))
+    other = RecordingIndex()
+    other.name = "other"
+
+    indexer.refresh("org/repo", BASE, RecordingIndex())
+    indexer.refresh("org/repo", BASE, other)
+
+    assert sorted(client.fetched) == ["a.py", "b.py", "c.py"]
+    assert sorted(other.files) == ["a.py", "b.py", "c.py"]
+
+def test_large_trees_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "index_max_files", 2)
+    client = TreeClient(SNAPSHOTS)
+    index = RecordingIndex()
+
+    refresh = IncrementalIndexer(client, str(tmp_path / "manifest.db")).refresh("org/repo", BASE, index)
+
+    assert refresh.skipped == 1
+    assert sorted(index.files) == ["a.py", "b.py"]
+
+def test_cancelled_refresh_stops_fetching_and_retries_later(tmp_path, monkeypatch):
+    client = TreeClient(SNAPSHOTS)
+    indexer, index = IncrementalIndexer(client, str(tmp_path / "manifest.db")), RecordingIndex()
+    cancel = threading.Event()
+    cancel.set()
+    monkeypatch.setattr(incremental_indexer, "stage_cancel_event", lambda: cancel)
+
+    refresh = indexer.refresh("org/repo", BASE, index)
+
+    assert client.fetched == []
+    assert refresh.failed == ["a.py", "b.py", "c.py"]
+    assert indexer.indexed_ref("org/repo", "recording") == ""
+
+def test_same_commit_is_not_listed_again(tmp_path):
+    client = TreeClient(SNAPSHOTS)
+    indexer, index = IncrementalIndexer(client, str(tmp_path / "manifest.db")), RecordingIndex()
+    indexer.refresh("org/repo", BASE, index)
+    client.snapshots = {}
+
+    refresh = indexer.refresh("org/repo", BASE, index)
+
+    assert refresh.changed == 0
+    assert refresh.unchanged == 3
+
+def test_providers_without_blob_shas_are_hashed_locally(tmp_path):
+    client = TreeClient(SNAPSHOTS, report_blob_shas=False)
+    indexer, index = IncrementalIndexer(client, str(tmp_path / "manifest.db")), RecordingIndex()
+    indexer.refresh("org/repo", BASE, index)
+
+    refresh = indexer.refresh("org/repo", NEXT, index)
+
+    assert refresh.modified == ["b.py"]
+    assert indexer.indexed_files("org/repo", "recording")["b.py"] == git_blob_sha("b = 2")
+    assert index.batches[-1] == (["b.py", "d.py"], ["c.py"])
+
+def test_failed_fetches_are_retried_and_lost_state_rebuilds(tmp_path):
+    client = TreeClient(SNAPSHOTS)
+    client.failing = {"b.py"}
+    indexer, index = IncrementalIndexer(client, str(tmp_path / "manifest.db")), RecordingIndex()
+
+    refresh = indexer.refresh("org/repo", BASE, index)
+    assert refresh.failed == ["b.py"]
+    assert "b.py" not in index.files
+
+    client.failing = set()
+    assert indexer.refresh("org/repo", BASE, index).added == ["b.py"]
+
+    rebuilt = RecordingIndex()
+    assert indexer.refresh("org/repo", BASE, rebuilt).added == ["a.py", "b.py", "c.py"]
+
+def test_indexes_must_implement_state_and_changes():
+    class Incomplete(IncrementalIndex):
+        def has_state(self, repo):
+            return False
+
+    with pytest.raises(TypeError):
+        Incomplete()
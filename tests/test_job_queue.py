@@ -0,0 +1,192 @@
+"""Tests for the durable review job queue and worker pool."""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.jobs.job_queue import JobQueue, QueueFull
+from agent.jobs.worker_pool import ReviewWorkerPool
+from config.settings import settings
+
+
+class FlakyOrchestrator:
+    """Fails each PR listed in ``failures`` that many times before succeeding."""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.reviewed = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def areview_pull_request(self, repo, pr_number, criteria_text):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self.failures.get(pr_number):
+            self.failures[pr_number] -= 1
+            return {"session_id": f"s{pr_number}", "success": False, "error": "rate limited"}
+        self.reviewed.append((repo, pr_number))
+        return {"session_id": f"s{pr_number}", "success": True}
+
+def test_claims_by_priority_then_age(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    low = queue.enqueue("org/a", 1, "style", priority="low")
+    first = queue.enqueue("org/a", 2, "style")
+    high = queue.enqueue("org/a", 3, "style", priority="high")
+    second = queue.enqueue("org/a", 4, "style")
+
+    claimed = [queue.claim(per_repo_limit=0).job_id for _ in range(4)]
+
+    assert claimed == [high.job_id, first.job_id, second.job_id, low.job_id]
+    assert queue.claim() is None
+
+def test_repeated_jobs_are_deduplicated(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job = queue.enqueue("org/a", 1, "style", head_sha="abc", priority="low")
+
+    repeat = queue.enqueue("org/a", 1, "style", head_sha="abc", priority="high")
+    assert repeat.job_id == job.job_id
+    assert repeat.priority == 0
+
+    claimed = queue.claim()
+    queue.complete(claimed.job_id, claimed.lease_expires_at, "s1")
+    # The same commit is not reviewed twice; a new head SHA or other criteria is
+    assert queue.enqueue("org/a", 1, "style", head_sha="abc").status == "succeeded"
+    assert queue.enqueue("org/a", 1, "style", head_sha="def").job_id != job.job_id
+    assert queue.enqueue("org/a", 1, "security", head_sha="abc").job_id != job.job_id
+
+def test_per_repo_cap_skips_busy_repositories(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    for pr_number in (1, 2, 3):
+        queue.enqueue("org/busy", pr_number, "style", priority="high")
+    other = queue.enqueue("org/quiet", 1, "style")
+
+    assert queue.claim(per_repo_limit=2).repo == "org/busy"
+    assert queue.claim(per_repo_limit=2).repo == "org/busy"
+    assert queue.claim(per_repo_limit=2).job_id == other.job_id
+    assert queue.claim(per_repo_limit=2) is None
+
+def test_failures_back_off_then_give_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "job_backoff_seconds", 10.0)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job = queue.enqueue("org/a", 1, "style", max_attempts=2)
+
+    claimed = queue.claim()
+    retried = queue.fail(claimed.job_id, claimed.lease_expires_at, "boom")
+    assert retried.status == "queued"
+    assert retried.available_at >= time.time() + 9
+    assert queue.claim() is None
+
+    monkeypatch.setattr(time, "time", lambda real=time.time: real() + 11)
+    claimed = queue.claim()
+    failed = queue.fail(claimed.job_id, claimed.lease_expires_at, "boom again")
+    assert failed.status == "failed"
+    assert failed.attempts == 2
+    assert failed.last_error == "boom again"
+
+def test_expired_leases_are_requeued(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "job_lease_seconds", -1)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job = queue.enqueue("org/a", 1, "style")
+    queue.claim()
+
+    reclaimed = queue.claim()
+
+    assert reclaimed.job_id == job.job_id
+    assert reclaimed.attempts == 2
+
+def test_lost_lease_cannot_finish_the_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "job_lease_seconds", -1)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job = queue.enqueue("org/a", 1, "style")
+    stale = queue.claim()
+    current = queue.claim()
+
+    assert queue.heartbeat(job.job_id, stale.lease_expires_at) is None
+    assert not queue.complete(job.job_id, stale.lease_expires_at, "s-stale")
+    assert queue.fail(job.job_id, stale.lease_expires_at, "boom") is None
+    assert queue.get(job.job_id).status == "running"
+    monkeypatch.setattr(settings, "job_lease_seconds", 60)
+    renewed = queue.heartbeat(job.job_id, current.lease_expires_at)
+    assert queue.complete(job.job_id, renewed, "s1")
+    assert queue.get(job.job_id).session_id == "s1"
+
+def test_expired_leases_fail_after_the_last_attempt(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "job_lease_seconds", -1)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job = queue.enqueue("org/a", 1, "style", max_attempts=2)
+    queue.claim()
+    queue.claim()
+
+    assert queue.claim() is None
+    failed = queue.get(job.job_id)
+    assert failed.status == "failed"
+    assert failed.last_error == "Lease expired after 2 attempts"
+
+def test_full_queue_refuses_new_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_depth=1)
+    queue.enqueue("org/a", 1, "style")
+
+    with pytest.raises(QueueFull):
+        queue.enqueue("org/a", 2, "style")
+    # A duplicate of a queued job is not a new job
+    assert queue.enqueue("org/a", 1, "style").pr_number == 1
+
+def test_metrics_report_depth_and_wait_time(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    queue.enqueue("org/a", 1, "style", priority="high")
+    queue.enqueue("org/a", 2, "style")
+    queue.enqueue("org/b", 1, "style")
+    queue.claim()
+
+    metrics = queue.metrics()
+
+    assert metrics["depth"] == 2
+    assert metrics["running"] == 1
+    assert metrics["queued_by_priority"] == {"normal": 2}
+    assert metrics["running_by_repo"] == {"org/a": 1}
+    assert metrics["wait_seconds"]["count"] == 1
+    assert metrics["wait_seconds"]["p95"] >= 0
+
+def test_worker_pool_drains_queue_with_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "job_backoff_seconds", 0.0)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    for pr_number in range(1, 7):
+        queue.enqueue("org/a", pr_number, "style")
+    orchestrator = FlakyOrchestrator(failures={2: 1})
+    pool = ReviewWorkerPool(orchestrator, queue, workers=4, per_repo_limit=0, poll_interval=0.01)
+
+    processed = asyncio.run(pool.run(stop_when_idle=True))
+
+    assert processed == {"succeeded": 6, "retried": 1, "failed": 0, "lost": 0}
+    assert sorted(pr for _, pr in orchestrator.reviewed) == [1, 2, 3, 4, 5, 6]
+    assert 1 < orchestrator.max_in_flight <= 4
+    assert queue.get(2).attempts == 2
+    assert queue.get(2).session_id == "s2"
+
+def test_worker_heartbeat_keeps_long_reviews_leased(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "job_lease_seconds", 0.2)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job = queue.enqueue("org/a", 1, "style")
+    reclaims = []
+
+    class SlowOrchestrator:
+        async def areview_pull_request(self, repo, pr_number, criteria_text):
+            for _ in range(4):
+                await asyncio.sleep(0.1)
+                reclaims.append(await asyncio.to_thread(queue.claim, 0))
+            return {"session_id": "s1", "success": True}
+
+    pool = ReviewWorkerPool(SlowOrchestrator(), queue, workers=1, per_repo_limit=0,
+                            poll_interval=0.01, heartbeat_interval=0.01)
+
+    processed = asyncio.run(pool.run(stop_when_idle=True))
+
+    assert reclaims == [None] * 4
+    assert processed == {"succeeded": 1, "retried": 0, "failed": 0, "lost": 0}
+    assert queue.get(job.job_id).attempts == 1
@@ -0,0 +1,103 @@
+"""Tests for map-reduce review of large PRs."""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain.schema import AIMessage
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import FileDiff, PRInfo
+from agent.retrieval.context_packer import ContextPacker
+from agent.reviewer.map_reduce import partition_files, slice_context
+from agent.reviewer.pr_reviewer import PRReviewer
+from agent.storage.blob_store import BlobStore
+from app_logging.schemas.models import RetrievedDocument
+from config.settings import settings
+
+
+def count_words(text):
+    return max(1, len(text.split()))
+
+
+def file_diff(path, words):
+    return FileDiff(file_path=path, additions=1, deletions=0, status="modified",
+                    diff_content="@@ -1,1 +1,1 @@\n+" + " ".join(["x"] * words) + "\n")
+
+
+def doc(path, words, relevance=0.9):
+    metadata = {"type": "file_content", "file_path": path} if path else {"type": "criteria"}
+    return RetrievedDocument(content=" ".join(["y"] * words), source=path or "criteria",
+                             relevance_score=relevance, metadata=metadata)
+
+
+class FakeLLM:
+    """Answers each map call about its first file and records the reduce prompt."""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        prompt = messages[-1].content
+        self.prompts.append(prompt)
+        if "partial reviews" in messages[0].content:
+            return AIMessage(content="Whole PR looks consistent. **Merged summary**")
+        path = next(line[2:].split(" (")[0] for line in prompt.splitlines() if "(modified)" in line)
+        return AIMessage(content=f"COMMENT: {path}:1 [warning] Check {path} jwt usage\n**Partial**")
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.criteria_processor = CriteriaProcessor()
+        self.context_packer = ContextPacker(budget_tokens=1000, chunk_tokens=500, count_tokens=count_words)
+
+
+def make_pr(files):
+    return PRInfo(pr_number=7, title="Big change", description="", base_branch="main", head_branch="big",
+                  total_additions=len(files), total_deletions=0, files_changed=files)
+
+def test_partition_balances_groups_and_keeps_file_order():
+    files = [file_diff("a.py", 50), file_diff("b.py", 10), file_diff("c.py", 45), file_diff("d.py", 5)]
+
+    groups = partition_files(files, [doc("b.py", 30)], count_words, max_group_tokens=80)
+
+    assert [[f.file_path for f in group] for group in groups] == [["a.py", "d.py"], ["b.py", "c.py"]]
+    assert partition_files(files, [], count_words, max_group_tokens=10_000) == [files]
+    assert partition_files([], [], count_words, max_group_tokens=80) == []
+
+def test_each_group_packs_candidates_into_its_own_budget():
+    files = [file_diff("a.py", 5), file_diff("b.py", 5)]
+    candidates = [doc("a.py", 60), doc("b.py", 60), doc(None, 10, relevance=0.5)]
+    packer = ContextPacker(budget_tokens=100, chunk_tokens=500, count_tokens=count_words)
+    # Packed for the whole PR, only one of the two file documents fits the budget
+    context = {"documents": packer.pack(candidates).documents, "candidates": candidates}
+
+    group_a = slice_context(context, files[:1], packer)
+    group_b = slice_context(context, files[1:], packer)
+
+    assert [d.source for d in group_a["documents"]] == ["a.py", "criteria"]
+    assert [d.source for d in group_b["documents"]] == ["b.py", "criteria"]
+    assert group_b["packing"]["budget_tokens"] == 100
+    assert [d.source for d in slice_context({"documents": candidates}, files[1:])["documents"]] == [
+        "b.py", "criteria"]
+
+def test_forced_map_reduce_merges_partial_reviews(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "review_strategy", "map_reduce")
+    monkeypatch.setattr(settings, "map_reduce_group_tokens", 30)
+    llm = FakeLLM()
+    reviewer = PRReviewer(None, FakeRetriever(), llm=llm, response_cache=None, blob_store=BlobStore(str(tmp_path)))
+    files = [file_diff("a.py", 20), file_diff("b.py", 20)]
+    context = {"documents": [doc("a.py", 5), doc("b.py", 5)]}
+
+    review, info = asyncio.run(reviewer._agenerate_review(make_pr(files), context, {"focus": "Security"}))
+
+    assert info["strategy"] == "map_reduce" and info["groups"] == [["a.py"], ["b.py"]]
+    assert [c.file_path for c in review.comments] == ["a.py", "b.py"]
+    assert [s.name for s in review.package_suggestions] == ["PyJWT"]
+    assert review.high_level_summary_md == "**Merged summary**"
+    assert "### Files: a.py" in llm.prompts[-1] and "### Files: b.py" in llm.prompts[-1]
+
+    # A PR that fits one group still goes through map and reduce when forced
+    single, single_info = asyncio.run(reviewer._agenerate_review(make_pr(files[:1]), context, {"focus": "Security"}))
+    assert single_info["groups"] == [["a.py"]] and single.high_level_summary_md == "**Merged summary**"
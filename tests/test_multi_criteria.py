@@ -0,0 +1,77 @@
+"""Tests for reviewing one PR under several criteria sets."""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain.schema import AIMessage
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import MockGitHubClient
+from agent.reviewer.pr_reviewer import PRReviewer
+from agent.storage.blob_store import BlobStore
+from app_logging.schemas.models import RetrievedDocument
+from config.settings import settings
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        return AIMessage(content="COMMENT: src/auth/jwt_auth.py:3 [info] Looks fine\n**Reviewed**")
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.criteria_processor = CriteriaProcessor()
+        self.pr_fetches = 0
+
+    async def acollect_pr_candidates(self, repo, pr_info):
+        self.pr_fetches += 1
+        doc = RetrievedDocument(content="import jwt", source="src/auth/jwt_auth.py",
+                                metadata={"type": "file_content", "file_path": "src/auth/jwt_auth.py"})
+        return {"documents": [doc], "retrieval_stages": [{"stage": "structural", "candidates": 1, "returned": 1}]}
+
+    async def aget_enhanced_context(self, repo, pr_info, criteria_data, pr_documents=None, pr_stages=None):
+        return {"documents": list(pr_documents)}
+
+
+class StepLog:
+    current_session = None
+
+    def __init__(self):
+        self.step_ids = []
+
+    def log_step(self, step):
+        self.step_ids.append(step.step_id)
+
+def test_shared_retrieval_runs_once_per_pr(monkeypatch, tmp_path):
+    """Each criteria set gets its own review while PR retrieval happens once."""
+    monkeypatch.setattr(settings, "review_strategy", "single")
+    retriever, llm, step_log = FakeRetriever(), FakeLLM(), StepLog()
+    reviewer = PRReviewer(step_log, retriever, llm=llm, blob_store=BlobStore(str(tmp_path)))
+    pr_info = MockGitHubClient().get_pr("org/repo", 1)
+
+    reviews = asyncio.run(reviewer.areview_pr_multi("org/repo", pr_info,
+                                                    ["security", "performance", "security"]))
+
+    assert list(reviews) == ["security", "performance"]
+    assert retriever.pr_fetches == 1
+    assert llm.calls == 2
+    assert "pr_retrieval" in step_log.step_ids
+    assert "criteria_1/review_summary" in step_log.step_ids
+
+def test_combined_review_merges_comments_and_summaries(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "review_strategy", "single")
+    reviewer = PRReviewer(StepLog(), FakeRetriever(), llm=FakeLLM(), blob_store=BlobStore(str(tmp_path)))
+    pr_info = MockGitHubClient().get_pr("org/repo", 1)
+    reviews = asyncio.run(reviewer.areview_pr_multi("org/repo", pr_info, ["security", "strict style"]))
+
+    combined = PRReviewer.combine_criteria_reviews(reviews)
+
+    assert len(combined.comments) == 2
+    assert "### security" in combined.high_level_summary_md
+    assert "[strict style]" in combined.comment_summary
@@ -0,0 +1,91 @@
+"""Tests for the LLM response cache."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain.schema import HumanMessage, SystemMessage
+
+import agent.reviewer.response_cache as response_cache
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.reviewer.pr_reviewer import PRReviewer
+from agent.reviewer.response_cache import ResponseCache
+from agent.retrieval.context_retriever import ContextRetriever
+from agent.providers.github_client import MockGitHubClient
+from agent.storage.blob_store import BlobStore
+
+MESSAGES = [SystemMessage(content="You review code."), HumanMessage(content="Review this diff")]
+PARAMS = {"model": "gpt-4", "temperature": 0.1, "top_p": 1.0}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class ConfiguredLLM:
+    def __init__(self, model_name, temperature, top_p=1.0):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.top_p = top_p
+
+
+def make_cache(tmp_path, monkeypatch, **kwargs):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache.time, "time", clock.time)
+    return ResponseCache(str(tmp_path / "cache.db"), **kwargs), clock
+
+def test_key_is_stable_and_covers_messages_and_params():
+    key = ResponseCache.make_key(MESSAGES, PARAMS)
+
+    assert key == ResponseCache.make_key(list(MESSAGES), dict(reversed(list(PARAMS.items()))))
+    assert key != ResponseCache.make_key(MESSAGES, {**PARAMS, "temperature": 0.7})
+    assert key != ResponseCache.make_key(MESSAGES[:1] + [HumanMessage(content="Review that diff")], PARAMS)
+
+def test_hit_and_miss_are_counted(tmp_path, monkeypatch):
+    cache, _ = make_cache(tmp_path, monkeypatch, ttl_seconds=60, max_entries=10)
+    key = ResponseCache.make_key(MESSAGES, PARAMS)
+
+    assert cache.get(key) is None
+    cache.put(key, "**Looks good**")
+
+    assert cache.get(key) == "**Looks good**"
+    assert ResponseCache(str(tmp_path / "cache.db")).get(key) == "**Looks good**"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl_seconds=60, max_entries=10)
+    cache.put("k", "response")
+
+    clock.now += 61
+
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl_seconds=3600, max_entries=2)
+    cache.put("a", "1")
+    clock.now += 1
+    cache.put("b", "2")
+    clock.now += 1
+    cache.get("a")
+    clock.now += 1
+
+    cache.put("c", "3")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+
+def test_reviewer_keys_on_its_own_model(tmp_path):
+    retriever = ContextRetriever(MockGitHubClient(str(tmp_path / "mock")), CriteriaProcessor())
+    reviewers = [PRReviewer(None, retriever, llm=llm, response_cache=None, blob_store=BlobStore(str(tmp_path)))
+                 for llm in (ConfiguredLLM("gpt-4", 0.1), ConfiguredLLM("gpt-4o-mini", 0.1),
+                             ConfiguredLLM("gpt-4", 0.7))]
+
+    keys = {ResponseCache.make_key(MESSAGES, reviewer._model_params()) for reviewer in reviewers}
+
+    assert reviewers[1]._model_params() == {"model": "gpt-4o-mini", "temperature": 0.1, "top_p": 1.0}
+    assert len(keys) == 3
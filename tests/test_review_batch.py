@@ -0,0 +1,52 @@
+"""Tests for batch review job validation and failure isolation."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.orchestrator.review_orchestrator import ReviewOrchestrator, validate_batch_job
+
+
+class StubOrchestrator(ReviewOrchestrator):
+    """Skips the real stores and fails the review of PR 13."""
+
+    def __init__(self):
+        self.reviewed = []
+
+    async def areview_pull_request(self, repo, pr_number, criteria_text, **kwargs):
+        self.reviewed.append((repo, pr_number, criteria_text))
+        if pr_number == 13:
+            raise RuntimeError("GitHub API unavailable")
+        return {"session_id": f"s{pr_number}", "success": True, "review": {"summary": "ok"}}
+
+
+def run_batch(orchestrator, jobs):
+    async def collect():
+        return [result async for result in orchestrator.areview_batch(jobs, max_concurrency=2,
+                                                                            default_criteria="security")]
+    return sorted(asyncio.run(collect()), key=lambda result: result["index"])
+
+def test_validate_batch_job_normalizes_pr_numbers():
+    assert validate_batch_job({"repo": "org/repo", "pr": "42"}) == {"repo": "org/repo", "pr": 42}
+
+    for job in (["org/repo", 1], {"repo": "org/repo"}, {"repo": "org/repo", "pr": "abc"},
+                {"repo": "org/repo", "pr": True}, {"repo": "org/repo", "pr": [1]}, {"repo": 5, "pr": 1}):
+        with pytest.raises(ValueError):
+            validate_batch_job(job)
+
+def test_batch_reports_failed_jobs_without_stopping_others():
+    orchestrator = StubOrchestrator()
+    jobs = [{"repo": "org/repo", "pr": 1}, {"repo": "org/repo", "pr": 13},
+            {"repo": "org/repo", "pr": "two"}, "org/repo#3", {"repo": "org/repo", "pr": "4", "criteria": "style"}]
+
+    results = run_batch(orchestrator, jobs)
+
+    assert [result["success"] for result in results] == [True, False, False, False, True]
+    assert results[1]["error"] == "GitHub API unavailable"
+    assert results[1]["metadata"]["pr_number"] == 13
+    assert "PR number" in results[2]["error"] and "JSON object" in results[3]["error"]
+    assert sorted(orchestrator.reviewed) == [("org/repo", 1, "security"), ("org/repo", 4, "style"),
+                                             ("org/repo", 13, "security")]
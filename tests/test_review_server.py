@@ -0,0 +1,179 @@
+"""Tests for the long-lived review server."""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from pydantic import BaseModel
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.jobs.job_queue import JobQueue
+from agent.server.review_server import ReviewServer
+from config.settings import settings
+
+
+class FakeComment(BaseModel):
+    file_path: str
+    line_number: int
+    comment_text: str
+
+
+class FakeOrchestrator:
+    """Records calls; sessions and statistics come from fixed data."""
+
+    def __init__(self):
+        self.reviews = []
+
+    async def areview_pull_request(self, repo, pr_number, criteria_text, on_comment=None):
+        self.reviews.append((repo, pr_number, criteria_text))
+        if on_comment is not None:
+            on_comment(FakeComment(file_path="a.py", line_number=3, comment_text="Check this"))
+        return {"session_id": "s1", "success": True, "review": {"comments": []}}
+
+    async def areview_pull_request_multi(self, repo, pr_number, criteria_texts, on_comment=None):
+        self.reviews.append((repo, pr_number, criteria_texts))
+        return {"session_id": "s2", "success": True, "reviews": {c: {} for c in criteria_texts}}
+
+    async def areplay_session(self, session_id, new_criteria=None, live=False):
+        if session_id != "s1":
+            return {"error": "Session not found"}
+        return {"session_id": session_id, "identical": True}
+
+    def list_sessions(self):
+        return {"total_sessions": 1, "sessions": [{"session_id": "s1"}]}
+
+    def get_session_details(self, session_id):
+        return {"session": {"session_id": session_id}} if session_id == "s1" else None
+
+    def get_review_statistics(self, repo=None, since=None):
+        return {"total_sessions": 1, "repo": repo, "since": since}
+
+
+async def with_server(check, unix_socket=None, job_queue=None):
+    orchestrator = FakeOrchestrator()
+    server = ReviewServer(orchestrator, host="127.0.0.1", port=0, unix_socket=unix_socket, job_queue=job_queue)
+    await server.start()
+    transport = httpx.AsyncHTTPTransport(uds=unix_socket) if unix_socket else None
+    base_url = "http://server" if unix_socket else server.address
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport) as client:
+            await check(client, orchestrator)
+    finally:
+        await server.close()
+
+def test_routes_share_one_orchestrator():
+    async def check(client, orchestrator):
+        assert (await client.get("/health")).json() == {"status": "ok"}
+        review = await client.post("/review", json={"repo": "org/repo", "pr": 7, "criteria": "security"})
+        assert review.json()["session_id"] == "s1"
+        multi = await client.post("/review", json={"repo": "org/repo", "pr": 7,
+                                                   "criteria": ["security", "performance"]})
+        assert list(multi.json()["reviews"]) == ["security", "performance"]
+        assert orchestrator.reviews[0] == ("org/repo", 7, "security")
+        assert (await client.get("/sessions")).json()["total_sessions"] == 1
+        assert (await client.get("/sessions/s1")).json()["session"]["session_id"] == "s1"
+        assert (await client.get("/stats", params={"repo": "org/repo"})).json()["repo"] == "org/repo"
+        assert (await client.post("/replay", json={"session_id": "s1"})).json()["identical"]
+
+    asyncio.run(with_server(check))
+
+def test_errors_are_json_with_status_codes():
+    async def check(client, orchestrator):
+        assert (await client.get("/sessions/missing")).status_code == 404
+        assert (await client.post("/replay", json={"session_id": "missing"})).status_code == 404
+        assert (await client.get("/review")).status_code == 405
+        bad = await client.post("/review", json={"repo": "org/repo"})
+        assert bad.status_code == 400
+        assert "required" in bad.json()["error"]
+        assert (await client.post("/review", content=b"{not json",
+                                  headers={"Content-Type": "application/json"})).status_code == 400
+        form = await client.post("/review", data={"repo": "org/repo", "pr": "7"})
+        assert form.status_code == 415
+        assert orchestrator.reviews == []
+
+    asyncio.run(with_server(check))
+
+def test_bearer_token_is_required_when_configured(monkeypatch):
+    monkeypatch.setattr(settings, "server_auth_token", "s3cret")
+
+    async def check(client, orchestrator):
+        assert (await client.get("/health")).status_code == 200
+        assert (await client.get("/sessions")).status_code == 401
+        assert (await client.get("/sessions", headers={"Authorization": "Bearer wrong"})).status_code == 401
+        assert (await client.get("/sessions", headers={"Authorization": "Bearer s3cret"})).status_code == 200
+
+    asyncio.run(with_server(check))
+
+def test_oversized_and_excessive_headers_are_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "server_max_headers", 5)
+
+    async def send(server, request):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response.split(b"\r\n", 1)[0]
+
+    async def run():
+        server = ReviewServer(FakeOrchestrator(), host="127.0.0.1", port=0)
+        await server.start()
+        try:
+            many = b"".join(b"X-Header-%d: 1\r\n" % i for i in range(10))
+            too_many = await send(server, b"GET /health HTTP/1.1\r\n" + many + b"\r\n")
+            too_long = await send(server, b"GET /health HTTP/1.1\r\nX-Long: " + b"a" * 70000 + b"\r\n\r\n")
+            healthy = await send(server, b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+        finally:
+            await server.close()
+        return too_many, too_long, healthy
+
+    assert asyncio.run(run()) == (b"HTTP/1.1 431 Request Header Fields Too Large",
+                                  b"HTTP/1.1 431 Request Header Fields Too Large", b"HTTP/1.1 200 OK")
+
+def test_streamed_review_sends_comments_before_result():
+    async def check(client, orchestrator):
+        async with client.stream("POST", "/review", json={"repo": "org/repo", "pr": 1, "stream": True}) as response:
+            lines = [json.loads(line) async for line in response.aiter_lines() if line]
+        assert [line["type"] for line in lines] == ["comment", "result"]
+        assert lines[0]["comment"]["line_number"] == 3
+
+    asyncio.run(with_server(check))
+
+def test_unix_socket(tmp_path):
+    async def check(client, orchestrator):
+        assert (await client.get("/health")).json() == {"status": "ok"}
+
+    asyncio.run(with_server(check, unix_socket=str(tmp_path / "review.sock")))
+
+def test_unix_socket_path_must_be_a_socket(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("keep me")
+
+    with pytest.raises(FileExistsError):
+        asyncio.run(ReviewServer(FakeOrchestrator(), unix_socket=str(path)).start())
+    assert path.read_text() == "keep me"
+
+def test_unauthenticated_server_only_answers_localhost_hosts():
+    async def check(client, orchestrator):
+        assert (await client.get("/sessions", headers={"Host": "localhost:8765"})).status_code == 200
+        assert (await client.get("/sessions", headers={"Host": "[::1]:8765"})).status_code == 200
+        rebound = await client.get("/sessions", headers={"Host": "attacker.example:8765"})
+        assert rebound.status_code == 403
+
+    asyncio.run(with_server(check))
+
+def test_jobs_are_queued_with_metrics(tmp_path):
+    async def check(client, orchestrator):
+        job = (await client.post("/jobs", json={"repo": "org/repo", "pr": 7, "head_sha": "abc"})).json()
+        repeat = (await client.post("/jobs", json={"repo": "org/repo", "pr": 7, "head_sha": "abc"})).json()
+        assert repeat["job_id"] == job["job_id"]
+        assert (await client.get(f"/jobs/{job['job_id']}")).json()["status"] == "queued"
+        assert (await client.get("/jobs/metrics")).json()["depth"] == 1
+        full = await client.post("/jobs", json={"repo": "org/repo", "pr": 8})
+        assert full.status_code == 503
+        assert orchestrator.reviews == []
+
+    asyncio.run(with_server(check, job_queue=JobQueue(str(tmp_path / "jobs.db"), max_depth=1)))
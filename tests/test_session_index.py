@@ -0,0 +1,129 @@
+"""Tests for the indexed session store."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.storage.session_index import SessionIndex
+from app_logging.schemas.models import SessionLog, PRReview, Comment
+
+
+def make_session(session_id, repo, success=True, comments=1):
+    review = PRReview(
+        comments=[Comment(file_path="a.py", line_number=1, comment_text="c")] * comments,
+        package_suggestions=[],
+        comment_summary="summary",
+        high_level_summary_md="**done**"
+    )
+    return SessionLog(
+        session_id=session_id,
+        pr_info={"repo": repo, "pr_number": 1},
+        criteria_text="security",
+        success=success,
+        final_review=review if success else None
+    )
+
+def test_list_and_statistics_come_from_index(tmp_path):
+    """Completed sessions are listed and aggregated without loading logs."""
+    index = SessionIndex(str(tmp_path / "index.db"))
+    index.record_start(make_session("s1", "org/a"))
+    index.record_completion(make_session("s1", "org/a", comments=3))
+    index.record_completion(make_session("s2", "org/b", success=False))
+
+    assert {row["session_id"] for row in index.list_sessions()} == {"s1", "s2"}
+    assert [row["session_id"] for row in index.list_sessions(repo="org/a")] == ["s1"]
+
+    stats = index.statistics()
+    assert stats["total_sessions"] == 2
+    assert stats["successful_sessions"] == 1
+    assert stats["total_comments"] == 3
+    assert stats["repository_distribution"] == {"org/a": 1, "org/b": 1}
+
+def test_incomplete_sessions_count_as_failed_until_they_complete(tmp_path):
+    """Like the session logs, statistics cover every session; an unfinished one counts as failed."""
+    index = SessionIndex(str(tmp_path / "index.db"))
+    index.record_start(make_session("s1", "org/a"))
+    assert len(index.list_sessions()) == 1
+    stats = index.statistics()
+    assert (stats["total_sessions"], stats["successful_sessions"], stats["failed_sessions"]) == (1, 0, 1)
+
+    index.record_completion(make_session("s1", "org/a", comments=2))
+
+    stats = index.statistics()
+    assert (stats["total_sessions"], stats["successful_sessions"], stats["failed_sessions"]) == (1, 1, 0)
+    assert stats["total_comments"] == 2
+
+def test_counters_are_incremental_and_filterable(tmp_path):
+    """Re-recording a session does not double count, and filters use the rollup buckets."""
+    index = SessionIndex(str(tmp_path / "index.db"))
+    session = make_session("s1", "org/a", comments=2)
+    index.record_completion(session)
+    index.record_completion(session)
+    index.record_completion(make_session("s2", "org/b"))
+
+    stats = index.statistics()
+    assert stats["total_sessions"] == 2
+    assert stats["total_comments"] == 3
+    assert stats["preset_distribution"] == {"security": 2}
+
+    assert index.statistics(repo="org/a")["total_sessions"] == 1
+    assert index.statistics(since="2999-01-01")["total_sessions"] == 0
+
+def test_rollup_rebuilt_for_existing_index(tmp_path):
+    """Reopening an index keeps the counters without double counting."""
+    db_path = str(tmp_path / "index.db")
+    SessionIndex(db_path).record_completion(make_session("s1", "org/a"))
+    assert SessionIndex(db_path).statistics()["total_sessions"] == 1
+
+def test_counters_from_an_older_rollup_are_rebuilt(tmp_path):
+    """Counters built before incomplete sessions were counted are recomputed on open."""
+    db_path = str(tmp_path / "index.db")
+    index = SessionIndex(db_path)
+    index.record_start(make_session("s1", "org/a"))
+    index._conn.execute("DELETE FROM stats_rollup")
+    index._conn.execute("UPDATE meta SET value = '1' WHERE key = 'rollup_built'")
+    index._conn.commit()
+
+    assert SessionIndex(db_path).statistics()["failed_sessions"] == 1
+
+def test_archived_sessions_read_back_compacted(tmp_path):
+    """Archived sessions are read transparently with one version per step."""
+    from agent.storage.session_archive import SessionArchive
+    from agent.storage.session_index import IndexedSessionLogger
+    from app_logging.schemas.models import ReasoningStep, StepType
+
+    index = SessionIndex(str(tmp_path / "index.db"))
+    archive = SessionArchive(str(tmp_path / "archive"))
+    logger = IndexedSessionLogger(index, session_archive=archive)
+
+    session = make_session("s1", "org/a")
+    steps = [
+        ReasoningStep(step_type=StepType.RETRIEVAL, step_id="context_retrieval", output={"docs": "pending"}),
+        ReasoningStep(step_type=StepType.GENERATION, step_id="review_generation", output={"review": "pending"}),
+        ReasoningStep(step_type=StepType.RETRIEVAL, step_id="context_retrieval", output={"docs": ["a"]}),
+    ]
+    index.record_completion(session)
+    archive.archive_sessions("2024-01-02", [(session, steps)])
+    index.mark_archived(["s1"], "2024-01-02")
+
+    assert logger.get_session("s1").session_id == "s1"
+    restored = logger.get_session_steps("s1")
+    assert [step.step_id for step in restored] == ["context_retrieval", "review_generation"]
+    assert restored[0].output == {"docs": ["a"]}
+
+    assert archive.delete_before("2024-01-03") == ["2024-01-02"]
+    assert logger.get_session("s1") is None
+
+def test_delete_session_removes_only_its_own_logs(tmp_path):
+    """Deleting a session leaves sessions whose ids share its prefix alone."""
+    from agent.storage.session_index import IndexedSessionLogger
+
+    logger = IndexedSessionLogger(SessionIndex(str(tmp_path / "index.db")))
+    logger.logs_dir = tmp_path / "logs"
+    logger.logs_dir.mkdir()
+    for name in ("s1.json", "s1_steps.jsonl", "s10.json", "s10_steps.jsonl", "s1.notes"):
+        (logger.logs_dir / name).write_text("{}")
+
+    logger.delete_session("s1")
+
+    assert sorted(path.name for path in logger.logs_dir.iterdir()) == ["s1.notes", "s10.json", "s10_steps.jsonl"]
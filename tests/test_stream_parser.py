@@ -0,0 +1,89 @@
+"""Tests for incremental parsing of streamed review comments."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import asyncio
+
+from langchain.schema import AIMessage, HumanMessage
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import FileDiff, MockGitHubClient, PRInfo
+from agent.retrieval.context_retriever import ContextRetriever
+from agent.reviewer.pr_reviewer import PRReviewer
+from agent.reviewer.stream_parser import IncrementalCommentParser, parse_comments
+from agent.storage.blob_store import BlobStore
+
+
+class ChunkedLLM:
+    """Streams a fixed response in small chunks."""
+
+    def __init__(self, text):
+        self.text = text
+
+    async def astream(self, messages):
+        for start in range(0, len(self.text), 7):
+            yield AIMessage(content=self.text[start:start + 7])
+
+
+class StepLog:
+    current_session = None
+
+    def __init__(self):
+        self.steps = []
+
+    def log_step(self, step):
+        self.steps.append(step)
+
+def test_comments_emitted_when_line_completes():
+    """A comment is produced as soon as its line is terminated, not before."""
+    parser = IncrementalCommentParser()
+    assert parser.feed("Intro text\nCOMMENT: src/app.py:4") == []
+
+    comments = parser.feed("2 [warning] Avoid the N+1 query\nCOMMENT: src/db.py:7 ")
+    assert len(comments) == 1
+    assert comments[0].file_path == "src/app.py"
+    assert comments[0].line_number == 42
+    assert comments[0].severity == "warning"
+
+    trailing = parser.close() + parser.feed("")
+    assert trailing == []
+
+def test_trailing_comment_flushed_on_close():
+    """The last comment is emitted on close even without a newline."""
+    parser = IncrementalCommentParser()
+    parser.feed("- COMMENT: `lib/util.py`:3 [bogus] Rename this helper")
+    comments = parser.close()
+    assert comments[0].file_path == "lib/util.py"
+    assert comments[0].severity == "info"
+    assert comments[0].comment_text == "Rename this helper"
+
+def test_parse_comments_matches_streamed_output():
+    """Parsing a full response yields the same comments as streaming it."""
+    text = "COMMENT: a.py:1 [info] One\nnoise\nCOMMENT: b.py:2 [error] Two\n"
+    parser = IncrementalCommentParser()
+    streamed = []
+    for index in range(0, len(text), 5):
+        streamed.extend(parser.feed(text[index:index + 5]))
+    streamed.extend(parser.close())
+    assert streamed == parse_comments(text)
+
+def test_streamed_comments_are_anchored_before_they_are_emitted(tmp_path):
+    """The stream, the logged steps and the final review agree on each comment's line."""
+    text = "COMMENT: src/app.py:90 [warning] Check the bounds\n**Done**"
+    pr_info = PRInfo(pr_number=1, title="t", description="", base_branch="main", head_branch="b",
+                     total_additions=1, total_deletions=1,
+                     files_changed=[FileDiff(file_path="src/app.py", additions=1, deletions=1, status="modified",
+                                             diff_content="@@ -10,3 +10,3 @@\n a\n-b\n+c\n d\n")])
+    log = StepLog()
+    retriever = ContextRetriever(MockGitHubClient(str(tmp_path / "mock")), CriteriaProcessor())
+    reviewer = PRReviewer(log, retriever, llm=ChunkedLLM(text), response_cache=None,
+                          blob_store=BlobStore(str(tmp_path)))
+    streamed = []
+
+    review_text, _ = asyncio.run(reviewer._ainvoke_model([HumanMessage(content="Review")], streamed.append, pr_info))
+
+    final = reviewer._parse_review_response(review_text, pr_info)
+    assert [c.line_number for c in streamed] == [c.line_number for c in final.comments] == [11]
+    assert log.steps[0].output["comment"].line_number == 11
@@ -0,0 +1,160 @@
+"""Tests for the symbol and import graph index."""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import FileDiff, GitHubProvider, PRInfo
+from agent.retrieval.context_retriever import ContextRetriever
+from agent.retrieval.incremental_indexer import IncrementalIndexer
+from agent.retrieval.symbol_graph import SymbolGraph, SymbolIndexStore, parse_python, parse_script
+from config.settings import settings
+
+SHA = "9" * 40
+
+FILES = {
+    "billing/invoice.py": "from .tax import tax_rate\n\n"
+                          "def compute_invoice_total(items):\n"
+                          "    return sum(items) * (1 + tax_rate())\n",
+    "billing/tax.py": "def tax_rate():\n    return 0.2\n",
+    "billing/api.py": "from .invoice import compute_invoice_total\n\n"
+                      "def invoice_endpoint(order):\n"
+                      "    return compute_invoice_total(order.items)\n\n"
+                      "def route_invoices(app):\n"
+                      "    app.add(invoice_endpoint)\n",
+    "reports/monthly.py": "def monthly_report(rows):\n    return compute_invoice_total(rows)\n",
+    "web/cart.ts": "import { computeInvoiceTotal } from './invoice';\n"
+                   "export class Cart {\n"
+                   "  total(): number {\n"
+                   "    return computeInvoiceTotal(this.items);\n"
+                   "  }\n"
+                   "}\n",
+    "web/invoice.ts": "export function computeInvoiceTotal(items: Item[]): number {\n"
+                      "  return items.length;\n"
+                      "}\n",
+}
+
+DIFF = ("@@ -3,2 +3,2 @@ from .tax import tax_rate\n"
+        " def compute_invoice_total(items):\n"
+        "-    return sum(items) * (1 + tax_rate())\n"
+        "+    return round(sum(items) * (1 + tax_rate()), 2)\n")
+
+
+class RepoClient(GitHubProvider):
+    def __init__(self):
+        self.content_fetches = 0
+
+    def get_pr(self, repo, pr_number):
+        raise NotImplementedError
+
+    def get_repo_files(self, repo, ref="main"):
+        return list(FILES)
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        self.content_fetches += 1
+        return FILES.get(file_path, "# Mock content")
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return []
+
+
+def make_store(client, tmp_path):
+    indexer = IncrementalIndexer(client, str(tmp_path / "manifest.db"))
+    return SymbolIndexStore(client, str(tmp_path / "symbols.db"), indexer)
+
+def make_pr():
+    return PRInfo(pr_number=4, title="Round totals", description="", base_branch="main", head_branch="round",
+                  total_additions=1, total_deletions=1, base_sha=SHA,
+                  files_changed=[FileDiff(file_path="billing/invoice.py", status="modified",
+                                          additions=1, deletions=1, diff_content=DIFF)])
+
+def test_python_definitions_references_and_imports():
+    record = parse_python(FILES["billing/api.py"])
+
+    assert [(d["qualname"], d["start"], d["end"]) for d in record["definitions"]] == [
+        ("invoice_endpoint", 3, 4), ("route_invoices", 6, 7)]
+    assert ["compute_invoice_total", "invoice_endpoint", 4] in record["references"]
+    assert ".invoice" in record["imports"]
+
+def test_script_methods_and_relative_imports():
+    record = parse_script(FILES["web/cart.ts"])
+
+    assert [(d["qualname"], d["kind"], d["start"], d["end"]) for d in record["definitions"]] == [
+        ("Cart", "class", 2, 6), ("Cart.total", "method", 3, 5)]
+    assert ["computeInvoiceTotal", "Cart.total", 4] in record["references"]
+    assert record["imports"] == ["./invoice"]
+
+def test_related_symbols_are_ranked_by_distance_and_imports():
+    graph = SymbolGraph()
+    for path, content in FILES.items():
+        graph.add_file(path, parse_python(content) if path.endswith(".py") else parse_script(content))
+
+    related = graph.related([("billing/invoice.py", "compute_invoice_total")], {}, max_depth=2)
+
+    ranked = [(s.file_path, s.qualname, s.relation, s.distance, s.imported) for s in related]
+    assert ranked == [
+        ("billing/api.py", "invoice_endpoint", "caller", 1, True),
+        ("billing/tax.py", "tax_rate", "callee", 1, True),
+        # Calls the changed function by name without importing it
+        ("reports/monthly.py", "monthly_report", "caller", 1, False),
+        ("billing/api.py", "route_invoices", "caller", 2, True),
+    ]
+    assert graph.imports_of("web/cart.ts") == {"web/invoice.ts"}
+
+def test_store_updates_only_changed_files_and_persists(tmp_path, monkeypatch):
+    client = RepoClient()
+    store = make_store(client, tmp_path)
+    store.get_graph("org/repo", SHA)
+    monkeypatch.setitem(FILES, "reports/monthly.py", "def monthly_report(rows):\n    return len(rows)\n")
+
+    graph = store.get_graph("org/repo", "8" * 40)
+
+    assert store.last_refresh.modified == ["reports/monthly.py"]
+    assert ("reports/monthly.py", "monthly_report") not in graph.callers["compute_invoice_total"]
+    fetches = client.content_fetches
+    reloaded = make_store(client, tmp_path).get_graph("org/repo", "8" * 40)
+    assert client.content_fetches == fetches
+    assert reloaded.callers == graph.callers and reloaded.nodes == graph.nodes
+
+def test_refresh_swaps_in_a_new_graph(tmp_path, monkeypatch):
+    """A graph already handed to a reader is never changed by a later refresh."""
+    store = make_store(RepoClient(), tmp_path)
+    before = store.get_graph("org/repo", SHA)
+    monkeypatch.setitem(FILES, "reports/monthly.py", "def monthly_report(rows):\n    return len(rows)\n")
+
+    after = store.get_graph("org/repo", "8" * 40)
+
+    assert after is not before
+    assert ("reports/monthly.py", "monthly_report") in before.callers["compute_invoice_total"]
+    assert ("reports/monthly.py", "monthly_report") not in after.callers["compute_invoice_total"]
+    assert after.nodes.keys() == before.nodes.keys()
+
+def test_retriever_adds_callers_and_callees(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "symbol_retrieval_enabled", True)
+    client = RepoClient()
+    retriever = ContextRetriever(client, CriteriaProcessor(), symbol_index_store=make_store(client, tmp_path))
+
+    documents = retriever.collect_pr_documents("org/repo", make_pr())
+
+    related = [doc for doc in documents if doc.metadata["type"] == "symbol_graph"]
+    assert [doc.metadata["symbol"] for doc in related][:3] == ["invoice_endpoint", "tax_rate", "monthly_report"]
+    assert related[0].source == "billing/api.py:3-4"
+    assert related[0].relevance_score > related[-1].relevance_score
+    assert all(doc.metadata["file_path"] != "billing/invoice.py" for doc in related)
+
+def test_index_errors_land_in_the_stage_report(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(settings, "symbol_retrieval_enabled", True)
+    client = RepoClient()
+    store = make_store(client, tmp_path)
+    retriever = ContextRetriever(client, CriteriaProcessor(), symbol_index_store=store)
+
+    def unavailable(repo, pr_info, ref):
+        raise IOError("index unavailable")
+
+    monkeypatch.setattr(store, "related_to", unavailable)
+
+    stages = retriever.collect_pr_candidates("org/repo", make_pr())["retrieval_stages"]
+
+    assert {stage["stage"]: stage for stage in stages}["graph"]["error"] == "index unavailable"
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,163 @@
+"""Tests for the semantic vector index over repository files."""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agent.criteria.criteria_processor import CriteriaProcessor
+from agent.providers.github_client import FileDiff, MockGitHubClient, PRInfo
+from agent.retrieval.context_retriever import ContextRetriever
+from agent.retrieval.embeddings import HashingEmbedder, split_identifiers
+from agent.retrieval.incremental_indexer import IncrementalIndexer
+from agent.retrieval.vector_index import VectorIndex, VectorIndexStore, chunk_file, diff_queries
+from config.settings import settings
+
+SHA = "a" * 40
+
+FILES = {
+    "src/billing/invoice.py": "def compute_invoice_total(line_items, tax_rate):\n"
+                              "    subtotal = sum(item.price for item in line_items)\n"
+                              "    return subtotal * (1 + tax_rate)\n",
+    "src/billing/api.py": "from .invoice import compute_invoice_total\n\n"
+                          "def invoice_endpoint(request):\n"
+                          "    return compute_invoice_total(request.line_items, request.tax_rate)\n",
+    "src/auth/session.py": "class SessionStore:\n    def refresh_token(self, user_id):\n        pass\n",
+    "docs/logo.png": "binary",
+}
+
+DIFF = ("@@ -1,3 +1,3 @@ def compute_invoice_total(line_items, tax_rate):\n"
+        "-    subtotal = sum(item.price for item in line_items)\n"
+        "+    subtotal = sum(item.price * item.quantity for item in line_items)\n")
+
+
+class RepoClient(MockGitHubClient):
+    def __init__(self):
+        self.content_fetches = 0
+
+    def get_repo_files(self, repo, ref="main"):
+        return list(FILES)
+
+    def get_file_content(self, repo, file_path, ref="main"):
+        self.content_fetches += 1
+        return FILES.get(file_path, "# Mock content")
+
+    def get_commit_history(self, repo, file_path, limit=5):
+        return []
+
+
+def make_store(client, tmp_path, dim=128):
+    indexer = IncrementalIndexer(client, str(tmp_path / "manifest.db"))
+    return VectorIndexStore(client, str(tmp_path / "vectors"), HashingEmbedder(dim), indexer)
+
+def make_pr():
+    return PRInfo(pr_number=1, title="Count quantities", description="", base_branch="main",
+                  head_branch="fix", total_additions=1, total_deletions=1, base_sha=SHA,
+                  files_changed=[FileDiff(file_path="src/billing/invoice.py", status="modified",
+                                          additions=1, deletions=1, diff_content=DIFF)])
+
+def test_identifiers_split_on_case_and_underscores():
+    tokens = split_identifiers("parseHTTPResponse_v2 = self.refresh_token")
+
+    assert {"parsehttpresponse_v2", "parse", "http", "response", "v2", "refresh_token", "refresh"} <= set(tokens)
+    assert "self" not in tokens
+
+def test_chunks_overlap_and_cover_the_file():
+    content = "\n".join(f"line {i}" for i in range(1, 26))
+
+    chunks = chunk_file("a.py", content, chunk_lines=10, overlap_lines=2)
+
+    assert [(c.start_line, c.end_line) for c in chunks] == [(1, 10), (9, 18), (17, 25)]
+
+def test_diff_hunks_become_queries():
+    queries = diff_queries(make_pr())
+
+    assert len(queries) == 1
+    assert queries[0].startswith("src/billing/invoice.py\ndef compute_invoice_total")
+    assert "item.quantity" in queries[0]
+
+def test_search_finds_callers_outside_changed_files():
+    index = VectorIndex.build({path: FILES[path] for path in FILES if path.endswith(".py")}, HashingEmbedder(256))
+
+    hits = index.search_texts(diff_queries(make_pr()), top_k=2, exclude_paths={"src/billing/invoice.py"})
+
+    assert hits[0].chunk.file_path == "src/billing/api.py"
+    assert all(hit.chunk.file_path != "src/billing/invoice.py" for hit in hits)
+    assert hits[0].score > (hits[1].score if len(hits) > 1 else 0)
+
+def test_batched_search_matches_brute_force(monkeypatch):
+    monkeypatch.setattr(settings, "vector_search_block_rows", 3)
+    rng = np.random.default_rng(0)
+    files = {f"m{i}.py": "\n".join(f"name_{rng.integers(50)} = value_{rng.integers(50)}" for _ in range(5))
+             for i in range(12)}
+    index = VectorIndex.build(files, HashingEmbedder(64))
+    queries = index.embedder.embed(["name_1 value_2", "name_7"])
+
+    results = index.search(queries, top_k=4)
+
+    expected = np.argsort(-(queries @ index.vectors.T), axis=1)[:, :4]
+    assert [[i for i, _ in hits] for hits in results] == expected.tolist()
+
+def test_store_persists_indexes_memory_mapped(tmp_path):
+    client = RepoClient()
+    make_store(client, tmp_path).get_index("org/repo", SHA)
+    fetches = client.content_fetches
+
+    index = make_store(client, tmp_path).get_index("org/repo", SHA)
+
+    assert client.content_fetches == fetches
+    assert isinstance(index.vectors, np.memmap)
+    assert {chunk.file_path for chunk in index.chunks} == {p for p in FILES if p.endswith(".py")}
+
+def test_saving_over_a_mapped_index_keeps_it_readable(tmp_path):
+    embedder = HashingEmbedder(64)
+    VectorIndex.build({"a.py": "def alpha():\n    pass\n"}, embedder).save(str(tmp_path))
+    mapped = VectorIndex.load(str(tmp_path), embedder)
+    before = np.array(mapped.vectors)
+
+    VectorIndex.build({"b.py": "def beta():\n    return 1\n" * 200}, embedder).save(str(tmp_path))
+
+    assert np.array_equal(np.asarray(mapped.vectors), before)
+    assert [chunk.file_path for chunk in VectorIndex.load(str(tmp_path), embedder).chunks][0] == "b.py"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["chunks.json", "vectors.npy"]
+
+def test_store_reembeds_only_changed_files(tmp_path, monkeypatch):
+    client = RepoClient()
+    store = make_store(client, tmp_path)
+    store.get_index("org/repo", SHA)
+    monkeypatch.setitem(FILES, "src/auth/session.py", "class SessionStore:\n    def revoke(self):\n        pass\n")
+
+    index = store.get_index("org/repo", "b" * 40)
+
+    assert store.last_refresh.modified == ["src/auth/session.py"]
+    assert any("revoke" in chunk.text for chunk in index.chunks)
+    assert not any("refresh_token" in chunk.text for chunk in index.chunks)
+    assert len(index) == index.vectors.shape[0] == 3
+
+def test_retriever_adds_related_code(tmp_path, monkeypatch):
+    client = RepoClient()
+    retriever = ContextRetriever(client, CriteriaProcessor(), vector_index_store=make_store(client, tmp_path, 256))
+    monkeypatch.setattr(settings, "semantic_retrieval_enabled", True)
+
+    documents = retriever.collect_pr_documents("org/repo", make_pr())
+
+    related = [doc for doc in documents if doc.metadata["type"] == "semantic_match"]
+    assert related[0].metadata["file_path"] == "src/billing/api.py"
+    assert related[0].relevance_score < 0.9
+
+def test_index_errors_land_in_the_stage_report(tmp_path, monkeypatch, capsys):
+    client = RepoClient()
+    store = make_store(client, tmp_path, 256)
+    retriever = ContextRetriever(client, CriteriaProcessor(), vector_index_store=store)
+    monkeypatch.setattr(settings, "semantic_retrieval_enabled", True)
+
+    def unavailable(repo, ref):
+        raise IOError("index unavailable")
+
+    monkeypatch.setattr(store, "get_index", unavailable)
+
+    stages = retriever.collect_pr_candidates("org/repo", make_pr())["retrieval_stages"]
+
+    assert {stage["stage"]: stage for stage in stages}["dense"]["error"] == "index unavailable"
+    assert capsys.readouterr().out == ""